@@ -1,62 +1,78 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session
 from flask_socketio import SocketIO, emit
 from projet import *
+from magasin_cles import MagasinCles, MagasinCorrompu
+from journal_banque import JournalBanque, JournalCorrompu
+from pipeline_autorisations import PipelineAutorisations
+from stockage_sqlite import StockageSQLite
+from export_historique import FILTRES, FORMATS, commande_publique, exporter, lire_horodatage, transaction_publique
+from bus_evenements import BusEvenements
+from archive_logs import ArchiveLogs, TamponLogs
+from journalisation import configurer_depuis_environnement, journal
+from demarrage import ECHEC, Demarrage
+import atexit
 import threading
 import secrets
+import os
 from datetime import datetime
 import json as json_lib
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(32)
 socketio = SocketIO(app, cors_allowed_origins="*")
+# Journalisation de projet.py : SET_JOURNALISATION=demo|json, sinon avertissements et erreurs seulement
+# (demo par défaut pour `python app.py` : le démarrage en arrière-plan commence dès l'import)
+configurer_depuis_environnement(defaut='demo' if __name__ == '__main__' else None)
+log = journal('app', acteur='ACHAT DÉTAILLÉ')
 
 ca = None
 banque = None
 marchands = {}
 clients = {}
-logs_globaux = []
-logs_securite = []  # Nouveau : logs des tentatives d'attaque
+# Logs système et tentatives d'attaque en tampons circulaires ; avec SET_LOGS_DIR, les plus anciens sont
+# archivés en segments compressés
+dossier_logs = os.environ.get('SET_LOGS_DIR')
+capacite_logs = int(os.environ.get('SET_LOGS_CAPACITE', 1000))
+logs_globaux = TamponLogs(capacite_logs, ArchiveLogs(dossier_logs, 'globaux') if dossier_logs else None)
+logs_securite = TamponLogs(capacite_logs, ArchiveLogs(dossier_logs, 'securite') if dossier_logs else None)
+atexit.register(logs_globaux.fermer)
+atexit.register(logs_securite.fermer)
+magasin = None
+pipeline = None
+stockage = None
+# Événements WebSocket émis par lots depuis un thread de fond : les requêtes ne font que les déposer
+bus = BusEvenements(socketio.emit, capacite=int(os.environ.get('SET_BUS_CAPACITE', 1000)),
+                    delai_ms=float(os.environ.get('SET_BUS_DELAI_MS', 50))).demarrer()
+metadonnees_clients = {}  # solde initial des clients créés via l'API, conservé dans le magasin
 
-def log_technical_process(title, process_type, steps=None, crypto=None, result=None, status='info'):
-    """Enregistrer un processus technique détaillé pour le moniteur"""
-    import base64
-    
-    print(f"\n{'='*60}")
-    print(f"[MONITOR] Préparation processus technique")
-    print(f"  Titre: {title}")
-    print(f"  Type: {process_type}")
-    print(f"  Status: {status}")
-    print(f"  Nombre d'étapes: {len(steps) if steps else 0}")
-    print(f"  Crypto présent: {'Oui' if crypto else 'Non'}")
-    print(f"  Résultat présent: {'Oui' if result else 'Non'}")
-    
-    technical_log = {
-        'timestamp': datetime.now().isoformat(),
+def _processus_technique(horodatage, title, process_type, steps, crypto, result, status):
+    """Contenu de l'événement 'technical_process', construit par le répartiteur du bus au moment de l'émission"""
+    crypto = dict(crypto or {})
+    # Clés exportées en PEM, octets convertis en hex pour l'affichage
+    if 'keys' in crypto:
+        crypto['keys'] = {nom: cle.hex() if isinstance(cle, bytes) else
+                          cle if isinstance(cle, str) else exporter_cle_publique(cle)[:200] + '...'
+                          for nom, cle in crypto['keys'].items()}
+    for champ in ('encrypted', 'signature'):
+        if isinstance(crypto.get(champ), bytes):
+            crypto[champ] = crypto[champ].hex()
+    return {
+        'timestamp': horodatage,
         'title': title,
         'type': process_type,
         'status': status,
         'steps': steps or [],
-        'crypto': crypto or {},
+        'crypto': crypto,
         'result': result
     }
-    
-    # Convertir les bytes en hex pour l'affichage
-    if crypto:
-        if 'keys' in crypto:
-            for key_name, key_value in crypto['keys'].items():
-                if isinstance(key_value, bytes):
-                    crypto['keys'][key_name] = key_value.hex()
-        if 'encrypted' in crypto and isinstance(crypto['encrypted'], bytes):
-            crypto['encrypted'] = crypto['encrypted'].hex()
-        if 'signature' in crypto and isinstance(crypto['signature'], bytes):
-            crypto['signature'] = crypto['signature'].hex()
-    
-    print(f"[MONITOR] 📡 Émission WebSocket 'technical_process'...")
-    socketio.emit('technical_process', technical_log)
-    print(f"[MONITOR] ✅ Événement émis avec succès")
-    print(f"{'='*60}\n")
-    
-    return technical_log
+
+def log_technical_process(title, process_type, steps=None, crypto=None, result=None, status='info'):
+    """Enregistrer un processus technique détaillé pour le moniteur.
+    Les clés de crypto['keys'] peuvent être des objets clé : l'export PEM est fait hors de la requête"""
+    horodatage = datetime.now().isoformat()
+    return bus.publier('technical_process', lambda: _processus_technique(horodatage, title, process_type, steps,
+                                                                         crypto, result, status),
+                       prioritaire=False)
 
 def log_event(event_type, actor, message, details=None):
     log_entry = {
@@ -67,7 +83,7 @@ def log_event(event_type, actor, message, details=None):
         'details': details or {}
     }
     logs_globaux.append(log_entry)
-    socketio.emit('nouveau_log', log_entry)
+    bus.publier('nouveau_log', log_entry)
     return log_entry
 
 def log_security_event(attack_type, blocked, message, details=None):
@@ -81,7 +97,7 @@ def log_security_event(attack_type, blocked, message, details=None):
         'severity': 'critical' if attack_type in ['usurpation', 'injection'] else 'high' if attack_type in ['modification_montant', 'certificat_revoque'] else 'medium'
     }
     logs_securite.append(security_log)
-    socketio.emit('security_alert', security_log)
+    bus.publier('security_alert', security_log)
     
     # Aussi dans les logs globaux
     log_event('security', 'Système de Sécurité', 
@@ -90,40 +106,164 @@ def log_security_event(attack_type, blocked, message, details=None):
     
     return security_log
 
+def ouvrir_magasin():
+    """Magasin de clés persistant, activé par SET_KEYSTORE_PASSPHRASE"""
+    phrase_secrete = os.environ.get('SET_KEYSTORE_PASSPHRASE')
+    if not phrase_secrete:
+        return None
+    return MagasinCles(os.environ.get('SET_KEYSTORE_PATH', 'keystore.json'), phrase_secrete)
+
+def sauvegarder_magasin():
+    if magasin is None:
+        return
+    entites = {banque.nom: banque}
+    entites.update(marchands)
+    entites.update(clients)
+    magasin.sauvegarder(ca, entites, metadonnees_clients)
+
+def resume_cle_publique(cle):
+    """(module ou point, exposant ou courbe) pour l'affichage d'une clé RSA ou ECC"""
+    if hasattr(cle, 'n'):
+        return str(cle.n)[:50] + '...', str(cle.e)
+    return str(cle.pointQ.x)[:50] + '...', cle.curve
+
 def init_system():
-    global ca, banque, marchands, clients
+    """Attend la fin du démarrage en arrière-plan (lancé s'il ne l'est pas encore)"""
+    if not demarrage.attendre():
+        raise RuntimeError(f"Échec du démarrage du système: {demarrage.erreur}")
+
+def initialiser_systeme(demarrage):
+    """Initialisation complète, exécutée une seule fois par le thread de démarrage"""
+    global ca, banque, marchands, clients, magasin, pipeline, stockage
     
     log_event('system', 'Système', 'Initialisation du système SET/CDA')
     
-    ca = AutoriteCertification()
-    banque = Banque(ca)
-    
-    marchands['Amazon'] = Marchand("Amazon", ca, banque)
-    marchands['FNAC'] = Marchand("FNAC", ca, banque)
-    marchands['Darty'] = Marchand("Darty", ca, banque)
-    
-    clients['Alice'] = Client("Alice", "4970-1111-2222-3333", ca)
-    clients['Bob'] = Client("Bob", "4970-4444-5555-6666", ca)
-    clients['Charlie'] = Client("Charlie", "4970-7777-8888-9999", ca)
+    demarrage.etape('pool de clés')
+    # Pool de clés RSA pré-générées (nouveaux clients, clients temporaires des tests d'attaque)
+    if get_pool_cles() is None:
+        configurer_pool_cles(PoolCles(seuil_bas=2, cible=6)).demarrer()
+    
+    # Signatures, déchiffrements et générations de clés RSA dans un pool de processus plutôt que sous le GIL
+    # dans le thread de la requête, activé par SET_CRYPTO_PROCESSUS (nombre de processus, 0 : un par cœur)
+    processus_crypto = os.environ.get('SET_CRYPTO_PROCESSUS')
+    if processus_crypto and get_executeur_crypto() is None:
+        executeur = configurer_executeur_crypto(ExecuteurCrypto(int(processus_crypto) or None)).demarrer()
+        log_event('system', 'Système', f'Exécuteur cryptographique démarré ({executeur.processus} processus)')
+    
+    demarrage.etape('stockage')
+    # Comptes, historique, certificats et commandes en base SQLite, activés par SET_SQLITE
+    chemin_base = os.environ.get('SET_SQLITE')
+    if chemin_base and stockage is None:
+        stockage = StockageSQLite(chemin_base)
+        log_event('system', 'Système', f'Stockage SQLite ouvert ({chemin_base})')
+    
+    demarrage.etape('magasin de clés')
+    magasin = ouvrir_magasin()
+    entites = {}
+    if magasin is not None and magasin.existe():
+        try:
+            ca, entites, metadonnees = magasin.charger(stockage)
+            metadonnees_clients.update({nom: m for nom, m in metadonnees.items() if m})
+            log_event('system', 'Système', f'{len(entites)} identités restaurées depuis le magasin de clés')
+        except MagasinCorrompu as e:
+            # Le magasin altéré est rejeté et conservé tel quel pour analyse
+            log_event('error', 'Système', f'Magasin de clés rejeté: {e}')
+            magasin = None
+    
+    demarrage.etape('autorité de certification')
+    if ca is None:
+        ca = AutoriteCertification(suite=os.environ.get('SET_SUITE_CRYPTO', SUITE_PAR_DEFAUT), stockage=stockage)
+    demarrage.etape('banque')
+    banque = entites.get("Banque Centrale") or Banque(ca, stockage=stockage)
+    
+    # Journal d'écriture anticipée des comptes et transactions, activé par SET_JOURNAL_DIR
+    # (inutile avec SET_SQLITE : la base est déjà persistante)
+    dossier_journal = os.environ.get('SET_JOURNAL_DIR')
+    if dossier_journal and banque.journal is None and stockage is None:
+        try:
+            etat = banque.attacher_journal(JournalBanque(dossier_journal))
+            log_event('system', 'Banque', f'Journal ouvert ({etat["transactions"]} transactions, LSN {etat["lsn"]})')
+        except JournalCorrompu as e:
+            log_event('error', 'Banque', f'Journal rejeté: {e}')
+    
+    # Micro-lots d'autorisation entre marchands et banque, activés par SET_PIPELINE_TAILLE_LOT
+    taille_lot = os.environ.get('SET_PIPELINE_TAILLE_LOT')
+    if taille_lot and pipeline is None:
+        pipeline = PipelineAutorisations(banque, taille_lot=int(taille_lot),
+                                         delai_ms=float(os.environ.get('SET_PIPELINE_DELAI_MS', 2))).demarrer()
+        log_event('system', 'Banque', f'Pipeline d\'autorisation en micro-lots ({taille_lot} demandes max)')
+    
+    demarrage.etape('marchands')
+    for nom in ("Amazon", "FNAC", "Darty"):
+        marchands[nom] = entites.get(nom) or Marchand(nom, ca, banque, stockage=stockage)
+        marchands[nom].pipeline = pipeline
+    
+    demarrage.etape('clients')
+    for nom, carte in (("Alice", "4970-1111-2222-3333"), ("Bob", "4970-4444-5555-6666"), ("Charlie", "4970-7777-8888-9999")):
+        clients[nom] = entites.get(nom) or Client(nom, carte, ca)
+    
+    # Clients créés via /api/nouveau_client lors d'une exécution précédente
+    for nom, entite in entites.items():
+        if isinstance(entite, Client) and nom not in clients:
+            clients[nom] = entite
+            banque.creer_compte(entite.carte, nom, metadonnees_clients.get(nom, {}).get('solde_initial', 0))
+    
+    if len(entites) < 1 + len(marchands) + len(clients):
+        sauvegarder_magasin()
     
     log_event('system', 'Système', f'Système initialisé avec {len(ca.certificats_emis)} certificats')
 
+# Initialisation unique en arrière-plan, lancée à l'import ; les requêtes l'attendent au plus
+# SET_DEMARRAGE_ATTENTE_S secondes puis reçoivent un 503
+demarrage = Demarrage(initialiser_systeme, etapes_prevues=7)
+attente_demarrage = float(os.environ.get('SET_DEMARRAGE_ATTENTE_S', 10))
+# Page d'accueil, sondes et fichiers statiques ne dépendent pas du système (None : route inconnue)
+ROUTES_SANS_DEMARRAGE = {None, 'static', 'index', 'healthz', 'readyz'}
+
+def reponse_demarrage():
+    etat = demarrage.etat()
+    message = (f"Échec du démarrage du système: {etat['erreur']}" if etat['statut'] == ECHEC
+               else "Système en cours de démarrage, réessayez dans quelques secondes")
+    reponse = jsonify({'success': False, 'message': message, 'demarrage': etat})
+    reponse.status_code = 503
+    if etat['statut'] != ECHEC:
+        reponse.headers['Retry-After'] = '2'
+    return reponse
+
+@app.before_request
+def attendre_demarrage():
+    if request.endpoint not in ROUTES_SANS_DEMARRAGE and not demarrage.attendre(attente_demarrage):
+        return reponse_demarrage()
+
+@app.route('/healthz')
+def healthz():
+    """Vivacité : le processus répond ; 503 seulement si le démarrage a échoué (instance à redémarrer)"""
+    etat = demarrage.etat()
+    return jsonify({'vivant': etat['statut'] != ECHEC, 'demarrage': etat}), 503 if etat['statut'] == ECHEC else 200
+
+@app.route('/readyz')
+def readyz():
+    """Disponibilité : 200 une fois le système initialisé, 503 pendant le démarrage"""
+    if not demarrage.pret:
+        return reponse_demarrage()
+    return jsonify({'pret': True, 'demarrage': demarrage.etat()})
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/dashboard')
 def dashboard():
-    if not ca:
-        init_system()
-    
+    # Agrégats tenus à jour à l'écriture : lecture en O(1) quel que soit l'historique
+    stats_certificats = ca.get_stats()
+    stats_transactions = banque.historique_transactions.get_stats()
     stats = {
-        'total_certificats': len(ca.certificats_emis),
-        'certificats_actifs': len([c for c in ca.certificats_emis.values() if not c.revoque]),
-        'certificats_revoques': len(ca.certificats_revoques),
-        'total_transactions': len(banque.historique_transactions),
-        'transactions_reussies': len([t for t in banque.historique_transactions if t['statut'] == 'approuvé']),
-        'montant_total': sum(t['montant'] for t in banque.historique_transactions),
+        'total_certificats': stats_certificats['total'],
+        'certificats_actifs': stats_certificats['actifs'],
+        'certificats_revoques': stats_certificats['revoques'],
+        'total_transactions': stats_transactions['total'],
+        'transactions_reussies': stats_transactions['reussies'],
+        'montant_total': stats_transactions['montant_total'],
         'total_marchands': len(marchands),
         'total_clients': len(clients)
     }
@@ -132,32 +272,22 @@ def dashboard():
 
 @app.route('/client')
 def client_interface():
-    if not ca:
-        init_system()
     return render_template('client.html', clients=clients, marchands=marchands)
 
 @app.route('/marchand')
 def marchand_interface():
-    if not ca:
-        init_system()
     return render_template('marchand.html', marchands=marchands)
 
 @app.route('/banque')
 def banque_interface():
-    if not ca:
-        init_system()
     return render_template('banque.html')
 
 @app.route('/certificats')
 def certificats_interface():
-    if not ca:
-        init_system()
     return render_template('certificats.html')
 
 @app.route('/attaques')
 def attaques_interface():
-    if not ca:
-        init_system()
     # Passer uniquement les noms, pas les objets complets
     return render_template('attaques.html', 
                          clients=list(clients.keys()), 
@@ -166,8 +296,6 @@ def attaques_interface():
 @app.route('/processus')
 def processus_technique():
     """Interface de monitoring des processus techniques"""
-    if not ca:
-        init_system()
     return render_template('processus.html')
 
 @app.route('/api/acheter', methods=['POST'])
@@ -222,9 +350,8 @@ def api_acheter():
 def acheter_avec_details(client, marchand, items, montant):
     """Effectuer un achat en loggant tous les détails techniques"""
     import time
-    from Crypto.Hash import SHA256
     
-    print(f"\n[ACHAT DÉTAILLÉ] Début pour {client.nom} chez {marchand.nom} - {montant}€")
+    log.debug("Début pour %s chez %s - %s€", client.nom, marchand.nom, montant)
     
     start_time = time.time()
     
@@ -276,42 +403,33 @@ def acheter_avec_details(client, marchand, items, montant):
         'duration': int((time.time() - start_time) * 1000)
     })
     
-    # Étape 4: Chiffrement RSA du PI pour la banque
-    cle_pub_banque = marchand.banque.get_public_key()
-    pi_chiffre = client.chiffrer_pour(pi_json.encode(), cle_pub_banque)
+    # Étape 4: Double signature SET sur H(H(OI) || H(PI)) puis chiffrement hybride du PI pour la banque
+    cle_pub_banque = marchand.banque.get_cle_chiffrement()
+    paquet = client.preparer_paquet(cle_pub_banque, oi, pi, transaction_id, timestamp, session=True)
+    pi_chiffre = paquet['payment_info_enc']
+    signature = paquet['signature']
     
     steps.append({
-        'action': 'Chiffrement RSA 2048 bits du Payment Info',
-        'details': f'Données chiffrées: {len(pi_chiffre)} octets. Seule la banque peut déchiffrer',
+        'action': 'Chiffrement hybride du Payment Info (AES-256-GCM + clé enveloppée RSA-OAEP 2048 bits)',
+        'details': f'Données chiffrées: {len(pi_chiffre)} octets (PI + H(OI) + double signature). Seule la banque peut déchiffrer',
         'status': 'success',
         'completed': True,
         'duration': int((time.time() - start_time) * 1000)
     })
     
-    # Étape 5: Création de la signature
-    donnees_combinees = json_lib.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    h = SHA256.new(donnees_combinees)
-    hash_donnees = h.hexdigest()
-    signature = client.signer_donnee(donnees_combinees)
+    # Étape 5: Double signature (le marchand ne reçoit que H(PI), jamais le PI)
+    oimd = empreinte_oi(oi, transaction_id)
+    hash_donnees = SHA512.new(donnees_double_signature(oimd, paquet['empreinte_pi'])).hexdigest()
     
     steps.append({
-        'action': 'Signature numérique SHA-256 + RSA',
-        'details': f'Hash: {hash_donnees[:32]}..., Signature: {len(signature)} octets',
+        'action': f'Double signature SET ({client.certificat.algorithme})',
+        'details': f'H(OI): {oimd.hex()[:16]}..., H(PI): {paquet["empreinte_pi"].hex()[:16]}..., '
+                   f'Hash: {hash_donnees[:32]}..., Signature: {len(signature)} octets',
         'status': 'success',
         'completed': True,
         'duration': int((time.time() - start_time) * 1000)
     })
     
-    # Créer le paquet complet
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
-    
     # Logger le processus technique complet
     log_technical_process(
         title=f"💳 Achat de {client.nom} chez {marchand.nom} - {montant}€",
@@ -319,8 +437,8 @@ def acheter_avec_details(client, marchand, items, montant):
         steps=steps,
         crypto={
             'keys': {
-                'Clé Publique Client (RSA 2048)': client.pub_key.export_key().decode()[:200] + '...',
-                'Clé Publique Banque (RSA 2048)': cle_pub_banque.export_key().decode()[:200] + '...'
+                f'Clé Publique Client ({client.suite.nom})': client.pub_key,
+                f'Clé de Chiffrement Banque ({marchand.banque.suite.nom})': cle_pub_banque
             },
             'plaintext': pi_json,
             'encrypted': pi_chiffre,
@@ -360,20 +478,9 @@ def acheter_avec_details(client, marchand, items, montant):
 
 @app.route('/api/stats')
 def api_stats():
-    if not ca:
-        init_system()
-    
     return jsonify({
-        'certificats': {
-            'total': len(ca.certificats_emis),
-            'actifs': len([c for c in ca.certificats_emis.values() if not c.revoque]),
-            'revoques': len(ca.certificats_revoques)
-        },
-        'transactions': {
-            'total': len(banque.historique_transactions),
-            'reussies': len([t for t in banque.historique_transactions if t['statut'] == 'approuvé']),
-            'montant_total': sum(t['montant'] for t in banque.historique_transactions)
-        },
+        'certificats': dict(ca.get_stats(), cache_verifications=ca.cache_verifications.get_stats()),
+        'transactions': banque.historique_transactions.get_stats(),
         'marchands': {
             'total': len(marchands),
             'liste': list(marchands.keys())
@@ -381,14 +488,18 @@ def api_stats():
         'clients': {
             'total': len(clients),
             'liste': list(clients.keys())
-        }
+        },
+        'pool_cles': get_pool_cles().get_stats() if get_pool_cles() else None,
+        'executeur_crypto': get_executeur_crypto().get_stats() if get_executeur_crypto() else None,
+        'journal': banque.journal.get_stats() if banque.journal else None,
+        'anti_rejeu': banque.transactions_vues.get_stats(),
+        'pipeline': pipeline.get_stats() if pipeline else None,
+        'bus': bus.get_stats(),
+        'logs': {'globaux': logs_globaux.get_stats(), 'securite': logs_securite.get_stats()}
     })
 
 @app.route('/api/certificats')
 def api_certificats():
-    if not ca:
-        init_system()
-    
     certs_data = []
     for cert in ca.certificats_emis.values():
         valide, raison = cert.est_valide()
@@ -405,49 +516,94 @@ def api_certificats():
     
     return jsonify(certs_data)
 
+LIMITE_PAGE_MAX = 500
+
+def parametres_filtres(genre):
+    """Filtres de la requête : debut/fin, montant_min/montant_max et égalités indexées (ValueError si invalides)"""
+    args = request.args
+    filtres = {}
+    for nom in ('montant_min', 'montant_max'):
+        if args.get(nom):
+            filtres[nom] = float(args[nom])
+    for nom in ('debut', 'fin'):
+        if args.get(nom):
+            filtres[nom] = lire_horodatage(args[nom])
+    for nom in FILTRES[genre]:
+        if args.get(nom):
+            filtres[nom] = args[nom]
+    return filtres
+
+def parametres_recherche(genre):
+    """Pagination et filtres de la requête pour rechercher() ; ValueError si un paramètre est invalide.
+    limite, curseur (rendu par la page précédente), ordre (desc par défaut : plus récentes d'abord)"""
+    args = request.args
+    ordre = args.get('ordre', 'desc')
+    if ordre not in ('asc', 'desc'):
+        raise ValueError(f"Ordre inconnu: {ordre}")
+    return dict(parametres_filtres(genre),
+                limite=min(int(args.get('limite', 50)), LIMITE_PAGE_MAX),
+                apres=int(args['curseur']) if args.get('curseur') else None,
+                decroissant=ordre == 'desc')
+
 @app.route('/api/transactions')
 def api_transactions():
-    if not ca:
-        init_system()
-    
-    trans_data = []
-    for trans in banque.historique_transactions:
-        trans_copy = trans.copy()
-        trans_copy['timestamp'] = datetime.fromtimestamp(trans['timestamp']).isoformat()
-        
-        # Masquer la carte seulement si ce n'est pas "inconnu"
-        if trans['carte'] != 'inconnu' and len(trans['carte']) >= 8:
-            trans_copy['carte_masquee'] = trans['carte'][:4] + '-****-****-' + trans['carte'][-4:]
-        else:
-            trans_copy['carte_masquee'] = trans['carte']
-        
-        trans_data.append(trans_copy)
+    """Page de l'historique bancaire : filtres carte, statut, marchand, montant et dates"""
+    historique = banque.historique_transactions
+    try:
+        transactions, curseur = historique.rechercher(**parametres_recherche('transactions'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    return jsonify(trans_data)
+    return jsonify({
+        'transactions': [transaction_publique(trans) for trans in transactions],
+        'curseur': curseur,
+        'stats': historique.get_stats()
+    })
 
 @app.route('/api/commandes/<marchand_nom>')
 def api_commandes(marchand_nom):
-    if not ca:
-        init_system()
-    
+    """Page des commandes d'un marchand : filtres client, statut, montant et dates"""
     if marchand_nom not in marchands:
-        return jsonify([])
-    
-    marchand = marchands[marchand_nom]
-    commandes_data = []
+        return jsonify({'commandes': [], 'curseur': None, 'stats': {'total': 0, 'montant_total': 0}})
     
-    for cmd in marchand.commandes:
-        cmd_copy = cmd.copy()
-        cmd_copy['timestamp'] = datetime.fromtimestamp(cmd['timestamp']).isoformat()
-        commandes_data.append(cmd_copy)
+    commandes = marchands[marchand_nom].commandes
+    try:
+        page, curseur = commandes.rechercher(**parametres_recherche('commandes'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    return jsonify(commandes_data)
+    return jsonify({'commandes': [commande_publique(cmd) for cmd in page], 'curseur': curseur,
+                    'stats': commandes.get_stats()})
+
+def reponse_export(genre, registre):
+    """Export en flux (NDJSON ou CSV) dans l'ordre d'enregistrement ; curseur : dernier curseur reçu.
+    L'en-tête CSV n'est envoyé qu'en début d'export, sauf entete=0/1 explicite"""
+    args = request.args
+    format_export = args.get('format', 'ndjson')
+    try:
+        if format_export not in FORMATS:
+            raise ValueError(f"Format inconnu: {format_export}")
+        apres = int(args['curseur']) if args.get('curseur') else None
+        # Curseur et filtres vérifiés avant le premier octet envoyé
+        lignes = registre.parcourir(apres=apres, **parametres_filtres(genre))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    entete = args.get('entete', '1' if apres is None else '0') != '0'
+    return Response(exporter(lignes, genre, format_export, entete), mimetype=FORMATS[format_export],
+                    headers={'Content-Disposition': f'attachment; filename={genre}.{format_export}'})
+
+@app.route('/api/export/transactions')
+def api_export_transactions():
+    return reponse_export('transactions', banque.historique_transactions)
+
+@app.route('/api/export/commandes/<marchand_nom>')
+def api_export_commandes(marchand_nom):
+    if marchand_nom not in marchands:
+        return jsonify({'success': False, 'message': 'Marchand inconnu'}), 404
+    return reponse_export('commandes', marchands[marchand_nom].commandes)
 
 @app.route('/api/soldes')
 def api_soldes():
-    if not ca:
-        init_system()
-    
     soldes = {}
     for nom, client in clients.items():
         solde = banque.get_solde(client.carte)
@@ -459,14 +615,27 @@ def api_soldes():
     
     return jsonify(soldes)
 
+def reponse_logs(tampon, nombre):
+    """nombre derniers logs ; avec debut et/ou fin, ceux de l'intervalle (archive comprise), plus anciens d'abord"""
+    args = request.args
+    if not args.get('debut') and not args.get('fin'):
+        return jsonify(tampon.derniers(nombre))
+    try:
+        debut = lire_horodatage(args['debut']) if args.get('debut') else None
+        fin = lire_horodatage(args['fin']) if args.get('fin') else None
+        limite = min(int(args.get('limite', LIMITE_PAGE_MAX)), LIMITE_PAGE_MAX)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify(tampon.rechercher(debut, fin, limite))
+
 @app.route('/api/logs')
 def api_logs():
-    return jsonify(logs_globaux[-50:])
+    return reponse_logs(logs_globaux, 50)
 
 @app.route('/api/security_logs')
 def api_security_logs():
     """Récupérer les logs de sécurité (tentatives d'attaque)"""
-    return jsonify(logs_securite[-100:])  # 100 derniers logs de sécurité
+    return reponse_logs(logs_securite, 100)  # 100 derniers logs de sécurité
 
 @app.route('/api/revoquer_certificat', methods=['POST'])
 def api_revoquer_certificat():
@@ -478,6 +647,8 @@ def api_revoquer_certificat():
         
         cert = ca.certificats_emis.get(numero_serie)
         if cert:
+            # Persistée aussitôt : la CRL du magasin est relue au redémarrage
+            sauvegarder_magasin()
             log_event('security', 'CA', f'Certificat révoqué: {cert.sujet}', {
                 'numero_serie': numero_serie
             })
@@ -542,6 +713,9 @@ def api_nouveau_client():
             del clients[nom]
             return jsonify({'success': False, 'message': message_compte}), 500
         
+        metadonnees_clients[nom] = {'solde_initial': solde_initial}
+        sauvegarder_magasin()
+        
         log_event('system', 'CA', f'Nouveau client créé: {nom}', {
             'carte_masquee': carte[:4] + '-****-****-' + carte[-4:],
             'solde_initial': solde_initial
@@ -604,18 +778,7 @@ def test_attaque_rejeu(params):
     oi = {"items": ["Test Rejeu"], "montant": 10, "client": client.nom, "timestamp": timestamp}
     pi = {"carte": client.carte, "montant": 10, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = client.chiffrer_pour(json_lib.dumps(pi).encode(), marchands[marchand_nom].banque.get_public_key())
-    donnees_combinees = json_lib.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = client.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet = client.preparer_paquet(marchands[marchand_nom].banque.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
     
     # Premier envoi
     succes1, msg1 = marchand.traiter_commande(paquet)
@@ -666,27 +829,18 @@ def test_attaque_modification_montant(params):
     oi_original = {"items": ["Test Modification"], "montant": montant_original, "client": client.nom, "timestamp": timestamp}
     pi = {"carte": client.carte, "montant": montant_original, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = client.chiffrer_pour(json_lib.dumps(pi).encode(), marchand.banque.get_public_key())
-    donnees_combinees_original = json_lib.dumps(oi_original, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = client.signer_donnee(donnees_combinees_original)
+    paquet_malveillant = client.preparer_paquet(marchand.banque.get_cle_chiffrement(), oi_original, pi, transaction_id, timestamp)
+    pi_chiffre = paquet_malveillant['payment_info_enc']
+    signature = paquet_malveillant['signature']
+    pimd = paquet_malveillant['empreinte_pi']
     
-    # Calculer le hash original
-    from Crypto.Hash import SHA256
-    hash_original = SHA256.new(donnees_combinees_original).hexdigest()
+    # Hash signé : H(H(OI) || H(PI))
+    hash_original = SHA512.new(donnees_double_signature(empreinte_oi(oi_original, transaction_id), pimd)).hexdigest()
     
     # OI modifié
     oi_modifie = {"items": ["Test Modification"], "montant": montant_modifie, "client": client.nom, "timestamp": timestamp}
-    donnees_combinees_modifie = json_lib.dumps(oi_modifie, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    hash_modifie = SHA256.new(donnees_combinees_modifie).hexdigest()
-    
-    paquet_malveillant = {
-        "order_info": oi_modifie,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    hash_modifie = SHA512.new(donnees_double_signature(empreinte_oi(oi_modifie, transaction_id), pimd)).hexdigest()
+    paquet_malveillant["order_info"] = oi_modifie
     
     # Étapes de vérification
     verification_steps = []
@@ -740,7 +894,7 @@ def test_attaque_modification_montant(params):
         'montant_original': montant_original,
         'montant_modifie': montant_modifie,
         'resultat': {'succes': succes, 'message': msg},
-        'defense': 'Signature numérique : hash(OI + PI + ID). Si OI change, la signature est invalide',
+        'defense': 'Double signature SET : H(H(OI + ID) || H(PI)). Si OI change, la signature est invalide',
         'explication': 'La modification du montant invalide la signature cryptographique',
         'verification_steps': verification_steps,
         'technical_details': {
@@ -777,19 +931,15 @@ def test_attaque_usurpation(params):
             'numero_serie': vrai_cert.numero_serie,
             'sujet': vrai_cert.sujet,
             'emetteur': vrai_cert.emetteur,
-            'cle_publique_n': str(vrai_cert.cle_publique.n)[:50] + '...',
-            'cle_publique_e': str(vrai_cert.cle_publique.e),
+            'cle_publique_n': resume_cle_publique(vrai_cert.cle_publique)[0],
+            'cle_publique_e': resume_cle_publique(vrai_cert.cle_publique)[1],
             'date_creation': vrai_cert.date_creation.isoformat(),
             'signature_valide': vrai_cert.verifier_signature(ca.get_public_key())
         }
     
     # L'attaquant génère ses propres clés
-    from Crypto.PublicKey import RSA
-    from Crypto.Hash import SHA256
-    from Crypto.Signature import pkcs1_15
-    
-    attaquant_key = RSA.generate(2048)
-    attaquant_pub = attaquant_key.publickey()
+    attaquant_key = ca.suite.generer_cle_signature()
+    attaquant_pub = cle_publique_de(attaquant_key)
     
     # Faux certificat
     faux_cert = Certificat(
@@ -804,8 +954,8 @@ def test_attaque_usurpation(params):
         'numero_serie': faux_cert.numero_serie,
         'sujet': faux_cert.sujet,
         'emetteur': faux_cert.emetteur,
-        'cle_publique_n': str(faux_cert.cle_publique.n)[:50] + '...',
-        'cle_publique_e': str(faux_cert.cle_publique.e),
+        'cle_publique_n': resume_cle_publique(faux_cert.cle_publique)[0],
+        'cle_publique_e': resume_cle_publique(faux_cert.cle_publique)[1],
         'date_creation': faux_cert.date_creation.isoformat(),
         'signature_valide_ca': faux_cert.verifier_signature(ca.get_public_key()),
         'auto_signe': True
@@ -817,18 +967,25 @@ def test_attaque_usurpation(params):
     oi = {"items": ["Test Usurpation"], "montant": 100, "client": client_cible, "timestamp": timestamp}
     pi = {"carte": "4970-9999-9999-9999", "montant": 100, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    from Crypto.Cipher import PKCS1_OAEP
-    cipher = PKCS1_OAEP.new(marchand.banque.get_public_key())
-    pi_chiffre = cipher.encrypt(json_lib.dumps(pi).encode())
-    
-    donnees_combinees = json_lib.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    h = SHA256.new(donnees_combinees)
+    # L'attaquant construit une double signature avec sa propre clé
+    oimd = empreinte_oi(oi, transaction_id)
+    pimd = empreinte_pi(pi)
+    h = SHA512.new(donnees_double_signature(oimd, pimd))
     hash_donnees = h.hexdigest()
-    fausse_signature = pkcs1_15.new(attaquant_key).sign(h)
+    fausse_signature = nouveau_signataire(attaquant_key).sign(h)
+    
+    # L'enveloppe à usage unique ne dépend pas de l'expéditeur
+    enveloppe_pi = {
+        'pi': pi,
+        'empreinte_oi': oimd.hex(),
+        'double_signature': base64.b64encode(fausse_signature).decode()
+    }
+    pi_chiffre = marchand.banque.chiffrer_pour(json_lib.dumps(enveloppe_pi).encode(), marchand.banque.get_cle_chiffrement())
     
     paquet = {
         "order_info": oi,
         "payment_info_enc": pi_chiffre,
+        "empreinte_pi": pimd,
         "signature": fausse_signature,
         "certificat_client": faux_cert,
         "transaction_id": transaction_id,
@@ -922,18 +1079,7 @@ def test_attaque_certificat_revoque(params):
     oi = {"items": ["Test Certificat Révoqué"], "montant": 50, "client": temp_client.nom, "timestamp": timestamp}
     pi = {"carte": temp_client.carte, "montant": 50, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = temp_client.chiffrer_pour(json_lib.dumps(pi).encode(), banque.get_public_key())
-    donnees_combinees = json_lib.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = temp_client.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": temp_client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet = temp_client.preparer_paquet(banque.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
     
     succes, msg = marchand.traiter_commande(paquet)
     
@@ -977,18 +1123,7 @@ def test_attaque_timestamp_expire(params):
     oi = {"items": ["Test Timestamp"], "montant": 50, "client": client.nom, "timestamp": timestamp_ancien}
     pi = {"carte": client.carte, "montant": 50, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = client.chiffrer_pour(json_lib.dumps(pi).encode(), marchand.banque.get_public_key())
-    donnees_combinees = json_lib.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = client.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp_ancien
-    }
+    paquet = client.preparer_paquet(marchand.banque.get_cle_chiffrement(), oi, pi, transaction_id, timestamp_ancien)
     
     succes, msg = marchand.traiter_commande(paquet)
     
@@ -1032,18 +1167,7 @@ def test_attaque_fonds_insuffisants(params):
     oi = {"items": ["Test Fonds Insuffisants"], "montant": montant_achat, "client": temp_client.nom, "timestamp": timestamp}
     pi = {"carte": temp_client.carte, "montant": montant_achat, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = temp_client.chiffrer_pour(json_lib.dumps(pi).encode(), banque.get_public_key())
-    donnees_combinees = json_lib.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = temp_client.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": temp_client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet = temp_client.preparer_paquet(banque.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
     
     succes, msg = marchand.traiter_commande(paquet)
     
@@ -1086,18 +1210,7 @@ def test_attaque_carte_invalide(params):
     oi = {"items": ["Test Carte Invalide"], "montant": 100, "client": temp_client.nom, "timestamp": timestamp}
     pi = {"carte": temp_client.carte, "montant": 100, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = temp_client.chiffrer_pour(json_lib.dumps(pi).encode(), banque.get_public_key())
-    donnees_combinees = json_lib.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = temp_client.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": temp_client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet = temp_client.preparer_paquet(banque.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
     
     succes, msg = marchand.traiter_commande(paquet)
     
@@ -1147,18 +1260,7 @@ def test_attaque_injection(params):
     
     pi = {"carte": client.carte, "montant": 50, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = client.chiffrer_pour(json_lib.dumps(pi).encode(), marchand.banque.get_public_key())
-    donnees_combinees = json_lib.dumps(oi_malveillant, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = client.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi_malveillant,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet = client.preparer_paquet(marchand.banque.get_cle_chiffrement(), oi_malveillant, pi, transaction_id, timestamp)
     
     succes, msg = marchand.traiter_commande(paquet)
     
@@ -1186,21 +1288,31 @@ def test_attaque_injection(params):
 
 @socketio.on('connect')
 def handle_connect():
-    if not ca:
-        init_system()
+    bus.connecter()
     emit('connected', {'message': 'Connecté au serveur SET'})
 
+@socketio.on('disconnect')
+def handle_disconnect():
+    bus.deconnecter()
+
 @socketio.on('demander_stats')
 def handle_stats_request():
-    if ca:
+    if demarrage.pret:
         stats = {
-            'certificats': len(ca.certificats_emis),
-            'transactions': len(banque.historique_transactions),
+            'certificats': ca.get_stats(),
+            'transactions': banque.historique_transactions.get_stats(),
             'marchands': len(marchands),
             'clients': len(clients)
         }
         emit('stats_update', stats)
 
+# Sous `python app.py` ou `python start.py` (SET_RECHARGEUR, mode debug), le processus parent ne fait que
+# surveiller les fichiers pour le rechargement : seul le processus qu'il relance (WERKZEUG_RUN_MAIN)
+# initialise le système, sans quoi les deux écriraient le magasin de clés, le journal et la base
+sous_rechargeur = __name__ == '__main__' or os.environ.get('SET_RECHARGEUR') == '1'
+if not sous_rechargeur or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    demarrage.lancer()
+
 if __name__ == '__main__':
     print("\n" + "="*70)
     print("🌐 DÉMARRAGE DE L'INTERFACE WEB SET/CDA")
@@ -0,0 +1,239 @@
+"""
+Logs bornés et archive compressée - Protocole SET/CDA
+Les derniers événements restent dans un tampon circulaire de taille fixe ; les plus anciens en sortent
+vers une archive optionnelle de segments NDJSON compressés (gzip), avec rotation et rétention, que l'on
+relit par intervalle de temps. La mémoire ne dépend pas de la durée de fonctionnement du serveur
+"""
+
+import gzip
+import itertools
+import json
+import os
+import threading
+import zlib
+from collections import deque
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+EXTENSION_SEGMENT = '.ndjson.gz'
+
+
+def horodatage(entree: dict) -> float:
+    return datetime.fromisoformat(entree['timestamp']).timestamp()
+
+
+def _lire_segment(chemin: str, taille: int = -1) -> Iterator[dict]:
+    """Entrées des taille premiers octets d'un segment (suite de membres gzip) ; un dernier bloc coupé par
+    un arrêt brutal est ignoré"""
+    with open(chemin, 'rb') as f:
+        donnees = f.read(taille)
+    while donnees:
+        decompresseur = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        try:
+            bloc = decompresseur.decompress(donnees)
+        except zlib.error:
+            return
+        if not decompresseur.eof:
+            return
+        for ligne in bloc.splitlines():
+            yield json.loads(ligne)
+        donnees = decompresseur.unused_data
+
+
+class ArchiveLogs:
+    """Segments `<nom>-<numéro>.ndjson.gz` d'un dossier et index `<nom>-index.json` des intervalles de temps
+    (horodatages Unix) des segments fermés : une recherche n'ouvre que les segments qui la recoupent.
+    Les entrées sont compressées par blocs de lignes_par_bloc (un membre gzip par bloc) ; au-delà de
+    segments_max, les segments les plus anciens sont supprimés"""
+
+    def __init__(self, dossier: str, nom: str, taille_segment: int = 2000, lignes_par_bloc: int = 256,
+                 segments_max: int = 500):
+        self.dossier = dossier
+        self.nom = nom
+        self.taille_segment = taille_segment
+        self.lignes_par_bloc = lignes_par_bloc
+        self.segments_max = segments_max
+        self._bloc: List[Tuple[float, bytes]] = []
+        self._segments: List[Tuple[float, float, str, int]] = []
+        self._courant: Optional[str] = None
+        self._octets_courant = 0
+        self._premier = self._dernier = 0.0
+        self._entrees_segment = 0
+        self._numero = 0
+        self.entrees = 0
+        os.makedirs(dossier, exist_ok=True)
+        self._charger_segments()
+
+    def _chemin(self, numero: int) -> str:
+        return os.path.join(self.dossier, f"{self.nom}-{numero:06d}{EXTENSION_SEGMENT}")
+
+    def _charger_segments(self):
+        chemin_index = os.path.join(self.dossier, f"{self.nom}-index.json")
+        bornes = {}
+        if os.path.exists(chemin_index):
+            with open(chemin_index) as f:
+                bornes = {numero: (premier, dernier) for numero, premier, dernier in json.load(f)}
+        prefixe = self.nom + '-'
+        numeros = sorted(int(nom_fichier[len(prefixe):-len(EXTENSION_SEGMENT)]) for nom_fichier in os.listdir(self.dossier)
+                         if nom_fichier.startswith(prefixe) and nom_fichier.endswith(EXTENSION_SEGMENT))
+        for numero in numeros:
+            if numero not in bornes:
+                # Segment resté ouvert (arrêt brutal) : bornes relues dans son contenu
+                moments = [horodatage(entree) for entree in _lire_segment(self._chemin(numero))]
+                if not moments:
+                    os.unlink(self._chemin(numero))
+                    continue
+                bornes[numero] = (min(moments), max(moments))
+            self._segments.append((*bornes[numero], self._chemin(numero), -1))
+        self._numero = numeros[-1] + 1 if numeros else 0
+        self._ecrire_index()
+
+    def _ecrire_index(self):
+        index = [(int(os.path.basename(chemin)[len(self.nom) + 1:-len(EXTENSION_SEGMENT)]), premier, dernier)
+                 for premier, dernier, chemin, _ in self._segments]
+        chemin_index = os.path.join(self.dossier, f"{self.nom}-index.json")
+        with open(chemin_index + '.tmp', 'w') as f:
+            json.dump(index, f)
+        os.replace(chemin_index + '.tmp', chemin_index)
+
+    def ajouter(self, entrees: List[dict]):
+        """Entrées sorties du tampon, dans leur ordre d'arrivée"""
+        for entree in entrees:
+            self._bloc.append((horodatage(entree), json.dumps(entree, ensure_ascii=False).encode() + b'\n'))
+            if len(self._bloc) >= self.lignes_par_bloc:
+                self._ecrire_bloc()
+
+    def _ecrire_bloc(self):
+        if not self._bloc:
+            return
+        moments = [moment for moment, _ in self._bloc]
+        if self._courant is None:
+            self._courant = self._chemin(self._numero)
+            self._numero += 1
+            self._premier, self._dernier = min(moments), max(moments)
+            self._entrees_segment = self._octets_courant = 0
+        with open(self._courant, 'ab') as f:
+            self._octets_courant += f.write(gzip.compress(b''.join(ligne for _, ligne in self._bloc)))
+        self._premier = min(self._premier, *moments)
+        self._dernier = max(self._dernier, *moments)
+        self._entrees_segment += len(self._bloc)
+        self.entrees += len(self._bloc)
+        self._bloc = []
+        if self._entrees_segment >= self.taille_segment:
+            self._fermer_segment()
+
+    def _fermer_segment(self):
+        if self._courant is None:
+            return
+        self._segments.append((self._premier, self._dernier, self._courant, -1))
+        self._courant = None
+        while len(self._segments) > self.segments_max:
+            os.unlink(self._segments.pop(0)[2])
+        self._ecrire_index()
+
+    def vider(self):
+        """Écrit le bloc en cours et ferme le segment courant"""
+        self._ecrire_bloc()
+        self._fermer_segment()
+
+    def instantane(self) -> Tuple[list, list]:
+        """(segments, bloc non compressé) à relire ; appelé verrou du tampon tenu, la relecture se fait sans.
+        Le segment courant n'est relu que jusqu'à sa taille actuelle : le bloc écrit ensuite est déjà dans
+        l'instantané"""
+        segments = list(self._segments)
+        if self._courant is not None:
+            segments.append((self._premier, self._dernier, self._courant, self._octets_courant))
+        return segments, list(self._bloc)
+
+    @staticmethod
+    def parcourir(instantane: Tuple[list, list], debut: Optional[float] = None,
+                  fin: Optional[float] = None) -> Iterator[dict]:
+        """Entrées archivées dans [debut, fin], dans leur ordre d'arrivée"""
+        segments, bloc = instantane
+        for premier, dernier, chemin, taille in segments:
+            if (debut is not None and dernier < debut) or (fin is not None and premier > fin):
+                continue
+            try:
+                entrees = list(_lire_segment(chemin, taille))
+            except FileNotFoundError:
+                continue  # supprimé entre-temps par la rétention
+            for entree in entrees:
+                if _dans_intervalle(horodatage(entree), debut, fin):
+                    yield entree
+        for moment, ligne in bloc:
+            if _dans_intervalle(moment, debut, fin):
+                yield json.loads(ligne)
+
+    def get_stats(self) -> dict:
+        fichiers = [chemin for _, _, chemin, _ in self._segments] + ([self._courant] if self._courant else [])
+        return {
+            'dossier': self.dossier,
+            'entrees_archivees': self.entrees,
+            'en_attente_compression': len(self._bloc),
+            'segments': len(fichiers),
+            'octets': sum(os.path.getsize(chemin) for chemin in fichiers if os.path.exists(chemin))
+        }
+
+
+def _dans_intervalle(moment: float, debut: Optional[float], fin: Optional[float]) -> bool:
+    return (debut is None or moment >= debut) and (fin is None or moment <= fin)
+
+
+class TamponLogs:
+    """Tampon circulaire des capacite derniers logs ; les entrées qui en sortent vont à l'archive si elle existe"""
+
+    def __init__(self, capacite: int = 1000, archive: Optional[ArchiveLogs] = None):
+        self.capacite = capacite
+        self.archive = archive
+        self._entrees: deque = deque(maxlen=capacite)
+        self._verrou = threading.Lock()
+        self.total = 0
+
+    def append(self, entree: dict):
+        with self._verrou:
+            if self.archive is not None and len(self._entrees) == self.capacite:
+                self.archive.ajouter([self._entrees[0]])
+            self._entrees.append(entree)
+            self.total += 1
+
+    def __len__(self) -> int:
+        return len(self._entrees)
+
+    def derniers(self, nombre: int) -> List[dict]:
+        with self._verrou:
+            debut = max(0, len(self._entrees) - nombre)
+            return [self._entrees[i] for i in range(debut, len(self._entrees))]
+
+    def rechercher(self, debut: Optional[float] = None, fin: Optional[float] = None,
+                   limite: Optional[int] = None) -> List[dict]:
+        """Entrées de [debut, fin] (horodatages Unix), archive puis mémoire, les plus anciennes d'abord.
+        Les segments sont relus hors verrou : les logs continuent d'arriver pendant la recherche"""
+        with self._verrou:
+            instantane = self.archive.instantane() if self.archive is not None else ([], [])
+            recentes = list(self._entrees)
+        resultats = []
+        for entree in itertools.chain(ArchiveLogs.parcourir(instantane, debut, fin),
+                                      (entree for entree in recentes
+                                       if _dans_intervalle(horodatage(entree), debut, fin))):
+            if limite is not None and len(resultats) >= limite:
+                break
+            resultats.append(entree)
+        return resultats
+
+    def fermer(self):
+        """Archive tout le tampon (arrêt du serveur) pour que l'archive contienne l'historique complet"""
+        with self._verrou:
+            if self.archive is None:
+                return
+            self.archive.ajouter(list(self._entrees))
+            self._entrees.clear()
+            self.archive.vider()
+
+    def get_stats(self) -> dict:
+        with self._verrou:
+            return {
+                'capacite': self.capacite,
+                'en_memoire': len(self._entrees),
+                'total': self.total,
+                'archive': self.archive.get_stats() if self.archive is not None else None
+            }
@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+"""
+Mesures de performance - Protocole SET/CDA
+Usage : python benchmark.py [scenario ...]
+"""
+
+import contextlib
+import gc
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from Crypto.Cipher import PKCS1_OAEP
+from Crypto.Hash import SHA512
+from Crypto.Random import get_random_bytes
+from Crypto.Signature import pkcs1_15
+
+from journal_banque import JournalBanque
+from pipeline_autorisations import PipelineAutorisations
+from stockage_sqlite import StockageSQLite
+from export_historique import FORMATS, exporter
+from bus_evenements import BusEvenements
+from archive_logs import ArchiveLogs, TamponLogs
+import journalisation
+from projet import *
+
+
+def chronometrer(fonction, iterations: int) -> float:
+    """Durée moyenne d'un appel, en microsecondes"""
+    debut = time.perf_counter()
+    for _ in range(iterations):
+        fonction()
+    return (time.perf_counter() - debut) / iterations * 1e6
+
+
+def afficher(titre: str, mesures: dict, unite: str = 'µs'):
+    print(f"\n{'='*70}")
+    print(f"📊 {titre}")
+    print(f"{'='*70}")
+    for nom, valeur in mesures.items():
+        print(f"   {nom:<50} {valeur:>12.1f} {unite}")
+
+
+def bench_contextes(iterations: int = 2000):
+    """Construction des objets pkcs1_15/PKCS1_OAEP à chaque appel vs contextes préparés"""
+    ca = AutoriteCertification()
+    client = Client("Bench", "4970-0000-0000-0000", ca)
+    cle = client.key
+    cle_publique_ca = ca.pub_key
+    h = SHA512.new(b"transaction")
+
+    mesures = {
+        'pkcs1_15.new (signataire)': chronometrer(lambda: pkcs1_15.new(cle), iterations),
+        'PKCS1_OAEP.new (chiffreur)': chronometrer(lambda: PKCS1_OAEP.new(cle_publique_ca), iterations),
+        'PKCS1_OAEP.new (déchiffreur)': chronometrer(lambda: PKCS1_OAEP.new(cle), iterations),
+        'contexte préparé (signataire)': chronometrer(client._signataire, iterations),
+        'contexte préparé (chiffreur)': chronometrer(lambda: client._chiffreur(cle_publique_ca), iterations),
+        'contexte préparé (déchiffreur)': chronometrer(client._dechiffreur, iterations),
+    }
+    signature = client.signer_donnee(b"transaction")
+    mesures['vérification (objet neuf)'] = chronometrer(
+        lambda: pkcs1_15.new(client.certificat.cle_publique).verify(h, signature), iterations)
+    mesures['vérification (contexte préparé)'] = chronometrer(
+        lambda: client.certificat.verificateur().verify(h, signature), iterations)
+    afficher("Contextes cryptographiques réutilisables (par transaction)", mesures)
+
+
+def bench_suites(transactions: int = 30):
+    """Génération des identités puis Client.acheter -> Marchand.traiter_commande, par suite"""
+    for nom_suite in SUITES_CRYPTO:
+        with contextlib.redirect_stdout(io.StringIO()):
+            debut = time.perf_counter()
+            ca = AutoriteCertification(suite=nom_suite)
+            banque = Banque(ca)
+            marchand = Marchand("Bench", ca, banque)
+            client = Client("Alice", "4970-1111-2222-3333", ca)
+            duree_init = (time.perf_counter() - debut) * 1e6 / 4
+            duree_achat = chronometrer(lambda: client.acheter(marchand, ["Article"], 1), transactions)
+        afficher(f"Suite {nom_suite}", {
+            'génération clés + certificat (par entité)': duree_init,
+            'achat complet (acheter -> traiter_commande)': duree_achat,
+        })
+
+
+def bench_lots(tailles=(1, 16, 256, 4096)):
+    """Débit de signature/vérification : une signature par transaction vs une signature par lot (Merkle)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        ca = AutoriteCertification()
+        client = Client("Bench", "4970-0000-0000-0000", ca)
+        marchand = Marchand("Bench", ca, Banque(ca))
+    certificat = client.certificat
+    
+    for taille in tailles:
+        donnees = [get_random_bytes(128) for _ in range(taille)]
+        echantillon = donnees[:min(taille, 64)]
+        
+        # Signature individuelle : coût mesuré sur un échantillon (une opération privée par transaction)
+        duree_unitaire = chronometrer(lambda: [client.signer_donnee(d) for d in echantillon], 1) / len(echantillon)
+        signatures_simples = [client.signer_donnee(d) for d in echantillon]
+        duree_verif_unitaire = chronometrer(
+            lambda: [marchand.verifier_signature(d, s, certificat) for d, s in zip(echantillon, signatures_simples)], 1
+        ) / len(echantillon)
+        
+        debut = time.perf_counter()
+        signatures_lot = client.signer_lot(donnees)
+        duree_lot = time.perf_counter() - debut
+        marchand._racines_verifiees.clear()
+        debut = time.perf_counter()
+        for d, s in zip(donnees, signatures_lot):
+            marchand.verifier_signature(d, s, certificat)
+        duree_verif_lot = time.perf_counter() - debut
+        
+        afficher(f"Lot de {taille} transactions (débit)", {
+            'signature individuelle': 1e6 / duree_unitaire,
+            'signature de lot (racine + preuves)': taille / duree_lot,
+            'vérification individuelle': 1e6 / duree_verif_unitaire,
+            'vérification de lot (racine vérifiée une fois)': taille / duree_verif_lot,
+        }, unite='tx/s')
+
+
+def _historique_synthetique(dossier: str, taille: int, taille_segment: int):
+    journal = JournalBanque(dossier, taille_segment=taille_segment)
+    journal.ouvrir()
+    journal.ajouter({'type': 'compte', 'carte': '4970-0000-0000-0000', 'titulaire': 'Bench', 'solde': 10 ** 9})
+    lsn = 0
+    for i in range(taille):
+        lsn = journal.ajouter({'type': 'transaction', 'transaction': {
+            'id': str(uuid.uuid4()), 'carte': '4970-0000-0000-0000', 'montant': 10, 'timestamp': time.time(),
+            'arqc': 'a' * 128, 'statut': 'approuvé', 'raison': 'Autorisation accordée'}}, durable=False)
+    journal.attendre(lsn)
+    journal.fermer()
+
+
+def bench_journal(tailles=(1000, 10000, 100000), threads: int = 8, ecritures: int = 400):
+    """Commit groupé du WAL et temps de récupération selon la taille de l'historique"""
+    with tempfile.TemporaryDirectory() as dossier:
+        journal = JournalBanque(dossier)
+        journal.ouvrir()
+        enregistrement = {'type': 'credit', 'carte': '4970-0000-0000-0000', 'montant': 1}
+        debut = time.perf_counter()
+        for _ in range(ecritures):
+            journal.ajouter(enregistrement)
+        sequentiel = ecritures / (time.perf_counter() - debut)
+        
+        def ecrire():
+            for _ in range(ecritures // threads):
+                journal.ajouter(enregistrement)
+        debut = time.perf_counter()
+        executants = [threading.Thread(target=ecrire) for _ in range(threads)]
+        for t in executants:
+            t.start()
+        for t in executants:
+            t.join()
+        concurrent = (ecritures // threads) * threads / (time.perf_counter() - debut)
+        stats = journal.get_stats()
+        journal.fermer()
+    afficher("Journal : écritures durables (fsync)", {
+        'un écrivain (un fsync par enregistrement)': sequentiel,
+        f'{threads} écrivains (commit groupé)': concurrent,
+    }, unite='enr/s')
+    print(f"   enregistrements par fsync (global) : {stats['enregistrements_par_fsync']}")
+    
+    for taille in tailles:
+        mesures, rejoues = {}, []
+        # Segment plus grand que l'historique : aucun instantané, tout le WAL est relu
+        for libelle, taille_segment in (('relecture complète du WAL', taille + 10),
+                                        ('instantané + fin du WAL', max(taille // 20, 50))):
+            with tempfile.TemporaryDirectory() as dossier:
+                _historique_synthetique(dossier, taille, taille_segment)
+                debut = time.perf_counter()
+                journal = JournalBanque(dossier)
+                etat = journal.ouvrir()
+                historique = HistoriqueTransactions(etat['historique'])
+                mesures[libelle] = (time.perf_counter() - debut) * 1000
+                assert len(historique) == etat['transactions']
+                rejoues.append(etat['lsn'] - journal.lsn_instantane)
+                journal.fermer()
+        afficher(f"Récupération d'un historique de {taille} transactions", mesures, unite='ms')
+        print(f"   enregistrements rejoués : {rejoues[0]} (sans instantané), {rejoues[1]} (avec instantané)")
+
+
+def _transactions_synthetiques(nombre: int):
+    raisons = ('Autorisation accordée', 'Fonds insuffisants', 'Carte invalide')
+    for i in range(nombre):
+        approuvee = i % 10 != 0
+        yield {
+            'id': str(uuid.uuid4()),
+            'carte': f"4970-0000-0000-{i % 500:04d}",
+            'montant': (i % 9000) / 100 + 1,
+            'timestamp': time.time(),
+            'arqc': hashlib.sha512(str(i).encode()).hexdigest() if approuvee else 'N/A',
+            'statut': 'approuvé' if approuvee else 'refusé',
+            'raison': raisons[0] if approuvee else raisons[1 + i % 2]
+        }
+
+
+def bench_memoire(tailles=(10000, 100000)):
+    """Empreinte mémoire de l'historique bancaire : liste de dicts vs stockage en colonnes"""
+    for taille in tailles:
+        memoire, parcours = {}, {}
+        for libelle, fabrique in (('liste de dicts', list), ('colonnes (HistoriqueTransactions)', HistoriqueTransactions)):
+            gc.collect()
+            tracemalloc.start()
+            historique = fabrique()
+            for transaction in _transactions_synthetiques(taille):
+                historique.append(transaction)
+            memoire[libelle] = tracemalloc.get_traced_memory()[0] / taille
+            tracemalloc.stop()
+            debut = time.perf_counter()
+            sum(t['montant'] for t in historique)
+            parcours[libelle] = (time.perf_counter() - debut) * 1e6 / taille
+            del historique
+        afficher(f"Historique de {taille} transactions : mémoire", memoire, unite='octets/ligne')
+        afficher(f"Historique de {taille} transactions : parcours complet", parcours, unite='µs/ligne')
+
+
+def bench_recherche(tailles=(10000, 100000, 1000000), iterations: int = 200):
+    """Page de 50 transactions (plus récentes d'abord) : parcours complet filtré vs recherche sur les index"""
+    for taille in tailles:
+        historique = HistoriqueTransactions(_transactions_synthetiques(taille))
+        carte = "4970-0000-0000-0042"
+        mesures = {
+            'parcours complet (ancienne /api/transactions)': chronometrer(lambda: list(historique), 1),
+            'page de 50': chronometrer(lambda: historique.rechercher(50, decroissant=True), iterations),
+            'page de 50, filtre carte': chronometrer(
+                lambda: historique.rechercher(50, decroissant=True, carte=carte), iterations),
+            'page de 50, carte + statut refusé': chronometrer(
+                lambda: historique.rechercher(50, decroissant=True, carte=carte, statut='refusé'), iterations),
+            'page de 50, montant ≥ 80€': chronometrer(
+                lambda: historique.rechercher(50, decroissant=True, montant_min=80), iterations),
+        }
+        afficher(f"Historique de {taille} transactions : requête paginée", mesures)
+        del historique
+
+
+def bench_export(taille: int = 200000):
+    """Export en flux de l'historique : débit, puis pic de mémoire (tracemalloc ralentit l'export), NDJSON et CSV"""
+    historique = HistoriqueTransactions(_transactions_synthetiques(taille))
+    debit, memoire = {}, {}
+    for format_export in FORMATS:
+        debut = time.perf_counter()
+        octets = sum(len(morceau) for morceau in exporter(historique.parcourir(), 'transactions', format_export))
+        debit[format_export] = taille / (time.perf_counter() - debut)
+        gc.collect()
+        tracemalloc.start()
+        for _ in exporter(historique.parcourir(), 'transactions', format_export):
+            pass
+        memoire[f'{format_export} ({octets // 2**20} Mio exportés)'] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    afficher(f"Export de {taille} transactions : débit", debit, unite='lignes/s')
+    afficher(f"Export de {taille} transactions : pic de mémoire", memoire, unite='Kio')
+
+
+def _demandes_autorisation(client: Client, banque: Banque, nombre: int):
+    """Paquets à clé de données unique : chaque PI coûte une opération RSA privée à la banque"""
+    demandes = []
+    for _ in range(nombre):
+        transaction_id, timestamp = str(uuid.uuid4()), time.time()
+        oi = {"items": ["Article"], "montant": 1, "client": client.nom, "timestamp": timestamp}
+        pi = {"carte": client.carte, "montant": 1, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
+        paquet = client.preparer_paquet(banque.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
+        demandes.append((paquet['payment_info_enc'], transaction_id, timestamp, paquet['certificat_client']))
+    return demandes
+
+
+def bench_autorisations(taille: int = 256, processus=(1, 2, 4)):
+    """Autorisations bancaires : verifier_paiement un par un vs verifier_paiements (pool de déchiffrement)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        ca = AutoriteCertification()
+        banque = Banque(ca)
+        client = Client("Alice", "4970-7777-8888-9999", ca)
+        mesures = {}
+        demandes = _demandes_autorisation(client, banque, taille)
+        debut = time.perf_counter()
+        for demande in demandes:
+            banque.verifier_paiement(*demande)
+        mesures['verifier_paiement (séquentiel)'] = taille / (time.perf_counter() - debut)
+        for nombre in processus:
+            demandes = _demandes_autorisation(client, banque, taille)
+            banque.verifier_paiements(demandes[:SEUIL_LOT_PARALLELE], processus=nombre)  # démarrage du pool
+            demandes = demandes[SEUIL_LOT_PARALLELE:]
+            debut = time.perf_counter()
+            resultats = banque.verifier_paiements(demandes, processus=nombre)
+            mesures[f'verifier_paiements ({nombre} processus)'] = len(demandes) / (time.perf_counter() - debut)
+            assert all(succes for succes, _, _ in resultats)
+        banque.arreter_pool()
+    afficher(f"Lot de {taille} autorisations (débit, {os.cpu_count()} cœurs disponibles)", mesures, unite='tx/s')
+
+
+def _centile(valeurs: list, rang: float) -> float:
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(rang * len(valeurs)))]
+
+
+def _charge_ouverte(soumettre, demandes: list, debit: float):
+    """Arrivées régulières à `debit` req/s, sans attendre les réponses (charge ouverte).
+    Renvoie les latences (ms, depuis l'arrivée prévue) et le débit servi (req/s)"""
+    latences = []
+    repondues = threading.Semaphore(0)
+    
+    def reponse(_, arrivee):
+        latences.append((time.perf_counter() - arrivee) * 1000)
+        repondues.release()
+    
+    debut = time.perf_counter()
+    for i, demande in enumerate(demandes):
+        arrivee = debut + i / debit
+        attente = arrivee - time.perf_counter()
+        if attente > 0:
+            time.sleep(attente)
+        soumettre(demande).add_done_callback(lambda futur, a=arrivee: reponse(futur, a))
+    for _ in demandes:
+        repondues.acquire()
+    return latences, len(demandes) / (time.perf_counter() - debut)
+
+
+def bench_pipeline(debits=(50, 100, 200, 300), nombre: int = 300, taille_lot: int = 32, delai_ms: float = 2.0):
+    """Latence p50/p99 des autorisations selon la charge offerte : un thread par requête vs micro-lots asyncio"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        ca = AutoriteCertification()
+        banque = Banque(ca)
+        client = Client("Alice", "4970-7777-8888-9999", ca)
+        requetes = ThreadPoolExecutor(max_workers=16)
+        pipeline = PipelineAutorisations(banque, taille_lot=taille_lot, delai_ms=delai_ms).demarrer()
+        
+        for debit in debits:
+            mesures = {}
+            modes = (('un thread par requête', lambda d: requetes.submit(banque.verifier_paiement, *d)),
+                     (f'micro-lots ({taille_lot} max, {delai_ms} ms)', lambda d: pipeline._deposer(d)))
+            for libelle, soumettre in modes:
+                demandes = _demandes_autorisation(client, banque, nombre)
+                latences, servi = _charge_ouverte(soumettre, demandes, debit)
+                mesures[f'{libelle} p50 (ms)'] = _centile(latences, 0.50)
+                mesures[f'{libelle} p99 (ms)'] = _centile(latences, 0.99)
+                mesures[f'{libelle} débit servi (req/s)'] = servi
+            with contextlib.redirect_stdout(sys.__stdout__):
+                afficher(f"Charge offerte : {debit} req/s ({nombre} autorisations)", mesures, unite='')
+        
+        stats = pipeline.get_stats()
+        pipeline.arreter()
+        requetes.shutdown()
+        banque.arreter_pool()
+    print(f"   micro-lots : {stats['lots']} lots, {stats['taille_moyenne_lot']} demandes par lot en moyenne, "
+          f"{stats['plus_grand_lot']} au plus")
+
+
+def bench_sqlite(taille: int = 100000, iterations: int = 2000):
+    """Stockage SQLite : insertion groupée vs unitaire, puis accès indexés sur un historique volumineux"""
+    import random
+    aleatoire = random.Random(1)
+    with tempfile.TemporaryDirectory() as dossier:
+        base = StockageSQLite(os.path.join(dossier, 'set.db'))
+        historique = base.historique_transactions()
+        debut_ts = time.time() - taille
+        lignes = [dict(t, timestamp=debut_ts + i) for i, t in enumerate(_transactions_synthetiques(taille))]
+        
+        unitaires = 500
+        debut = time.perf_counter()
+        for ligne in lignes[:unitaires]:
+            historique.append(ligne)
+        insertion_unitaire = unitaires / (time.perf_counter() - debut)
+        debut = time.perf_counter()
+        historique.extend(lignes[unitaires:])
+        insertion_groupee = (taille - unitaires) / (time.perf_counter() - debut)
+        afficher(f"SQLite : insertion de {taille} transactions (synchronous=FULL)", {
+            'append (une transaction validée par ligne)': insertion_unitaire,
+            'extend (insertion groupée, une transaction)': insertion_groupee,
+        }, unite='lignes/s')
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            ca = AutoriteCertification(stockage=base)
+            emis = [ca.emettre_certificat(f"Client{i}", ca.pub_key) for i in range(50)]
+        livre = base.grand_livre()
+        with base.transaction():
+            for i in range(10000):
+                livre.creer(f"4970-9999-{i // 10000:04d}-{i % 10000:04d}", f"T{i}", 100)
+        
+        positions = [aleatoire.randrange(taille) for _ in range(iterations)]
+        cartes = [f"4970-9999-0000-{aleatoire.randrange(10000):04d}" for _ in range(iterations)]
+        recent = debut_ts + taille - 300
+        afficher(f"SQLite : accès sur {taille} transactions, 10000 comptes", {
+            'transaction par position (clé primaire)': chronometrer(lambda: historique[positions.pop()], iterations),
+            'solde d\'un compte (clé primaire)': chronometrer(lambda: livre.solde(cartes.pop()), iterations),
+            '5 dernières minutes approuvées (index statut)': chronometrer(
+                lambda: historique.depuis(recent, 'approuvé'), 200),
+            'statistiques (compteurs tenus à l\'écriture)': chronometrer(historique.get_stats, iterations),
+            'certificat par numéro de série (cache LRU)': chronometrer(
+                lambda: ca.certificats_emis[emis[aleatoire.randrange(50)].numero_serie], iterations),
+        })
+        base.fermer()
+
+
+def bench_bus(moniteurs=(0, 1, 10, 50), evenements: int = 300):
+    """Coût d'un processus technique pour la requête : émission synchrone (export PEM, hex, un envoi par moniteur)
+    vs dépôt dans le bus d'événements. Chaque envoi est simulé par une sérialisation JSON"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        client = Client("Alice", "4970-7777-8888-9999", AutoriteCertification())
+    chiffre, signature = get_random_bytes(600), get_random_bytes(256)
+
+    def processus():
+        return {'title': 'Achat', 'steps': [{'action': 'Double signature SET'}] * 5,
+                'crypto': {'keys': {'Clé Publique Client': exporter_cle_publique(client.pub_key)[:200] + '...'},
+                           'encrypted': chiffre.hex(), 'signature': signature.hex()}}
+
+    mesures = {}
+    for nombre in moniteurs:
+        def emettre(evenement, donnees, nombre=nombre):
+            for _ in range(nombre):
+                json.dumps([evenement, donnees])
+        mesures[f'emit synchrone ({nombre} moniteurs)'] = chronometrer(
+            lambda: emettre('technical_process', processus()), evenements)
+        bus = BusEvenements(emettre).demarrer()
+        for _ in range(nombre):
+            bus.connecter()
+        mesures[f'bus.publier ({nombre} moniteurs)'] = chronometrer(
+            lambda: bus.publier('technical_process', processus, prioritaire=False), evenements)
+        bus.arreter()
+    afficher(f"Processus technique : temps passé dans la requête ({evenements} événements)", mesures)
+
+
+def bench_logs(taille: int = 200000, capacite: int = 1000):
+    """Logs : liste sans borne vs tampon circulaire (avec ou sans archive compressée) ; coût d'un ajout, puis
+    mémoire restante (tracemalloc ralentit les ajouts), puis recherche d'une minute de logs dans l'archive"""
+    debut_logs = time.time() - taille
+    entrees = [{'timestamp': datetime.fromtimestamp(debut_logs + i).isoformat(), 'type': 'transaction',
+                'actor': 'Banque', 'message': f'Transaction {i} autorisée', 'details': {}} for i in range(taille)]
+    with tempfile.TemporaryDirectory() as dossier:
+        cibles = {
+            'liste (sans borne)': lambda essai: [],
+            f'tampon circulaire ({capacite})': lambda essai: TamponLogs(capacite),
+            f'tampon circulaire ({capacite}) + archive':
+                lambda essai: TamponLogs(capacite, ArchiveLogs(os.path.join(dossier, essai), 'globaux'))
+        }
+        ajout, memoire = {}, {}
+        for nom, creer in cibles.items():
+            cible = creer('debit')
+            debut = time.perf_counter()
+            for entree in entrees:
+                cible.append(entree)
+            ajout[nom] = (time.perf_counter() - debut) / taille * 1e6
+            gc.collect()
+            tracemalloc.start()
+            cible = creer('memoire')
+            for entree in entrees:
+                cible.append(dict(entree))
+            memoire[nom] = tracemalloc.get_traced_memory()[0] / 1024
+            tracemalloc.stop()
+        afficher(f"{taille} logs : coût d'un ajout", ajout)
+        afficher(f"{taille} logs : mémoire restante", memoire, unite='Kio')
+        archive = cible.get_stats()['archive']
+        print(f"   archive : {archive['segments']} segments, {archive['octets'] // 1024} Kio")
+        milieu = debut_logs + taille / 2
+        afficher("Recherche d'une minute de logs dans l'archive", {
+            'rechercher(debut, fin)': chronometrer(lambda: cible.rechercher(milieu, milieu + 60), 20) / 1000
+        }, unite='ms')
+
+
+def bench_journalisation(iterations: int = 200000, achats: int = 100):
+    """Journalisation : coût d'une ligne de la banque (print historique, niveau désactivé, mode demo ou json),
+    puis d'un achat complet selon le mode"""
+    transaction_id = str(uuid.uuid4())
+    log = journalisation.journal('banque')
+    logger_standard = logging.getLogger('bench.standard')
+    mesures = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        mesures['print (f-string)'] = chronometrer(
+            lambda: print(f"   -> [Banque] Réception (ID: {transaction_id[:8]}...)"), iterations)
+    journalisation.configurer()
+    mesures['niveau désactivé (journal)'] = chronometrer(
+        lambda: log.debug("Réception (ID: %.8s...)", transaction_id, transaction=transaction_id), iterations)
+    mesures['niveau désactivé (logging.debug)'] = chronometrer(
+        lambda: logger_standard.debug("Réception (ID: %.8s...)", transaction_id), iterations)
+    with contextlib.redirect_stdout(io.StringIO()):
+        journalisation.configurer('demo')
+        mesures['mode demo'] = chronometrer(
+            lambda: log.debug("Réception (ID: %.8s...)", transaction_id, transaction=transaction_id), iterations // 10)
+    with tempfile.TemporaryDirectory() as dossier:
+        journalisation.configurer('json', fichier=os.path.join(dossier, 'set.ndjson'))
+        mesures['mode json (fichier)'] = chronometrer(
+            lambda: log.info("Réception (ID: %.8s...)", transaction_id, transaction=transaction_id), iterations // 10)
+        journalisation.configurer()
+    afficher("Une ligne de journal", mesures)
+
+    ca = AutoriteCertification()
+    banque = Banque(ca)
+    marchand = Marchand("Bench", ca, banque)
+    client = Client("Alice", "4970-7777-8888-9999", ca)
+    modes = {'sans sortie (avertissements)': (None, None), 'json (info)': ('json', None),
+             'json (debug)': ('json', journalisation.DEBUG), 'demo': ('demo', None)}
+    mesures = {}
+    with tempfile.TemporaryDirectory() as dossier, contextlib.redirect_stdout(io.StringIO()):
+        for nom, (mode, niveau) in modes.items():
+            journalisation.configurer(mode, niveau, os.path.join(dossier, 'set.ndjson') if mode == 'json' else None)
+            mesures[nom] = chronometrer(lambda: client.acheter(marchand, ["Article"], 1), achats // len(modes))
+        journalisation.configurer()
+    afficher("Achat complet selon le mode de journalisation", mesures)
+
+
+def bench_executeur(operations: int = 96, threads: int = 8, processus=(1, 2, 4)):
+    """Opérations RSA privées de threads de requête concurrents : sur place (GIL) vs exécuteur cryptographique"""
+    ca = AutoriteCertification()
+    banque = Banque(ca)
+    client = Client("Alice", "4970-1111-2222-3333", ca)
+    cle_banque = banque.get_cle_chiffrement()
+    chiffres = [PKCS1_OAEP.new(cle_banque).encrypt(get_random_bytes(32)) for _ in range(operations)]
+
+    def charge(executeur):
+        configurer_executeur_crypto(executeur)
+        with ThreadPoolExecutor(max_workers=threads) as requetes:
+            debut = time.perf_counter()
+            list(requetes.map(lambda i: (client.signer_donnee(b"transaction %d" % i),
+                                         banque._dechiffrer_oaep(chiffres[i])), range(operations)))
+            return operations / (time.perf_counter() - debut)
+
+    debits = {'sur place': charge(None)}
+    latences = {'sur place': chronometrer(lambda: client.signer_donnee(b"transaction"), 50)}
+    for nombre in processus:
+        executeur = ExecuteurCrypto(nombre).demarrer()
+        charge(executeur)  # démarrage des processus, clés transmises
+        debits[f'exécuteur ({nombre} processus)'] = charge(executeur)
+        latences[f'exécuteur ({nombre} processus)'] = chronometrer(lambda: client.signer_donnee(b"transaction"), 50)
+        configurer_executeur_crypto(None)
+    afficher(f"{threads} threads, signature + déchiffrement OAEP ({os.cpu_count()} cœurs disponibles)",
+             debits, unite='op/s')
+    afficher("Latence d'une signature isolée", latences)
+
+
+SCENARIOS = {
+    'contextes': bench_contextes,
+    'suites': bench_suites,
+    'lots': bench_lots,
+    'journal': bench_journal,
+    'memoire': bench_memoire,
+    'autorisations': bench_autorisations,
+    'pipeline': bench_pipeline,
+    'sqlite': bench_sqlite,
+    'recherche': bench_recherche,
+    'export': bench_export,
+    'bus': bench_bus,
+    'logs': bench_logs,
+    'journalisation': bench_journalisation,
+    'executeur': bench_executeur,
+}
+
+
+if __name__ == "__main__":
+    noms = sys.argv[1:] or list(SCENARIOS)
+    for nom in noms:
+        if nom not in SCENARIOS:
+            print(f"Scénario inconnu : {nom} (disponibles : {', '.join(SCENARIOS)})")
+            sys.exit(1)
+        SCENARIOS[nom]()
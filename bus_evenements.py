@@ -0,0 +1,174 @@
+"""
+Bus d'événements temps réel - Protocole SET/CDA
+Les requêtes déposent leurs événements (logs, alertes, processus techniques) dans une file bornée sans
+jamais attendre ; un répartiteur de fond les regroupe et les émet en un seul message WebSocket par lot.
+Sans moniteur connecté rien n'est mis en file, et les données coûteuses (clés PEM, chiffrés en hexadécimal)
+ne sont construites qu'au moment de l'émission
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from journalisation import journal
+
+EVENEMENT_LOT = 'lot_evenements'
+
+log = journal('bus', acteur='Bus')
+
+
+class BusEvenements:
+    """File bornée entre les producteurs et un répartiteur qui émet des lots EVENEMENT_LOT
+    ([{'type': ..., 'donnees': ...}, ...]). Un lot part dès qu'il contient taille_lot événements ou que le
+    premier a attendu delai_ms. Les événements prioritaires (logs, alertes) passent avant les autres ; au-delà
+    de seuil_echantillonnage de la capacité, seul un événement ordinaire sur pas_echantillonnage est gardé,
+    et une file pleine rejette les événements ordinaires ou leur cède la place d'un prioritaire"""
+
+    def __init__(self, emettre: Callable[[str, list], None], capacite: int = 1000, taille_lot: int = 100,
+                 delai_ms: float = 50.0, seuil_echantillonnage: float = 0.5, pas_echantillonnage: int = 10):
+        self.emettre = emettre
+        self.capacite = capacite
+        self.taille_lot = taille_lot
+        self.delai = delai_ms / 1000
+        self.seuil_echantillonnage = int(capacite * seuil_echantillonnage)
+        self.pas_echantillonnage = pas_echantillonnage
+        self._prioritaires: deque = deque()
+        self._ordinaires: deque = deque()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._actif = False
+        self.abonnes = 0
+        self.publies = 0
+        self.sans_abonne = 0
+        self.echantillonnes = 0
+        self.rejetes = 0
+        self.emis = 0
+        self.lots = 0
+        self.plus_grand_lot = 0
+        self.erreurs = 0
+        self._ordinaires_vus = 0
+
+    # --- Cycle de vie ---------------------------------------------------------
+
+    def demarrer(self) -> 'BusEvenements':
+        with self._condition:
+            if self._thread is not None:
+                return self
+            self._actif = True
+            self._thread = threading.Thread(target=self._repartir, name='bus-evenements', daemon=True)
+        self._thread.start()
+        return self
+
+    def arreter(self):
+        """Émet les événements encore en file puis arrête le répartiteur"""
+        with self._condition:
+            thread, self._thread = self._thread, None
+            self._actif = False
+            self._condition.notify()
+        if thread is not None:
+            thread.join()
+
+    # --- Abonnés --------------------------------------------------------------
+
+    def connecter(self):
+        with self._condition:
+            self.abonnes += 1
+
+    def deconnecter(self):
+        with self._condition:
+            self.abonnes = max(0, self.abonnes - 1)
+
+    # --- Publication ----------------------------------------------------------
+
+    def publier(self, type_evenement: str, donnees, prioritaire: bool = True) -> bool:
+        """Dépose un événement sans bloquer. donnees peut être une fonction sans argument, appelée par le
+        répartiteur seulement si l'événement est émis. Retourne False si l'événement est abandonné"""
+        with self._condition:
+            self.publies += 1
+            if not self.abonnes:
+                self.sans_abonne += 1
+                return False
+            en_file = len(self._prioritaires) + len(self._ordinaires)
+            if not prioritaire and en_file >= self.seuil_echantillonnage:
+                self._ordinaires_vus += 1
+                if self._ordinaires_vus % self.pas_echantillonnage:
+                    self.echantillonnes += 1
+                    return False
+            if en_file >= self.capacite:
+                if not prioritaire or not self._ordinaires:
+                    self.rejetes += 1
+                    return False
+                # L'événement ordinaire le plus ancien cède sa place
+                self._ordinaires.popleft()
+                self.rejetes += 1
+            (self._prioritaires if prioritaire else self._ordinaires).append((type_evenement, donnees))
+            if en_file == 0 or en_file + 1 >= self.taille_lot:
+                self._condition.notify()
+            return True
+
+    # --- Répartition ----------------------------------------------------------
+
+    def _prelever(self) -> Optional[list]:
+        """Attend le prochain lot (verrou relâché pendant l'attente) ; None à l'arrêt, file vide"""
+        with self._condition:
+            while self._actif and not (self._prioritaires or self._ordinaires):
+                self._condition.wait()
+            # Fenêtre de regroupement ouverte par le premier événement du lot
+            echeance = time.monotonic() + self.delai
+            while self._actif and len(self._prioritaires) + len(self._ordinaires) < self.taille_lot:
+                reste = echeance - time.monotonic()
+                if reste <= 0:
+                    break
+                self._condition.wait(reste)
+            lot = []
+            for file in (self._prioritaires, self._ordinaires):
+                while file and len(lot) < self.taille_lot:
+                    lot.append(file.popleft())
+            return lot or None
+
+    def _repartir(self):
+        while True:
+            lot = self._prelever()
+            if lot is None:
+                return
+            evenements = []
+            for type_evenement, donnees in lot:
+                try:
+                    evenements.append({'type': type_evenement,
+                                       'donnees': donnees() if callable(donnees) else donnees})
+                except Exception as e:
+                    self.erreurs += 1
+                    log.avertissement("⚠️ Événement '%s' ignoré : %s", type_evenement, e,
+                                      evenement=type_evenement, erreur=type(e).__name__)
+            if not evenements:
+                continue
+            try:
+                self.emettre(EVENEMENT_LOT, evenements)
+            except Exception as e:
+                self.erreurs += 1
+                log.avertissement("⚠️ Émission du lot impossible : %s", e, evenements=len(evenements),
+                                  erreur=type(e).__name__)
+                continue
+            with self._condition:
+                self.lots += 1
+                self.emis += len(evenements)
+                self.plus_grand_lot = max(self.plus_grand_lot, len(evenements))
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            return {
+                'abonnes': self.abonnes,
+                'capacite': self.capacite,
+                'delai_ms': self.delai * 1000,
+                'en_attente': len(self._prioritaires) + len(self._ordinaires),
+                'publies': self.publies,
+                'emis': self.emis,
+                'lots': self.lots,
+                'taille_moyenne_lot': round(self.emis / self.lots, 2) if self.lots else 0,
+                'plus_grand_lot': self.plus_grand_lot,
+                'sans_abonne': self.sans_abonne,
+                'echantillonnes': self.echantillonnes,
+                'rejetes': self.rejetes,
+                'erreurs': self.erreurs
+            }
@@ -0,0 +1,96 @@
+"""
+Démarrage en arrière-plan - Protocole SET/CDA
+L'initialisation du système (génération des clés RSA, certificats, comptes) est lancée une seule fois dans un
+thread de fond dès le démarrage du processus, au lieu d'être payée par le premier visiteur. Les requêtes
+attendent la fin du démarrage quelques secondes au plus ; /healthz et /readyz en publient l'avancement pour
+que les répartiteurs de charge n'envoient pas de trafic à une instance froide
+"""
+
+import threading
+import time
+import traceback
+from typing import Callable, List, Optional, Tuple
+
+EN_ATTENTE = 'en_attente'
+EN_COURS = 'en_cours'
+PRET = 'pret'
+ECHEC = 'echec'
+
+
+class Demarrage:
+    """Verrou à usage unique autour de initialiser(demarrage) : lancer() démarre le thread au premier appel
+    seulement, attendre() bloque jusqu'à la fin (ou delai secondes). initialiser annonce ses étapes avec
+    etape(nom) ; etapes_prevues sert au calcul de l'avancement. Un échec est définitif : l'instance doit
+    être redémarrée"""
+
+    def __init__(self, initialiser: Callable[['Demarrage'], None], etapes_prevues: int = 0):
+        self.initialiser = initialiser
+        self.etapes_prevues = etapes_prevues
+        self.statut = EN_ATTENTE
+        self.erreur: Optional[str] = None
+        self._etapes: List[Tuple[str, float]] = []
+        self._etape_courante: Optional[str] = None
+        self._debut: Optional[float] = None
+        self._debut_etape = 0.0
+        self._fin: Optional[float] = None
+        self._termine = threading.Event()
+        self._verrou = threading.Lock()
+
+    def lancer(self) -> 'Demarrage':
+        with self._verrou:
+            if self.statut != EN_ATTENTE:
+                return self
+            self.statut = EN_COURS
+            self._debut = self._debut_etape = time.monotonic()
+        threading.Thread(target=self._executer, name='demarrage', daemon=True).start()
+        return self
+
+    def _executer(self):
+        try:
+            self.initialiser(self)
+            statut, erreur = PRET, None
+        except Exception as e:
+            traceback.print_exc()
+            statut, erreur = ECHEC, f"{type(e).__name__}: {e}"
+        with self._verrou:
+            self._cloturer_etape()
+            self.statut, self.erreur = statut, erreur
+            self._fin = time.monotonic()
+        self._termine.set()
+
+    def etape(self, nom: str):
+        """Début d'une étape de l'initialisation ; la précédente est comptée comme terminée"""
+        with self._verrou:
+            self._cloturer_etape()
+            self._etape_courante = nom
+
+    def _cloturer_etape(self):
+        # Appelé verrou tenu
+        maintenant = time.monotonic()
+        if self._etape_courante is not None:
+            self._etapes.append((self._etape_courante, maintenant - self._debut_etape))
+            self._etape_courante = None
+        self._debut_etape = maintenant
+
+    def attendre(self, delai: Optional[float] = None) -> bool:
+        """Lance le démarrage si besoin ; True une fois le système prêt, False après delai ou en cas d'échec"""
+        self.lancer()
+        self._termine.wait(delai)
+        return self.statut == PRET
+
+    @property
+    def pret(self) -> bool:
+        return self.statut == PRET
+
+    def etat(self) -> dict:
+        with self._verrou:
+            fin = self._fin if self._fin is not None else time.monotonic()
+            return {
+                'statut': self.statut,
+                'etape': self._etape_courante,
+                'etapes_terminees': [{'nom': nom, 'duree_ms': round(duree * 1000)} for nom, duree in self._etapes],
+                'avancement': (round(min(1.0, len(self._etapes) / self.etapes_prevues), 2)
+                               if self.etapes_prevues else None),
+                'duree_s': round(fin - self._debut, 2) if self._debut is not None else 0,
+                'erreur': self.erreur
+            }
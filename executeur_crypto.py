@@ -0,0 +1,252 @@
+"""
+Exécuteur cryptographique - Protocole SET/CDA
+Les opérations RSA des requêtes (signature, déchiffrement OAEP, génération de clés) partent dans un pool de
+processus persistant au lieu de s'exécuter sous le GIL dans le thread de la requête : un thread qui attend
+son Future laisse les autres requêtes avancer et le débit suit le nombre de cœurs. Chaque processus garde
+les clés privées qu'il a déjà reçues : une demande ne transporte que l'identifiant de la clé et les données,
+et les composantes (n, e, d, p, q, u) ne repartent que vers un processus qui ne la connaît pas encore. La
+clé y est reconstruite sans le contrôle de cohérence de l'import DER
+
+    executeur = ExecuteurCrypto(processus=4).demarrer()
+    signature = executeur.signer(cle, donnees).result()
+"""
+
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from Crypto.Cipher import PKCS1_OAEP
+from Crypto.Hash import SHA512
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+
+OPERATIONS = ('signer', 'verifier', 'chiffrer', 'dechiffrer', 'generer_cle')
+CLES_MAX = 1024   # clés privées gardées par processus (et composantes côté serveur)
+
+
+class CleInconnue(KeyError):
+    """Clé demandée par son seul identifiant à un processus qui ne l'a pas (ou plus) : (identifiant, pid)"""
+
+
+# --- Côté processus du pool ---------------------------------------------------
+
+_cles_processus: "OrderedDict[int, tuple]" = OrderedDict()
+
+
+def _contextes_processus(identifiant: int, composantes: Optional[tuple]) -> tuple:
+    """(signataire, déchiffreur) de la clé, reconstruits à sa première utilisation dans ce processus ;
+    composantes None : la clé doit déjà être connue, sinon CleInconnue"""
+    contextes = _cles_processus.get(identifiant)
+    if contextes is None:
+        if composantes is None:
+            raise CleInconnue(identifiant, os.getpid())
+        cle = RSA.construct(composantes, consistency_check=False)
+        contextes = (pkcs1_15.new(cle), PKCS1_OAEP.new(cle))
+        _cles_processus[identifiant] = contextes
+        while len(_cles_processus) > CLES_MAX:
+            _cles_processus.popitem(last=False)
+    else:
+        _cles_processus.move_to_end(identifiant)
+    return contextes
+
+
+# Les opérations à clé privée renvoient (pid, résultat) : le serveur sait quels processus ont la clé
+
+def _signer(identifiant: int, composantes: Optional[tuple], donnee: bytes) -> Tuple[int, bytes]:
+    return os.getpid(), _contextes_processus(identifiant, composantes)[0].sign(SHA512.new(donnee))
+
+
+def _dechiffrer(identifiant: int, composantes: Optional[tuple], chiffre: bytes) -> Tuple[int, bytes]:
+    return os.getpid(), _contextes_processus(identifiant, composantes)[1].decrypt(chiffre)
+
+
+def _verifier(composantes_publiques: tuple, donnee: bytes, signature: bytes) -> bool:
+    try:
+        pkcs1_15.new(RSA.construct(composantes_publiques)).verify(SHA512.new(donnee), signature)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def _chiffrer(composantes_publiques: tuple, donnee: bytes) -> bytes:
+    return PKCS1_OAEP.new(RSA.construct(composantes_publiques)).encrypt(donnee)
+
+
+def _generer_cle(taille: int) -> tuple:
+    return _composantes(RSA.generate(taille))
+
+
+def _composantes(cle) -> tuple:
+    if cle.has_private():
+        return int(cle.n), int(cle.e), int(cle.d), int(cle.p), int(cle.q), int(cle.u)
+    return int(cle.n), int(cle.e)
+
+
+def _transformer(future: Future, transformation: Callable) -> Future:
+    """Future du résultat transformé (composantes -> clé), sans bloquer l'appelant"""
+    resultat = Future()
+
+    def terminer(source):
+        try:
+            resultat.set_result(transformation(source.result()))
+        except BaseException as e:
+            resultat.set_exception(e)
+    future.add_done_callback(terminer)
+    return resultat
+
+
+# --- Côté serveur -------------------------------------------------------------
+
+class ExecuteurCrypto:
+    """Pool de processus exposant signer, verifier, chiffrer, dechiffrer et generer_cle (RSA, SHA-512,
+    PKCS#1 v1.5 et OAEP) sous forme de Future. Les erreurs (chiffré invalide...) sont levées par
+    Future.result() avec le même type qu'une opération locale. Hors du processus qui l'a démarré (processus
+    forké d'un autre pool), l'exécuteur est inactif et les appelants calculent sur place"""
+
+    def __init__(self, processus: Optional[int] = None, cles_max: int = CLES_MAX):
+        self.processus = processus or os.cpu_count() or 1
+        self.cles_max = cles_max
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid = None
+        # Indexé par l'identité de l'objet clé (une RsaKey n'est pas hachable) ; la référence conservée
+        # empêche la réutilisation de l'id par une autre clé
+        self._cles: "OrderedDict[int, Tuple[object, int, tuple]]" = OrderedDict()
+        self._identifiants = itertools.count()
+        self._verrou = threading.Lock()
+        self._en_vol: set = set()
+        self.soumises = dict.fromkeys(OPERATIONS, 0)
+        self.en_cours = 0
+        self.erreurs = 0
+        self.cles_renvoyees = 0
+
+    def demarrer(self) -> 'ExecuteurCrypto':
+        with self._verrou:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processus)
+                self._pid = os.getpid()
+        return self
+
+    def arreter(self):
+        """Annule les demandes pas encore commencées et attend la fin des autres"""
+        with self._verrou:
+            executor, self._executor = self._executor, None
+            en_vol = list(self._en_vol)
+            self._cles.clear()
+        for future in en_vol:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    @property
+    def actif(self) -> bool:
+        return self._executor is not None and self._pid == os.getpid()
+
+    def _reference(self, cle) -> Tuple[int, tuple, set]:
+        """(identifiant, composantes, pid des processus qui l'ont confirmée) d'une clé privée, calculés une
+        fois par clé"""
+        with self._verrou:
+            entree = self._cles.get(id(cle))
+            if entree is None or entree[0] is not cle:
+                entree = (cle, next(self._identifiants), _composantes(cle), set())
+                self._cles[id(cle)] = entree
+                while len(self._cles) > self.cles_max:
+                    self._cles.popitem(last=False)
+            else:
+                self._cles.move_to_end(id(cle))
+            return entree[1], entree[2], entree[3]
+
+    def _soumettre(self, operation: str, fonction, *args) -> Future:
+        with self._verrou:
+            if self._executor is None:
+                raise RuntimeError("Exécuteur cryptographique arrêté")
+            future = self._executor.submit(fonction, *args)
+            self._en_vol.add(future)
+            self.soumises[operation] += 1
+            self.en_cours += 1
+        future.add_done_callback(self._terminee)
+        return future
+
+    def _terminee(self, future: Future):
+        with self._verrou:
+            self._en_vol.discard(future)
+            self.en_cours -= 1
+            if future.cancelled():
+                self.erreurs += 1
+            elif isinstance(future.exception(), CleInconnue):
+                self.cles_renvoyees += 1
+            elif future.exception() is not None:
+                self.erreurs += 1
+
+    def _soumettre_cle(self, operation: str, fonction, cle, donnee: bytes) -> Future:
+        """Composantes jointes tant que tous les processus n'ont pas confirmé la clé, l'identifiant seul
+        ensuite. Un processus qui ne la connaît pas (remplacé, ou clé évincée de son cache) répond
+        CleInconnue et la demande repart une fois avec les composantes"""
+        identifiant, composantes, confirmee_par = self._reference(cle)
+        with self._verrou:
+            jointes = composantes if len(confirmee_par) < self.processus else None
+        resultat = Future()
+
+        def copier(source: Future):
+            if resultat.done():
+                return
+            if source.cancelled():
+                resultat.cancel()
+            elif source.exception() is not None:
+                resultat.set_exception(source.exception())
+            else:
+                pid, valeur = source.result()
+                with self._verrou:
+                    confirmee_par.add(pid)
+                resultat.set_result(valeur)
+
+        def terminer(source: Future):
+            erreur = None if source.cancelled() else source.exception()
+            if not isinstance(erreur, CleInconnue):
+                copier(source)
+                return
+            with self._verrou:
+                confirmee_par.discard(erreur.args[1])
+            try:
+                relance = self._soumettre(operation, fonction, identifiant, composantes, donnee)
+            except BaseException as e:
+                resultat.set_exception(e)
+                return
+            relance.add_done_callback(copier)
+
+        self._soumettre(operation, fonction, identifiant, jointes, donnee).add_done_callback(terminer)
+        return resultat
+
+    def signer(self, cle, donnee: bytes) -> Future:
+        """Future de la signature PKCS#1 v1.5 de SHA-512(donnee)"""
+        return self._soumettre_cle('signer', _signer, cle, donnee)
+
+    def dechiffrer(self, cle, chiffre: bytes) -> Future:
+        """Future du clair RSA-OAEP ; ValueError si le chiffré est invalide"""
+        return self._soumettre_cle('dechiffrer', _dechiffrer, cle, chiffre)
+
+    def verifier(self, cle_publique, donnee: bytes, signature: bytes) -> Future:
+        """Future booléen de la vérification de signature"""
+        return self._soumettre('verifier', _verifier, _composantes(cle_publique.publickey()), donnee, signature)
+
+    def chiffrer(self, cle_publique, donnee: bytes) -> Future:
+        return self._soumettre('chiffrer', _chiffrer, _composantes(cle_publique.publickey()), donnee)
+
+    def generer_cle(self, taille: int = 2048) -> Future:
+        """Future d'une nouvelle clé RSA privée"""
+        return _transformer(self._soumettre('generer_cle', _generer_cle, taille),
+                            lambda composantes: RSA.construct(composantes, consistency_check=False))
+
+    def get_stats(self) -> dict:
+        with self._verrou:
+            return {
+                'processus': self.processus,
+                'actif': self._executor is not None,
+                'cles_connues': len(self._cles),
+                'cles_renvoyees': self.cles_renvoyees,
+                'en_cours': self.en_cours,
+                'soumises': dict(self.soumises),
+                'erreurs': self.erreurs
+            }
@@ -0,0 +1,204 @@
+"""
+Export en flux de l'historique - Protocole SET/CDA
+Transactions de la banque et commandes des marchands écrites en NDJSON ou CSV par un générateur, une page de
+lignes à la fois : la mémoire reste constante quelle que soit la taille de l'historique. Chaque ligne porte
+son curseur (rang d'enregistrement) ; un export interrompu reprend après le dernier curseur reçu
+
+    python export_historique.py transactions --base donnees_set.db --format csv --sortie transactions.csv
+    python export_historique.py commandes --marchand Amazon --url http://localhost:5000 --sortie amazon.ndjson
+    python export_historique.py transactions --url http://localhost:5000 --sortie transactions.ndjson --reprendre
+"""
+
+import argparse
+import codecs
+import csv
+import io
+import json
+import os
+import sys
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Tuple
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+LIGNES_PAR_MORCEAU = 500
+TAILLE_MORCEAU_HTTP = 64 * 1024
+
+COLONNES = {
+    'transactions': ('curseur', 'id', 'carte', 'carte_masquee', 'montant', 'timestamp', 'arqc', 'statut',
+                     'raison', 'marchand'),
+    'commandes': ('curseur', 'id', 'client', 'items', 'montant', 'timestamp', 'arqc', 'statut',
+                  'attestation_banque')
+}
+# Filtres d'égalité indexés (RegistreColonnes.INDEX) de chaque historique
+FILTRES = {'transactions': ('carte', 'statut', 'marchand'), 'commandes': ('client', 'statut')}
+
+
+def lire_horodatage(valeur: str) -> float:
+    """Date ISO 8601 (format des exports) ou horodatage Unix"""
+    try:
+        return float(valeur)
+    except ValueError:
+        return datetime.fromisoformat(valeur).timestamp()
+
+
+def masquer_carte(carte: str) -> str:
+    # Masquer la carte seulement si ce n'est pas "inconnu"
+    if carte != 'inconnu' and len(carte) >= 8:
+        return carte[:4] + '-****-****-' + carte[-4:]
+    return carte
+
+
+def transaction_publique(trans: dict) -> dict:
+    """Transaction telle que publiée par l'API : horodatage ISO et carte masquée"""
+    trans['timestamp'] = datetime.fromtimestamp(trans['timestamp']).isoformat()
+    trans['carte_masquee'] = masquer_carte(trans['carte'])
+    return trans
+
+
+def commande_publique(cmd: dict) -> dict:
+    cmd['timestamp'] = datetime.fromtimestamp(cmd['timestamp']).isoformat()
+    return cmd
+
+
+PUBLICATION = {'transactions': transaction_publique, 'commandes': commande_publique}
+
+
+def exporter(lignes: Iterable[Tuple[int, dict]], genre: str, format_export: str = 'ndjson',
+             entete: bool = True) -> Iterator[str]:
+    """Morceaux de texte pour les (rang, ligne) d'un parcourir() ; le rang est publié comme 'curseur'.
+    En CSV, les listes et objets (articles, attestation) sont écrits en JSON et les champs absents de
+    COLONNES ignorés"""
+    if format_export not in FORMATS:
+        raise ValueError(f"Format inconnu: {format_export}")
+    publier = PUBLICATION[genre]
+    tampon = io.StringIO()
+    ecrivain = None
+    if format_export == 'csv':
+        ecrivain = csv.DictWriter(tampon, fieldnames=COLONNES[genre], extrasaction='ignore', lineterminator='\n')
+        if entete:
+            ecrivain.writeheader()
+
+    for nombre, (rang, ligne) in enumerate(lignes, 1):
+        ligne = dict(curseur=rang, **publier(ligne))
+        if ecrivain is not None:
+            ecrivain.writerow({cle: json.dumps(valeur, ensure_ascii=False) if isinstance(valeur, (list, dict)) else valeur
+                               for cle, valeur in ligne.items()})
+        else:
+            tampon.write(json.dumps(ligne, ensure_ascii=False))
+            tampon.write('\n')
+        if nombre % LIGNES_PAR_MORCEAU == 0:
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate()
+    if tampon.tell():
+        yield tampon.getvalue()
+
+
+def dernier_curseur(chemin: str, format_export: str) -> Optional[int]:
+    """Curseur de la dernière ligne complète d'un export existant ; une ligne coupée par l'interruption
+    est retirée du fichier"""
+    with open(chemin, 'rb+') as f:
+        taille = f.seek(0, os.SEEK_END)
+        lecture = 4096
+        while True:
+            debut = max(0, taille - lecture)
+            f.seek(debut)
+            bloc = f.read()
+            # Deux sauts de ligne : la dernière ligne complète est entière dans le bloc
+            if bloc.count(b'\n') >= 2 or debut == 0:
+                break
+            lecture *= 2
+        if not bloc.endswith(b'\n'):
+            coupure = bloc.rfind(b'\n') + 1
+            f.truncate(debut + coupure)
+            bloc = bloc[:coupure]
+    if not bloc:
+        return None
+    derniere = bloc[:-1].split(b'\n')[-1].decode()
+    if format_export == 'csv':
+        valeur = next(csv.reader([derniere]))[0]
+        return None if valeur == 'curseur' else int(valeur)
+    return json.loads(derniere)['curseur']
+
+
+def _exporter_base(args, filtres: dict, apres: Optional[int], entete: bool) -> Iterator[str]:
+    from stockage_sqlite import StockageSQLite
+    if not os.path.exists(args.base):
+        raise SystemExit(f"❌ Base introuvable : {args.base}")
+    base = StockageSQLite(args.base)
+    registre = (base.historique_transactions() if args.genre == 'transactions'
+                else base.registre_commandes(args.marchand))
+    try:
+        yield from exporter(registre.parcourir(apres=apres, **filtres), args.genre, args.format, entete)
+    finally:
+        base.fermer()
+
+
+def _exporter_url(args, filtres: dict, apres: Optional[int], entete: bool) -> Iterator[str]:
+    chemin = '/api/export/transactions' if args.genre == 'transactions' else \
+        f"/api/export/commandes/{urllib.parse.quote(args.marchand)}"
+    parametres = dict(filtres, format=args.format, entete=int(entete))
+    if apres is not None:
+        parametres['curseur'] = apres
+    # Un caractère UTF-8 peut être à cheval sur deux morceaux
+    decodeur = codecs.getincrementaldecoder('utf-8')()
+    with urllib.request.urlopen(f"{args.url.rstrip('/')}{chemin}?{urllib.parse.urlencode(parametres)}") as reponse:
+        while True:
+            morceau = reponse.read(TAILLE_MORCEAU_HTTP)
+            yield decodeur.decode(morceau, final=not morceau)
+            if not morceau:
+                return
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export NDJSON/CSV de l'historique SET/CDA")
+    parser.add_argument('genre', choices=('transactions', 'commandes'))
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--base', help="base SQLite (SET_SQLITE) lue directement")
+    source.add_argument('--url', help="serveur Flask en cours d'exécution, par exemple http://localhost:5000")
+    parser.add_argument('--format', choices=tuple(FORMATS), default='ndjson')
+    parser.add_argument('--sortie', help="fichier de sortie (sortie standard par défaut)")
+    parser.add_argument('--reprendre', action='store_true', help="complète --sortie après son dernier curseur")
+    parser.add_argument('--curseur', type=int, help="exporte les lignes enregistrées après ce curseur")
+    parser.add_argument('--marchand', help="marchand des commandes, ou filtre des transactions")
+    parser.add_argument('--carte')
+    parser.add_argument('--client')
+    parser.add_argument('--statut')
+    parser.add_argument('--debut', type=lire_horodatage)
+    parser.add_argument('--fin', type=lire_horodatage)
+    parser.add_argument('--montant-min', type=float)
+    parser.add_argument('--montant-max', type=float)
+    args = parser.parse_args(argv)
+
+    if args.genre == 'commandes' and not args.marchand:
+        parser.error("--marchand est requis pour exporter des commandes")
+    if args.reprendre and not args.sortie:
+        parser.error("--reprendre nécessite --sortie")
+    filtres = {nom: getattr(args, nom) for nom in FILTRES[args.genre] + ('debut', 'fin', 'montant_min', 'montant_max')
+               if getattr(args, nom) is not None}
+
+    apres = args.curseur
+    entete = True
+    if args.reprendre and os.path.exists(args.sortie):
+        apres = dernier_curseur(args.sortie, args.format)
+        entete = os.path.getsize(args.sortie) == 0
+        print(f"[Export] Reprise après le curseur {apres}", file=sys.stderr)
+    exporter_source = _exporter_base if args.base else _exporter_url
+    morceaux = exporter_source(args, filtres, apres, entete)
+
+    sortie = open(args.sortie, 'a' if args.reprendre else 'w', encoding='utf-8') if args.sortie else sys.stdout
+    try:
+        for morceau in morceaux:
+            sortie.write(morceau)
+    finally:
+        if sortie is not sys.stdout:
+            sortie.close()
+    if args.sortie:
+        print(f"[Export] ✅ {args.genre} exportées dans {args.sortie} "
+              f"(dernier curseur : {dernier_curseur(args.sortie, args.format)})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
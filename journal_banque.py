@@ -0,0 +1,331 @@
+"""
+Journal d'écriture anticipée (WAL) de la banque - Protocole SET/CDA
+Les créations de compte, crédits et autorisations sont journalisés avant d'être confirmés ;
+des instantanés des soldes bornent la relecture au redémarrage à la fin du journal. Les segments repliés
+dans un instantané sont conservés comme archive de l'historique des transactions, relue en flux
+"""
+
+import itertools
+import json
+import os
+import tempfile
+import threading
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+FICHIER_INSTANTANE = 'instantane.json'
+PREFIXE_SEGMENT = 'wal-'
+PREFIXE_ARCHIVE = 'historique-'
+EXTENSION_SEGMENT = '.log'
+
+
+class JournalCorrompu(ValueError):
+    """Instantané illisible ou segment altéré ailleurs qu'en fin de journal"""
+
+
+def _etat_vide() -> dict:
+    return {'lsn': 0, 'comptes': {}, 'transactions': 0}
+
+
+def appliquer(etat: dict, enregistrement: dict):
+    """Rejoue un enregistrement sur l'état (soldes des comptes et nombre de transactions)"""
+    comptes = etat['comptes']
+    type_enr = enregistrement['type']
+    if type_enr == 'compte':
+        compte = comptes.setdefault(enregistrement['carte'], {'solde': 0, 'titulaire': enregistrement['titulaire']})
+        compte['titulaire'] = enregistrement['titulaire']
+        compte['solde'] += enregistrement['solde']
+    elif type_enr == 'credit':
+        comptes.setdefault(enregistrement['carte'], {'solde': 0, 'titulaire': None})['solde'] += enregistrement['montant']
+    elif type_enr == 'transaction':
+        transaction = enregistrement['transaction']
+        etat['transactions'] += 1
+        if transaction['statut'] == 'approuvé':
+            comptes.setdefault(transaction['carte'], {'solde': 0, 'titulaire': None})['solde'] -= transaction['montant']
+    else:
+        raise JournalCorrompu(f"Type d'enregistrement inconnu: {type_enr}")
+    etat['lsn'] = enregistrement['lsn']
+
+
+def _encoder_ligne(enregistrement: dict) -> bytes:
+    corps = json.dumps(enregistrement, separators=(',', ':')).encode()
+    return b'%08x ' % zlib.crc32(corps) + corps + b'\n'
+
+
+def _ecrire_atomique(chemin: str, contenu: bytes):
+    dossier = os.path.dirname(os.path.abspath(chemin))
+    fd, tmp = tempfile.mkstemp(dir=dossier, prefix='.instantane-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contenu)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, chemin)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    _fsync_dossier(dossier)
+
+
+def _fsync_dossier(dossier: str):
+    try:
+        fd = os.open(dossier, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class JournalBanque:
+    """WAL segmenté avec commit groupé : un seul fsync pour tous les enregistrements en attente"""
+
+    def __init__(self, dossier: str, taille_segment: int = 10000):
+        self.dossier = dossier
+        self.taille_segment = taille_segment
+        self._condition = threading.Condition()
+        self._en_attente: List[bytes] = []
+        self._prochain_lsn = 1
+        self._lsn_durable = 0
+        self._erreur: Optional[BaseException] = None
+        self._fichier = None
+        self._premier_lsn_segment = 1
+        self._enregistrements_segment = 0
+        self._ecrivain: Optional[threading.Thread] = None
+        self._arret = False
+        self._ferme = False
+        self._verrou_compaction = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        self.lsn_instantane = 0
+        self.commits = 0
+        self.enregistrements = 0
+
+    # --- Segments -----------------------------------------------------------
+
+    def _chemin_segment(self, premier_lsn: int, prefixe: str = PREFIXE_SEGMENT) -> str:
+        return os.path.join(self.dossier, f"{prefixe}{premier_lsn:012d}{EXTENSION_SEGMENT}")
+
+    def _segments(self, prefixe: str = PREFIXE_SEGMENT) -> List[Tuple[int, str]]:
+        """Segments du journal, ou de l'archive de l'historique avec PREFIXE_ARCHIVE"""
+        segments = []
+        for nom in os.listdir(self.dossier):
+            if nom.startswith(prefixe) and nom.endswith(EXTENSION_SEGMENT):
+                premier = int(nom[len(prefixe):-len(EXTENSION_SEGMENT)])
+                segments.append((premier, os.path.join(self.dossier, nom)))
+        return sorted(segments)
+
+    @staticmethod
+    def _lire_segment(chemin: str, dernier: bool) -> List[dict]:
+        """Enregistrements valides ; une fin de fichier déchirée n'est tolérée que sur le dernier segment"""
+        enregistrements = []
+        with open(chemin, 'rb') as f:
+            donnees = f.read()
+        position = 0
+        while position < len(donnees):
+            fin = donnees.find(b'\n', position)
+            ligne = donnees[position:fin] if fin >= 0 else donnees[position:]
+            try:
+                if fin < 0 or ligne[8:9] != b' ' or int(ligne[:8], 16) != zlib.crc32(ligne[9:]):
+                    raise ValueError("ligne incomplète ou CRC invalide")
+                enregistrements.append(json.loads(ligne[9:]))
+            except ValueError:
+                if not dernier:
+                    raise JournalCorrompu(f"Segment {os.path.basename(chemin)} altéré (octet {position})")
+                # Écriture interrompue par un arrêt brutal : la fin non confirmée est tronquée
+                with open(chemin, 'r+b') as f:
+                    f.truncate(position)
+                break
+            position = fin + 1
+        return enregistrements
+
+    def _lire_instantane(self) -> dict:
+        chemin = os.path.join(self.dossier, FICHIER_INSTANTANE)
+        if not os.path.exists(chemin):
+            return _etat_vide()
+        try:
+            with open(chemin, 'rb') as f:
+                contenu = json.load(f)
+            if contenu['crc'] != zlib.crc32(json.dumps(contenu['etat'], separators=(',', ':')).encode()):
+                raise ValueError("CRC invalide")
+            return contenu['etat']
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise JournalCorrompu(f"Instantané illisible: {e}")
+
+    # --- Ouverture / récupération -------------------------------------------
+
+    def ouvrir(self) -> dict:
+        """Récupération : soldes du dernier instantané + relecture des seuls enregistrements postérieurs.
+        Renvoie l'état {'lsn', 'comptes', 'transactions', 'historique'} ; lsn == 0 pour un journal neuf.
+        'historique' est un itérateur des transactions (archive puis journal) lu à la demande"""
+        os.makedirs(self.dossier, exist_ok=True)
+        etat = self._lire_instantane()
+        if 'historique' in etat:
+            etat = self._migrer_instantane(etat)
+        self.lsn_instantane = etat['lsn']
+        # Segments pas encore archivés : leurs transactions font partie de l'historique même si un
+        # instantané couvre déjà leurs soldes (arrêt entre l'instantané et l'archivage)
+        recentes = []
+        archives = [chemin for _, chemin in self._segments(PREFIXE_ARCHIVE)]
+        segments = self._segments()
+        for i, (_, chemin) in enumerate(segments):
+            for enregistrement in self._lire_segment(chemin, dernier=(i == len(segments) - 1)):
+                if enregistrement['type'] == 'transaction':
+                    recentes.append(enregistrement['transaction'])
+                if enregistrement['lsn'] > etat['lsn']:
+                    appliquer(etat, enregistrement)
+
+        self._prochain_lsn = etat['lsn'] + 1
+        self._lsn_durable = etat['lsn']
+        self._arret = self._ferme = False
+        self._ouvrir_segment(self._prochain_lsn)
+        self._ecrivain = threading.Thread(target=self._boucle_ecriture, name='journal-banque', daemon=True)
+        self._ecrivain.start()
+        etat['historique'] = itertools.chain(self._historique_archive(archives), recentes)
+        return etat
+
+    def _historique_archive(self, archives: List[str]) -> Iterator[dict]:
+        for chemin in archives:
+            for enregistrement in self._lire_segment(chemin, dernier=False):
+                if enregistrement['type'] == 'transaction':
+                    yield enregistrement['transaction']
+
+    def _migrer_instantane(self, etat: dict) -> dict:
+        """Ancien instantané contenant tout l'historique : transactions déplacées dans l'archive"""
+        historique = etat.pop('historique')
+        lignes = [_encoder_ligne({'type': 'transaction', 'transaction': transaction, 'lsn': 0})
+                  for transaction in historique]
+        _ecrire_atomique(self._chemin_segment(0, PREFIXE_ARCHIVE), b''.join(lignes))
+        etat['transactions'] = len(historique)
+        self._ecrire_instantane(etat)
+        return etat
+
+    def _ecrire_instantane(self, etat: dict):
+        corps = json.dumps(etat, separators=(',', ':'))
+        contenu = json.dumps({'crc': zlib.crc32(corps.encode()), 'etat': etat}, separators=(',', ':'))
+        _ecrire_atomique(os.path.join(self.dossier, FICHIER_INSTANTANE), contenu.encode())
+
+    def _ouvrir_segment(self, premier_lsn: int):
+        if self._fichier is not None:
+            self._fichier.close()
+        self._premier_lsn_segment = premier_lsn
+        self._enregistrements_segment = 0
+        self._fichier = open(self._chemin_segment(premier_lsn), 'ab')
+        _fsync_dossier(self.dossier)
+
+    def fermer(self):
+        with self._condition:
+            self._arret = True
+            self._condition.notify_all()
+        if self._ecrivain is not None:
+            self._ecrivain.join()
+            self._ecrivain = None
+        with self._condition:
+            # Plus d'écrivain : les attentes encore en cours doivent échouer au lieu de bloquer
+            self._ferme = True
+            self._condition.notify_all()
+        if self._compaction is not None:
+            self._compaction.join()
+        if self._fichier is not None:
+            self._fichier.close()
+            self._fichier = None
+
+    # --- Écriture (commit groupé) -------------------------------------------
+
+    def ajouter(self, enregistrement: dict, durable: bool = True) -> int:
+        """Ajoute un enregistrement ; si durable, attend qu'il soit sur disque (fsync)"""
+        with self._condition:
+            if self._erreur is not None:
+                raise IOError(f"Journal indisponible: {self._erreur}")
+            if self._arret:
+                raise IOError("Journal fermé")
+            lsn = self._prochain_lsn
+            self._prochain_lsn += 1
+            self._en_attente.append(_encoder_ligne(dict(enregistrement, lsn=lsn)))
+            self._condition.notify_all()
+        if durable:
+            self.attendre(lsn)
+        return lsn
+
+    def attendre(self, lsn: int):
+        """Bloque jusqu'à ce que l'enregistrement lsn (et tous les précédents) soit sur disque"""
+        with self._condition:
+            while self._lsn_durable < lsn and self._erreur is None and not self._ferme:
+                self._condition.wait()
+            if self._lsn_durable < lsn:
+                raise IOError(f"Journal indisponible: {self._erreur or 'journal fermé'}")
+
+    def _boucle_ecriture(self):
+        while True:
+            with self._condition:
+                while not self._en_attente and not self._arret:
+                    self._condition.wait()
+                if not self._en_attente and self._arret:
+                    return
+                lot, self._en_attente = self._en_attente, []
+                dernier_lsn = self._prochain_lsn - 1
+            try:
+                # Les appelants continuent d'empiler pendant le fsync : ils formeront le lot suivant
+                self._fichier.write(b''.join(lot))
+                self._fichier.flush()
+                os.fsync(self._fichier.fileno())
+            except OSError as e:
+                with self._condition:
+                    self._erreur = e
+                    self._condition.notify_all()
+                return
+            with self._condition:
+                self._lsn_durable = dernier_lsn
+                self.commits += 1
+                self.enregistrements += len(lot)
+                self._condition.notify_all()
+
+            self._enregistrements_segment += len(lot)
+            if self._enregistrements_segment >= self.taille_segment:
+                self._ouvrir_segment(dernier_lsn + 1)
+                self._lancer_compaction()
+
+    # --- Instantanés ----------------------------------------------------------
+
+    def _lancer_compaction(self):
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        self._compaction = threading.Thread(target=self.compacter, name='journal-compaction', daemon=True)
+        self._compaction.start()
+
+    def compacter(self) -> int:
+        """Replie les segments fermés dans un nouvel instantané des soldes, puis les archive (renommage) :
+        le coût dépend des comptes et des segments repliés, pas de la taille de l'historique.
+        L'état est reconstruit à partir du journal seul : aucune coordination avec les débits en cours"""
+        with self._verrou_compaction:
+            segment_courant = self._premier_lsn_segment
+            fermes = [(premier, chemin) for premier, chemin in self._segments() if premier < segment_courant]
+            if not fermes:
+                return self.lsn_instantane
+            etat = self._lire_instantane()
+            for _, chemin in fermes:
+                for enregistrement in self._lire_segment(chemin, dernier=False):
+                    if enregistrement['lsn'] > etat['lsn']:
+                        appliquer(etat, enregistrement)
+            self._ecrire_instantane(etat)
+            for premier, chemin in fermes:
+                os.replace(chemin, self._chemin_segment(premier, PREFIXE_ARCHIVE))
+            _fsync_dossier(self.dossier)
+            self.lsn_instantane = etat['lsn']
+            return self.lsn_instantane
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            return {
+                'lsn': self._prochain_lsn - 1,
+                'lsn_durable': self._lsn_durable,
+                'lsn_instantane': self.lsn_instantane,
+                'enregistrements': self.enregistrements,
+                'commits_fsync': self.commits,
+                'enregistrements_par_fsync': round(self.enregistrements / self.commits, 2) if self.commits else 0,
+                'segments': len(self._segments()),
+                'segments_archives': len(self._segments(PREFIXE_ARCHIVE))
+            }
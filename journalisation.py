@@ -0,0 +1,149 @@
+"""
+Journalisation structurée - Protocole SET/CDA
+Un journal par composant (ca, banque, marchand, client...) au-dessus du module logging : niveaux,
+formatage paresseux (« %s » et arguments, mis en forme seulement si le message est écrit) et champs
+structurés. Deux sorties : 'demo', l'affichage console historique (acteur entre crochets, emoji, bandeaux),
+et 'json', une ligne JSON par événement. Un niveau désactivé coûte une lecture d'attribut : sa méthode est
+remplacée par une fonction vide jusqu'à la prochaine configuration
+
+    log = journal('banque', acteur='Banque')
+    log.info("✅ Paiement autorisé. Nouveau solde: %s€", solde, transaction=transaction_id, montant=montant)
+"""
+
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import Dict, Optional
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+AVERTISSEMENT = logging.WARNING
+ERREUR = logging.ERROR
+NIVEAUX = {'debug': DEBUG, 'info': INFO, 'avertissement': AVERTISSEMENT, 'erreur': ERREUR}
+NOMS_NIVEAUX = {niveau: nom for nom, niveau in NIVEAUX.items()}
+MODES = ('demo', 'json')
+
+RACINE = 'set_cda'
+LARGEUR_BANDEAU = 70
+
+_journaux: Dict[str, 'Journal'] = {}
+_gestionnaire: Optional[logging.Handler] = None
+
+
+def _ignorer(*args, **champs):
+    pass
+
+
+class Journal:
+    """Journal d'un composant. debug, info, avertissement, erreur et bandeau (message encadré, niveau debug)
+    prennent un message, ses arguments de formatage et des champs nommés ; le champ acteur (nom de l'entité,
+    sinon celui du journal) préfixe la ligne en mode demo"""
+
+    def __init__(self, composant: str, acteur: Optional[str] = None, retrait: str = ''):
+        self.composant = composant
+        self.acteur = acteur or composant
+        self.retrait = retrait
+        self._logger = logging.getLogger(f"{RACINE}.{composant}")
+        self.actualiser()
+
+    def actualiser(self):
+        """Relie chaque niveau à l'écriture ou à la fonction vide selon le niveau configuré"""
+        for nom, niveau in NIVEAUX.items():
+            setattr(self, nom, self._ecrivain(niveau) if self._logger.isEnabledFor(niveau) else _ignorer)
+        self.bandeau = self._ecrivain(DEBUG, '=') if self._logger.isEnabledFor(DEBUG) else _ignorer
+
+    def _ecrivain(self, niveau: int, cadre: Optional[str] = None):
+        logger = self._logger
+
+        # Enregistrement construit directement : logger.log() remonterait la pile pour trouver l'appelant
+        def ecrire(message: str, *args, caractere: str = cadre, **champs):
+            logger.handle(logger.makeRecord(logger.name, niveau, '', 0, message, args, None,
+                                            extra={'champs': champs, 'acteur': self.acteur,
+                                                   'retrait': self.retrait, 'cadre': caractere}))
+        return ecrire
+
+
+def journal(composant: str, acteur: Optional[str] = None, retrait: str = '') -> Journal:
+    """Journal partagé d'un composant ; acteur par défaut et marge des lignes en mode demo"""
+    if composant not in _journaux:
+        _journaux[composant] = Journal(composant, acteur, retrait)
+    return _journaux[composant]
+
+
+class _SortieStandard(logging.StreamHandler):
+    """Écrit sur le sys.stdout du moment, y compris sous contextlib.redirect_stdout"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, valeur):
+        pass
+
+
+class FormatDemo(logging.Formatter):
+    """Affichage console historique : `[acteur] message`, bandeaux encadrés"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        acteur = getattr(record, 'champs', {}).get('acteur') or getattr(record, 'acteur', record.name)
+        ligne = f"{getattr(record, 'retrait', '')}[{acteur}] {record.getMessage()}"
+        cadre = getattr(record, 'cadre', None)
+        if cadre:
+            return f"\n{cadre * LARGEUR_BANDEAU}\n{ligne}\n{cadre * LARGEUR_BANDEAU}"
+        return ligne
+
+
+class FormatJSON(logging.Formatter):
+    """Une ligne JSON par événement : ts, niveau, composant, message puis les champs structurés"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        evenement = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(),
+            'niveau': NOMS_NIVEAUX.get(record.levelno, record.levelname.lower()),
+            'composant': record.name[len(RACINE) + 1:] if record.name.startswith(RACINE + '.') else record.name,
+            'message': record.getMessage()
+        }
+        evenement.update(getattr(record, 'champs', {}))
+        if record.exc_info:
+            evenement['exception'] = self.formatException(record.exc_info)
+        return json.dumps(evenement, ensure_ascii=False, default=str)
+
+
+def configurer(mode: Optional[str] = None, niveau: Optional[int] = None, fichier: Optional[str] = None):
+    """mode 'demo' (debug par défaut) ou 'json' (info par défaut) vers la sortie standard ou fichier ;
+    None : pas de sortie propre, avertissements et erreurs seulement (gestionnaires de logging existants)"""
+    global _gestionnaire
+    if mode is not None and mode not in MODES:
+        raise ValueError(f"Mode de journalisation inconnu: {mode} (disponibles : {', '.join(MODES)})")
+    racine = logging.getLogger(RACINE)
+    if _gestionnaire is not None:
+        racine.removeHandler(_gestionnaire)
+        _gestionnaire.close()
+        _gestionnaire = None
+
+    if mode is None:
+        racine.setLevel(niveau if niveau is not None else AVERTISSEMENT)
+        racine.propagate = True
+    else:
+        _gestionnaire = logging.FileHandler(fichier, encoding='utf-8') if fichier else _SortieStandard()
+        _gestionnaire.setFormatter(FormatDemo() if mode == 'demo' else FormatJSON())
+        racine.addHandler(_gestionnaire)
+        racine.setLevel(niveau if niveau is not None else DEBUG if mode == 'demo' else INFO)
+        racine.propagate = False
+
+    for journal_composant in _journaux.values():
+        journal_composant.actualiser()
+
+
+def configurer_depuis_environnement(defaut: Optional[str] = None):
+    """SET_JOURNALISATION (demo|json, sinon defaut), SET_JOURNALISATION_NIVEAU (debug|info|avertissement|erreur)
+    et SET_JOURNALISATION_FICHIER"""
+    niveau = os.environ.get('SET_JOURNALISATION_NIVEAU')
+    if niveau is not None and niveau not in NIVEAUX:
+        raise ValueError(f"Niveau de journalisation inconnu: {niveau}")
+    configurer(os.environ.get('SET_JOURNALISATION', defaut) or None,
+               NIVEAUX[niveau] if niveau is not None else None,
+               os.environ.get('SET_JOURNALISATION_FICHIER'))
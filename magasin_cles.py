@@ -0,0 +1,217 @@
+"""
+Magasin de clés persistant - Protocole SET/CDA
+Conserve sur disque les clés privées chiffrées, les certificats et la racine de la CA
+pour qu'un redémarrage recharge les identités existantes sans régénérer de clés RSA
+"""
+
+import base64
+import contextlib
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from Crypto.Cipher import AES
+from Crypto.Protocol.KDF import scrypt
+from Crypto.PublicKey import ECC, RSA
+from Crypto.Random import get_random_bytes
+from Crypto.Util.asn1 import DerSequence
+
+from journalisation import journal
+from projet import (AutoriteCertification, Banque, Certificat, Client, Entite, Marchand, SUITE_PAR_DEFAUT,
+                    cle_publique_de)
+
+VERSION_FORMAT = 1
+log = journal('magasin', acteur='Magasin')
+
+
+class MagasinCorrompu(ValueError):
+    """Le magasin de clés a été altéré ou la phrase secrète est incorrecte"""
+
+
+class MagasinCles:
+    def __init__(self, chemin: str, phrase_secrete: str):
+        self.chemin = chemin
+        self.phrase_secrete = phrase_secrete.encode()
+
+    def existe(self) -> bool:
+        return os.path.exists(self.chemin)
+
+    def _deriver_cles(self, sel: bytes) -> Tuple[bytes, bytes]:
+        # Une seule dérivation scrypt par chargement : clé AES + clé HMAC
+        materiel = scrypt(self.phrase_secrete, sel, 64, N=2**14, r=8, p=1)
+        return materiel[:32], materiel[32:]
+
+    @staticmethod
+    def _contenu_canonique(contenu: dict) -> bytes:
+        return json.dumps(contenu, sort_keys=True, separators=(',', ':')).encode()
+
+    @staticmethod
+    def _chiffrer_cle(cle_aes: bytes, nom: str, cle_privee) -> str:
+        cipher = AES.new(cle_aes, AES.MODE_GCM)
+        cipher.update(nom.encode())
+        if isinstance(cle_privee, RSA.RsaKey):
+            der = b'R' + cle_privee.export_key('DER')
+        else:
+            der = b'E' + cle_privee.export_key(format='DER')
+        chiffre, tag = cipher.encrypt_and_digest(der)
+        return base64.b64encode(cipher.nonce + tag + chiffre).decode()
+
+    @staticmethod
+    def _dechiffrer_cle(cle_aes: bytes, nom: str, donnees: str):
+        brut = base64.b64decode(donnees)
+        cipher = AES.new(cle_aes, AES.MODE_GCM, nonce=brut[:16])
+        cipher.update(nom.encode())
+        try:
+            der = cipher.decrypt_and_verify(brut[32:], brut[16:32])
+        except ValueError:
+            raise MagasinCorrompu(f"Clé privée de '{nom}' altérée")
+        # Préfixe de type ('R' RSA, 'E' ECC) ; sans préfixe (octet 0x30), ancienne clé RSA
+        if der[:1] in (b'R', b'E'):
+            type_cle, der = der[:1], der[1:]
+            if type_cle == b'E':
+                return ECC.import_key(der)
+        # DER PKCS#1 authentifié par GCM : on évite les tests de primalité de import_key
+        _, n, e, d, p, q = DerSequence().decode(der)[:6]
+        return RSA.construct((n, e, d, p, q), consistency_check=False)
+
+    def sauvegarder(self, ca: AutoriteCertification, entites: Dict[str, Entite], metadonnees: Optional[Dict[str, dict]] = None):
+        sel = get_random_bytes(16)
+        cle_aes, cle_hmac = self._deriver_cles(sel)
+        metadonnees = metadonnees or {}
+
+        contenu = {
+            'version': VERSION_FORMAT,
+            'suite': ca.suite.nom,
+            'ca': {
+                'cle': self._chiffrer_cle(cle_aes, ca.nom, ca.key),
+                'certificat_racine': ca.certificat_racine.exporter()
+            },
+            'certificats_emis': [c.exporter() for c in ca.certificats_emis.values()],
+            'revocations': ca.certificats_revoques.delta_depuis(0)['revocations'],
+            'entites': []
+        }
+
+        for nom, entite in entites.items():
+            if isinstance(entite, Banque):
+                type_entite = 'banque'
+            elif isinstance(entite, Marchand):
+                type_entite = 'marchand'
+            elif isinstance(entite, Client):
+                type_entite = 'client'
+            else:
+                continue
+            contenu['entites'].append({
+                'nom': entite.nom,
+                'type': type_entite,
+                'carte': getattr(entite, 'carte', None),
+                'cle': self._chiffrer_cle(cle_aes, entite.nom, entite.key),
+                'cle_chiffrement': (self._chiffrer_cle(cle_aes, entite.nom, entite.cle_chiffrement)
+                                    if entite.cle_chiffrement is not entite.key else None),
+                'numero_serie': entite.certificat.numero_serie,
+                'metadonnees': metadonnees.get(nom, {})
+            })
+
+        fichier = {
+            'sel': base64.b64encode(sel).decode(),
+            'contenu': contenu,
+            'hmac': hmac.new(cle_hmac, self._contenu_canonique(contenu), hashlib.sha512).hexdigest()
+        }
+
+        # Écriture atomique : un magasin à moitié écrit ne doit jamais remplacer l'ancien
+        dossier = os.path.dirname(os.path.abspath(self.chemin))
+        os.makedirs(dossier, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=dossier, prefix='.magasin-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(fichier, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.chemin)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def charger(self, stockage=None) -> Tuple[AutoriteCertification, Dict[str, Entite], Dict[str, dict]]:
+        """stockage : stockage_sqlite.StockageSQLite optionnel sur lequel reconstruire la CA, la banque et les marchands"""
+        try:
+            with open(self.chemin) as f:
+                fichier = json.load(f)
+            sel = base64.b64decode(fichier['sel'])
+            contenu = fichier['contenu']
+            hmac_attendu = fichier['hmac']
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise MagasinCorrompu(f"Magasin illisible: {e}")
+
+        cle_aes, cle_hmac = self._deriver_cles(sel)
+        hmac_calcule = hmac.new(cle_hmac, self._contenu_canonique(contenu), hashlib.sha512).hexdigest()
+        if not hmac.compare_digest(hmac_calcule, hmac_attendu):
+            raise MagasinCorrompu("Contrôle d'intégrité échoué (magasin altéré ou phrase secrète incorrecte)")
+
+        if contenu.get('version') != VERSION_FORMAT:
+            raise MagasinCorrompu(f"Version de format inconnue: {contenu.get('version')}")
+
+        try:
+            return self._reconstruire(cle_aes, contenu, stockage)
+        except MagasinCorrompu:
+            raise
+        except (ValueError, KeyError, TypeError) as e:
+            raise MagasinCorrompu(f"Contenu du magasin invalide: {e}")
+
+    def _reconstruire(self, cle_aes: bytes, contenu: dict, stockage=None):
+        racine = Certificat.importer(contenu['ca']['certificat_racine'])
+        cle_ca = self._dechiffrer_cle(cle_aes, racine.sujet, contenu['ca']['cle'])
+        if cle_publique_de(cle_ca) != racine.cle_publique or not racine.verifier_signature(cle_publique_de(cle_ca)):
+            raise MagasinCorrompu("Certificat racine incohérent avec la clé de la CA")
+
+        ca = AutoriteCertification(cle=cle_ca, certificat_racine=racine, suite=contenu.get('suite', SUITE_PAR_DEFAUT),
+                                   stockage=stockage)
+        # Avec un stockage en base, tous les certificats sont écrits en une seule transaction
+        with stockage.transaction() if stockage is not None else contextlib.nullcontext():
+            for data in contenu['certificats_emis']:
+                certificat = Certificat.importer(data)
+                if not certificat.verifier_signature(ca.pub_key):
+                    raise MagasinCorrompu(f"Signature du certificat {certificat.numero_serie[:8]}... invalide")
+                ca.enregistrer_certificat(certificat)
+        for revocation in contenu['revocations']:
+            ca.certificats_revoques.ajouter(revocation['numero_serie'], datetime.fromisoformat(revocation['date']))
+
+        entites: Dict[str, Entite] = {}
+        metadonnees: Dict[str, dict] = {}
+        # La banque doit exister avant les marchands qui la référencent
+        ordre = {'banque': 0, 'marchand': 1, 'client': 2}
+        banque = None
+        for data in sorted(contenu['entites'], key=lambda e: ordre[e['type']]):
+            nom = data['nom']
+            certificat = ca.certificats_emis.get(data['numero_serie'])
+            if certificat is None or certificat.sujet != nom:
+                raise MagasinCorrompu(f"Certificat de '{nom}' absent du magasin")
+            cle = self._dechiffrer_cle(cle_aes, nom, data['cle'])
+            if cle_publique_de(cle) != certificat.cle_publique:
+                raise MagasinCorrompu(f"La clé privée de '{nom}' ne correspond pas à son certificat")
+            cle_chiffrement = None
+            if data.get('cle_chiffrement'):
+                cle_chiffrement = self._dechiffrer_cle(cle_aes, nom, data['cle_chiffrement'])
+                if certificat.cle_chiffrement is None or cle_publique_de(cle_chiffrement) != certificat.cle_chiffrement:
+                    raise MagasinCorrompu(f"La clé de chiffrement de '{nom}' ne correspond pas à son certificat")
+
+            if data['type'] == 'banque':
+                banque = entite = Banque(ca, cle=cle, certificat=certificat, cle_chiffrement=cle_chiffrement,
+                                         stockage=stockage)
+            elif data['type'] == 'marchand':
+                if banque is None:
+                    raise MagasinCorrompu(f"Marchand '{nom}' sans banque dans le magasin")
+                entite = Marchand(nom, ca, banque, cle=cle, certificat=certificat, cle_chiffrement=cle_chiffrement,
+                                  stockage=stockage)
+            else:
+                entite = Client(nom, data['carte'], ca, cle=cle, certificat=certificat, cle_chiffrement=cle_chiffrement)
+            entites[nom] = entite
+            metadonnees[nom] = data.get('metadonnees', {})
+
+        log.info("✅ %d identités restaurées depuis %s", len(entites), self.chemin)
+        return ca, entites, metadonnees
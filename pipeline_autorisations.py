@@ -0,0 +1,193 @@
+"""
+Pipeline asynchrone d'autorisation - Protocole SET/CDA
+Les demandes des marchands sont déposées dans une file ; un répartiteur asyncio les regroupe en
+micro-lots (taille maximale ou délai de quelques millisecondes) envoyés à Banque.verifier_paiements,
+et chaque demande reçoit son propre futur
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+
+class PipelineArrete(RuntimeError):
+    """Demande déposée dans un pipeline non démarré ou arrêté avant son traitement"""
+
+
+class PipelineAutorisations:
+    """Répartiteur de micro-lots entre les marchands et la banque, sur sa propre boucle asyncio.
+    taille_lot et delai_ms règlent le compromis débit / latence : un lot part dès qu'il est plein ou dès
+    que sa première demande a attendu delai_ms. Tant que lots_simultanes lots sont chez la banque,
+    les demandes s'accumulent et le lot suivant grossit d'autant"""
+
+    def __init__(self, banque, taille_lot: int = 64, delai_ms: float = 2.0, lots_simultanes: int = 1,
+                 processus: Optional[int] = None):
+        self.banque = banque
+        self.taille_lot = taille_lot
+        self.delai = delai_ms / 1000
+        self.lots_simultanes = lots_simultanes
+        self.processus = processus
+        self._boucle: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executeur: Optional[ThreadPoolExecutor] = None
+        self._file: Optional[asyncio.Queue] = None
+        self._places: Optional[asyncio.Semaphore] = None
+        self._repartiteur: Optional[asyncio.Task] = None
+        self._en_vol: set = set()
+        self._arret = False
+        self._verrou_depot = threading.Lock()
+        self._verrou_stats = threading.Lock()
+        self.lots = 0
+        self.demandes = 0
+        self.plus_grand_lot = 0
+
+    # --- Cycle de vie ---------------------------------------------------------
+
+    def demarrer(self) -> 'PipelineAutorisations':
+        if self._thread is not None:
+            return self
+        self._arret = False
+        self._executeur = ThreadPoolExecutor(max_workers=self.lots_simultanes, thread_name_prefix='banque-lot')
+        self._boucle = asyncio.new_event_loop()
+        pret = threading.Event()
+        self._thread = threading.Thread(target=self._executer, args=(pret,), name='pipeline-autorisations',
+                                        daemon=True)
+        self._thread.start()
+        pret.wait()
+        return self
+
+    def _executer(self, pret: threading.Event):
+        asyncio.set_event_loop(self._boucle)
+        self._file = asyncio.Queue()
+        self._places = asyncio.Semaphore(self.lots_simultanes)
+        self._repartiteur = self._boucle.create_task(self._repartir())
+        pret.set()
+        try:
+            self._boucle.run_forever()
+        finally:
+            self._boucle.close()
+
+    def arreter(self):
+        """Termine les lots en cours ; les demandes encore en file échouent avec PipelineArrete et les
+        nouvelles sont refusées dès le début de l'arrêt"""
+        if self._thread is None:
+            return
+        with self._verrou_depot:
+            # Les dépôts déjà acceptés ont programmé leur mise en file avant la vidange ci-dessous
+            self._arret = True
+        asyncio.run_coroutine_threadsafe(self._arreter(), self._boucle).result()
+        self._boucle.call_soon_threadsafe(self._boucle.stop)
+        self._thread.join()
+        self._executeur.shutdown(wait=True)
+        self._rejeter_file()
+        self._thread = None
+        self._boucle = None
+
+    async def _arreter(self):
+        self._repartiteur.cancel()
+        try:
+            await self._repartiteur
+        except asyncio.CancelledError:
+            pass
+        if self._en_vol:
+            await asyncio.gather(*self._en_vol)
+        self._rejeter_file()
+
+    def _rejeter_file(self):
+        while not self._file.empty():
+            _, futur = self._file.get_nowait()
+            if not futur.done():
+                futur.set_exception(PipelineArrete("Pipeline d'autorisation arrêté"))
+
+    # --- Dépôt des demandes ---------------------------------------------------
+
+    def _deposer(self, demande: tuple) -> Future:
+        futur = Future()
+        with self._verrou_depot:
+            boucle = self._boucle
+            if boucle is None:
+                raise PipelineArrete("Pipeline d'autorisation non démarré")
+            if self._arret:
+                raise PipelineArrete("Pipeline d'autorisation en cours d'arrêt")
+            boucle.call_soon_threadsafe(self._file.put_nowait, (demande, futur))
+        return futur
+
+    def autoriser(self, paquet_paiement_chiffre: bytes, transaction_id: str, timestamp: float,
+                  certificat_client=None, marchand: str = '',
+                  timeout: Optional[float] = None) -> Tuple[bool, str, Optional[str]]:
+        """Même contrat que Banque.verifier_paiement ; bloque le thread appelant jusqu'à la réponse de son lot"""
+        return self._deposer((paquet_paiement_chiffre, transaction_id, timestamp, certificat_client,
+                              marchand)).result(timeout)
+
+    async def soumettre(self, paquet_paiement_chiffre: bytes, transaction_id: str, timestamp: float,
+                        certificat_client=None, marchand: str = '') -> Tuple[bool, str, Optional[str]]:
+        """Variante asynchrone de autoriser, utilisable depuis n'importe quelle boucle asyncio"""
+        futur = self._deposer((paquet_paiement_chiffre, transaction_id, timestamp, certificat_client, marchand))
+        return await asyncio.wrap_future(futur)
+
+    # --- Répartition ----------------------------------------------------------
+
+    async def _repartir(self):
+        boucle = asyncio.get_running_loop()
+        while True:
+            # Pas de nouveau lot tant que la banque est occupée : la file s'allonge et le lot suivant grossit
+            await self._places.acquire()
+            lot = []
+            try:
+                lot.append(await self._file.get())
+                echeance = boucle.time() + self.delai
+                while len(lot) < self.taille_lot:
+                    if not self._file.empty():
+                        lot.append(self._file.get_nowait())
+                        continue
+                    reste = echeance - boucle.time()
+                    if reste <= 0:
+                        break
+                    try:
+                        lot.append(await asyncio.wait_for(self._file.get(), reste))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                # Arrêt pendant la constitution du lot : ses demandes déjà retirées de la file échouent aussi
+                self._places.release()
+                for _, futur in lot:
+                    if not futur.done():
+                        futur.set_exception(PipelineArrete("Pipeline d'autorisation arrêté"))
+                raise
+            tache = boucle.create_task(self._envoyer(lot))
+            self._en_vol.add(tache)
+            tache.add_done_callback(self._en_vol.discard)
+
+    async def _envoyer(self, lot: List[tuple]):
+        try:
+            demandes = [demande for demande, _ in lot]
+            try:
+                resultats = await asyncio.get_running_loop().run_in_executor(
+                    self._executeur, self.banque.verifier_paiements, demandes, self.processus)
+            except Exception as e:
+                for _, futur in lot:
+                    if not futur.done():
+                        futur.set_exception(e)
+                return
+            for (_, futur), resultat in zip(lot, resultats):
+                if not futur.done():
+                    futur.set_result(resultat)
+            with self._verrou_stats:
+                self.lots += 1
+                self.demandes += len(lot)
+                self.plus_grand_lot = max(self.plus_grand_lot, len(lot))
+        finally:
+            self._places.release()
+
+    def get_stats(self) -> dict:
+        with self._verrou_stats:
+            return {
+                'taille_lot': self.taille_lot,
+                'delai_ms': self.delai * 1000,
+                'lots': self.lots,
+                'demandes': self.demandes,
+                'taille_moyenne_lot': round(self.demandes / self.lots, 2) if self.lots else 0,
+                'plus_grand_lot': self.plus_grand_lot,
+                'en_attente': self._file.qsize() if self._file is not None else 0
+            }
@@ -1,7 +1,9 @@
-from Crypto.PublicKey import RSA
+from Crypto.PublicKey import RSA, ECC
 from Crypto.Cipher import PKCS1_OAEP, AES
-from Crypto.Signature import pkcs1_15
+from Crypto.Signature import pkcs1_15, eddsa, DSS
 from Crypto.Hash import SHA512
+from Crypto.Protocol.DH import key_agreement
+from Crypto.Protocol.KDF import HKDF
 from Crypto.Random import get_random_bytes
 from Crypto.Util.Padding import pad, unpad
 import json
@@ -9,43 +11,342 @@ import time
 import uuid
 import hashlib
 from datetime import datetime, timedelta
-from typing import Dict, Tuple, Optional, List
+from typing import Dict, Tuple, Optional, List, Union, Iterator
 import base64
+import contextlib
+import os
+import threading
+import bisect
+import sys
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from journalisation import configurer, journal
+from executeur_crypto import ExecuteurCrypto
+
+def _generer_cle_der(taille: int) -> bytes:
+    # Exécuté dans un processus du pool : la clé transite au format DER
+    return RSA.generate(taille).export_key('DER')
+
+
+class PoolCles:
+    """Pré-génération de paires de clés RSA en arrière-plan dans un pool de processus"""
+    
+    def __init__(self, taille_cle: int = 2048, seuil_bas: int = 4, cible: int = 8, processus: Optional[int] = None):
+        self.taille_cle = taille_cle
+        self.seuil_bas = seuil_bas
+        self.cible = max(cible, seuil_bas + 1)
+        self.processus = processus
+        self._pretes: deque = deque()
+        self._en_cours: set = set()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._verrou = threading.Lock()
+        self.cles_servies = 0
+        self.pool_vide = 0
+    
+    def demarrer(self) -> 'PoolCles':
+        with self._verrou:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processus)
+            soumises = self._remplir()
+        self._suivre(soumises)
+        return self
+    
+    def arreter(self):
+        with self._verrou:
+            executor, self._executor = self._executor, None
+            en_cours, self._en_cours = self._en_cours, set()
+        for future in en_cours:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+    
+    def _remplir(self) -> list:
+        # Appelé verrou tenu : complète jusqu'à la cible et renvoie les générations soumises
+        soumises = []
+        if self._executor is None:
+            return soumises
+        while len(self._pretes) + len(self._en_cours) < self.cible:
+            future = self._executor.submit(_generer_cle_der, self.taille_cle)
+            self._en_cours.add(future)
+            soumises.append(future)
+        return soumises
+    
+    def _suivre(self, soumises: list):
+        # Appelé verrou relâché : un future déjà terminé exécute _cle_prete immédiatement, qui prend le verrou
+        for future in soumises:
+            future.add_done_callback(self._cle_prete)
+    
+    def _cle_prete(self, future):
+        with self._verrou:
+            self._en_cours.discard(future)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._pretes.append(future.result())
+    
+    def obtenir_cle(self):
+        with self._verrou:
+            der = self._pretes.popleft() if self._pretes else None
+            self.cles_servies += 1
+            if der is None:
+                self.pool_vide += 1
+            soumises = self._remplir() if len(self._pretes) <= self.seuil_bas else []
+        self._suivre(soumises)
+        if der is None:
+            return _generer_cle_sur_demande(self.taille_cle)
+        return RSA.import_key(der)
+    
+    def get_stats(self) -> dict:
+        with self._verrou:
+            return {
+                'profondeur': len(self._pretes),
+                'en_generation': len(self._en_cours),
+                'seuil_bas': self.seuil_bas,
+                'cible': self.cible,
+                'cles_servies': self.cles_servies,
+                'pool_vide': self.pool_vide
+            }
+
+
+_pool_cles: Optional[PoolCles] = None
+
+
+def configurer_pool_cles(pool: Optional[PoolCles]) -> Optional[PoolCles]:
+    global _pool_cles
+    if _pool_cles is not None and _pool_cles is not pool:
+        _pool_cles.arreter()
+    _pool_cles = pool
+    return pool
+
+
+def get_pool_cles() -> Optional[PoolCles]:
+    return _pool_cles
+
+
+_executeur_crypto: Optional[ExecuteurCrypto] = None
+
+
+def configurer_executeur_crypto(executeur: Optional[ExecuteurCrypto]) -> Optional[ExecuteurCrypto]:
+    """Opérations RSA privées des entités confiées à un pool de processus (None : calcul sur place)"""
+    global _executeur_crypto
+    if _executeur_crypto is not None and _executeur_crypto is not executeur:
+        _executeur_crypto.arreter()
+    _executeur_crypto = executeur
+    return executeur
+
+
+def get_executeur_crypto() -> Optional[ExecuteurCrypto]:
+    return _executeur_crypto
+
+
+def executeur_pour(cle) -> Optional[ExecuteurCrypto]:
+    """Exécuteur à utiliser pour cette clé : configuré, actif dans ce processus, et clé RSA"""
+    executeur = _executeur_crypto
+    if executeur is not None and executeur.actif and isinstance(cle, RSA.RsaKey):
+        return executeur
+    return None
+
+
+def _generer_cle_sur_demande(taille: int):
+    executeur = _executeur_crypto
+    if executeur is not None and executeur.actif:
+        return executeur.generer_cle(taille).result()
+    return RSA.generate(taille)
+
+
+def generer_cle_rsa(taille: int = 2048):
+    """Clé RSA prise dans le pool s'il est configuré, sinon générée par l'exécuteur ou sur place"""
+    pool = _pool_cles
+    if pool is not None and pool.taille_cle == taille:
+        return pool.obtenir_cle()
+    return _generer_cle_sur_demande(taille)
+
+
+class SuiteCrypto:
+    """Suite RSA par défaut : une clé RSA-2048 signe (PKCS#1 v1.5 / SHA-512) et déchiffre (OAEP)"""
+    nom = 'RSA-2048'
+    algorithme_signature = 'RSA-PKCS1v15-SHA512'
+    
+    def generer_cle_signature(self):
+        return generer_cle_rsa(2048)
+    
+    def generer_cle_chiffrement(self, cle_signature):
+        return cle_signature
+
+
+class SuiteEd25519(SuiteCrypto):
+    """Signatures Ed25519ph (SHA-512), chiffrement du PI par ECIES sur X25519"""
+    nom = 'Ed25519-X25519'
+    algorithme_signature = 'Ed25519'
+    
+    def generer_cle_signature(self):
+        return ECC.generate(curve='Ed25519')
+    
+    def generer_cle_chiffrement(self, cle_signature):
+        return ECC.generate(curve='Curve25519')
+
+
+class SuiteECDSA(SuiteEd25519):
+    """Signatures ECDSA P-256 (FIPS 186-3), chiffrement du PI par ECIES sur X25519"""
+    nom = 'ECDSA-P256-X25519'
+    algorithme_signature = 'ECDSA-P256'
+    
+    def generer_cle_signature(self):
+        return ECC.generate(curve='P-256')
+
+
+SUITES_CRYPTO: Dict[str, SuiteCrypto] = {
+    suite.nom: suite for suite in (SuiteCrypto(), SuiteEd25519(), SuiteECDSA())
+}
+SUITE_PAR_DEFAUT = SuiteCrypto.nom
+
+
+def get_suite_crypto(nom: str) -> SuiteCrypto:
+    if nom not in SUITES_CRYPTO:
+        raise ValueError(f"Suite cryptographique inconnue: {nom} (disponibles: {', '.join(SUITES_CRYPTO)})")
+    return SUITES_CRYPTO[nom]
+
+
+def algorithme_de_cle(cle) -> str:
+    if isinstance(cle, RSA.RsaKey):
+        return SuiteCrypto.algorithme_signature
+    if cle.curve == 'Ed25519':
+        return SuiteEd25519.algorithme_signature
+    if cle.curve == 'NIST P-256':
+        return SuiteECDSA.algorithme_signature
+    raise ValueError(f"Clé de signature non supportée: {cle.curve}")
+
+
+def nouveau_signataire(cle):
+    """Objet exposant sign(h)/verify(h, signature) pour une clé RSA, Ed25519 ou P-256"""
+    algorithme = algorithme_de_cle(cle)
+    if algorithme == SuiteEd25519.algorithme_signature:
+        return eddsa.new(cle, 'rfc8032')
+    if algorithme == SuiteECDSA.algorithme_signature:
+        return DSS.new(cle, 'fips-186-3')
+    return pkcs1_15.new(cle)
+
+
+def exporter_cle_publique(cle) -> str:
+    if isinstance(cle, RSA.RsaKey):
+        return cle.export_key().decode()
+    return cle.export_key(format='PEM')
+
+
+def importer_cle_publique(pem: str):
+    try:
+        return RSA.import_key(pem)
+    except ValueError:
+        return ECC.import_key(pem)
+
+
+def cle_publique_de(cle):
+    return cle.publickey() if isinstance(cle, RSA.RsaKey) else cle.public_key()
+
+
+_verrou_contextes = threading.Lock()
+
+
+def _contexte(cache: dict, cle, fabrique):
+    """Contexte cryptographique (signataire, vérificateur, chiffreur) créé une seule fois"""
+    contexte = cache.get(cle)
+    if contexte is None:
+        with _verrou_contextes:
+            contexte = cache.get(cle)
+            if contexte is None:
+                contexte = fabrique()
+                cache[cle] = contexte
+    return contexte
+
+
+def _contexte_pour_cle(cache: dict, prefixe: str, cle_rsa, fabrique):
+    # Indexé par l'identité de l'objet clé (sans hacher le module RSA) ;
+    # la référence conservée empêche la réutilisation de l'id par une autre clé
+    return _contexte(cache, (prefixe, id(cle_rsa)), lambda: (cle_rsa, fabrique()))[1]
+
 
 class Certificat:
-    def __init__(self, sujet: str, cle_publique, emetteur: str, validite_jours: int = 365):
+    # Champs couverts par la signature : toute modification invalide le cache TBS
+    CHAMPS_SIGNES = ('numero_serie', 'sujet', 'emetteur', 'cle_publique', 'date_creation', 'date_expiration',
+                     'algorithme', 'cle_chiffrement')
+    
+    def __init__(self, sujet: str, cle_publique, emetteur: str, validite_jours: int = 365, cle_chiffrement=None):
         self.numero_serie = str(uuid.uuid4())
         self.sujet = sujet
         self.emetteur = emetteur
         self.cle_publique = cle_publique
+        self.algorithme = algorithme_de_cle(cle_publique)
+        # Clé X25519 certifiée pour le chiffrement (suites à courbes elliptiques uniquement)
+        self.cle_chiffrement = cle_chiffrement
         self.date_creation = datetime.now()
         self.date_expiration = self.date_creation + timedelta(days=validite_jours)
         self.signature = None
         self.revoque = False
+    
+    def __setattr__(self, nom, valeur):
+        if nom in Certificat.CHAMPS_SIGNES:
+            self.__dict__.pop('_tbs', None)
+            self.__dict__.pop('_empreinte_tbs', None)
+            self.__dict__.pop('_contextes', None)
+        object.__setattr__(self, nom, valeur)
         
     def signer(self, cle_privee_emetteur):
-        data = self._get_data_to_sign()
-        h = SHA512.new(data)
-        self.signature = pkcs1_15.new(cle_privee_emetteur).sign(h)
+        executeur = executeur_pour(cle_privee_emetteur)
+        if executeur is not None:
+            self.signature = executeur.signer(cle_privee_emetteur, self._get_data_to_sign()).result()
+            return
+        h = self._get_empreinte()
+        self.signature = nouveau_signataire(cle_privee_emetteur).sign(h)
         
     def _get_data_to_sign(self) -> bytes:
-        data = {
-            'numero_serie': self.numero_serie,
-            'sujet': self.sujet,
-            'emetteur': self.emetteur,
-            'cle_publique': self.cle_publique.export_key().decode(),
-            'date_creation': self.date_creation.isoformat(),
-            'date_expiration': self.date_expiration.isoformat()
-        }
-        return json.dumps(data, sort_keys=True).encode()
+        """Encodage canonique des champs signés, calculé une seule fois puis mis en cache"""
+        tbs = self.__dict__.get('_tbs')
+        if tbs is None:
+            data = {
+                'numero_serie': self.numero_serie,
+                'sujet': self.sujet,
+                'emetteur': self.emetteur,
+                'cle_publique': exporter_cle_publique(self.cle_publique),
+                'date_creation': self.date_creation.isoformat(),
+                'date_expiration': self.date_expiration.isoformat()
+            }
+            # Champs absents pour RSA : l'encodage des certificats RSA déjà émis reste inchangé
+            if self.algorithme != SuiteCrypto.algorithme_signature:
+                data['algorithme'] = self.algorithme
+            if self.cle_chiffrement is not None:
+                data['cle_chiffrement'] = exporter_cle_publique(self.cle_chiffrement)
+            tbs = json.dumps(data, sort_keys=True).encode()
+            self.__dict__['_tbs'] = tbs
+        return tbs
+    
+    def _get_empreinte(self):
+        """Empreinte SHA-512 des données signées (mise en cache avec le TBS)"""
+        h = self.__dict__.get('_empreinte_tbs')
+        if h is None:
+            h = SHA512.new(self._get_data_to_sign())
+            self.__dict__['_empreinte_tbs'] = h
+        return h
+    
+    def _get_contextes(self) -> dict:
+        contextes = self.__dict__.get('_contextes')
+        if contextes is None:
+            contextes = self.__dict__.setdefault('_contextes', {})
+        return contextes
+    
+    def verificateur(self):
+        """Vérificateur PKCS#1 v1.5 préparé pour la clé publique du sujet"""
+        cle_publique = self.cle_publique
+        return _contexte(self._get_contextes(), 'sujet', lambda: nouveau_signataire(cle_publique))
     
     def verifier_signature(self, cle_publique_emetteur) -> bool:
         if not self.signature:
             return False
-        data = self._get_data_to_sign()
-        h = SHA512.new(data)
+        h = self._get_empreinte()
+        verificateur = _contexte_pour_cle(self._get_contextes(), 'emetteur', cle_publique_emetteur,
+                                          lambda: nouveau_signataire(cle_publique_emetteur))
         try:
-            pkcs1_15.new(cle_publique_emetteur).verify(h, self.signature)
+            verificateur.verify(h, self.signature)
             return True
         except (ValueError, TypeError):
             return False
@@ -71,21 +372,175 @@ class Certificat:
             'numero_serie': self.numero_serie,
             'sujet': self.sujet,
             'emetteur': self.emetteur,
+            'algorithme': self.algorithme,
             'date_creation': self.date_creation.isoformat(),
             'date_expiration': self.date_expiration.isoformat(),
             'revoque': self.revoque,
             'signature': base64.b64encode(self.signature).decode() if self.signature else None
         }
+    
+    def exporter(self) -> dict:
+        data = self.to_dict()
+        data['cle_publique'] = exporter_cle_publique(self.cle_publique)
+        if self.cle_chiffrement is not None:
+            data['cle_chiffrement'] = exporter_cle_publique(self.cle_chiffrement)
+        return data
+    
+    @classmethod
+    def importer(cls, data: dict) -> 'Certificat':
+        certificat = cls.__new__(cls)
+        certificat.numero_serie = data['numero_serie']
+        certificat.sujet = data['sujet']
+        certificat.emetteur = data['emetteur']
+        certificat.cle_publique = importer_cle_publique(data['cle_publique'])
+        certificat.algorithme = algorithme_de_cle(certificat.cle_publique)
+        certificat.cle_chiffrement = importer_cle_publique(data['cle_chiffrement']) if data.get('cle_chiffrement') else None
+        certificat.date_creation = datetime.fromisoformat(data['date_creation'])
+        certificat.date_expiration = datetime.fromisoformat(data['date_expiration'])
+        certificat.signature = base64.b64decode(data['signature']) if data['signature'] else None
+        certificat.revoque = data['revoque']
+        return certificat
 
 
-class AutoriteCertification:
+class ListeRevocation:
+    """CRL indexée et versionnée : numéros de série compacts (16 octets) dans un set"""
+    
     def __init__(self):
+        self._index: set = set()
+        self._journal: List[Tuple[int, str, str]] = []  # (version, numero_serie, date)
+        self._versions: List[int] = []
+        self.version = 0
+    
+    @staticmethod
+    def compacter(numero_serie: str) -> bytes:
+        try:
+            return uuid.UUID(numero_serie).bytes
+        except ValueError:
+            return numero_serie.encode()
+    
+    def ajouter(self, numero_serie: str, date_revocation: Optional[datetime] = None) -> bool:
+        compact = self.compacter(numero_serie)
+        if compact in self._index:
+            return False
+        self._index.add(compact)
+        self.version += 1
+        self._journal.append((self.version, numero_serie, (date_revocation or datetime.now()).isoformat()))
+        self._versions.append(self.version)
+        return True
+    
+    def __contains__(self, numero_serie: str) -> bool:
+        return self.compacter(numero_serie) in self._index
+    
+    def __len__(self) -> int:
+        return len(self._index)
+    
+    def __iter__(self):
+        return (numero_serie for _, numero_serie, _ in self._journal)
+    
+    def delta_depuis(self, version: int) -> dict:
+        # Le journal est trié par version : recherche dichotomique du point de départ
+        debut = bisect.bisect_right(self._versions, version)
+        return {
+            'version_base': version,
+            'version': self.version,
+            'revocations': [
+                {'numero_serie': numero_serie, 'date': date}
+                for _, numero_serie, date in self._journal[debut:]
+            ]
+        }
+    
+    def appliquer_delta(self, delta: dict) -> Tuple[bool, str]:
+        if delta['version_base'] > self.version:
+            return False, f"Delta CRL non applicable (version locale {self.version} < base {delta['version_base']})"
+        for revocation in delta['revocations']:
+            self.ajouter(revocation['numero_serie'], datetime.fromisoformat(revocation['date']))
+        self.version = max(self.version, delta['version'])
+        return True, f"CRL mise à jour (version {self.version})"
+
+
+class CacheVerificationCertificats:
+    """Cache LRU borné des vérifications de signature de certificats réussies"""
+    
+    def __init__(self, capacite: int = 4096):
+        self.capacite = capacite
+        self._entrees: "OrderedDict[Tuple[str, bytes], datetime]" = OrderedDict()
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def cle(certificat: Certificat) -> Tuple[str, bytes]:
+        # La clé lie le numéro de série au contenu signé ET à la signature
+        empreinte = hashlib.sha256(certificat._get_empreinte().digest() + certificat.signature).digest()
+        return certificat.numero_serie, empreinte
+    
+    def contient(self, certificat: Certificat) -> bool:
+        cle = self.cle(certificat)
+        with self._verrou:
+            expiration = self._entrees.get(cle)
+            if expiration is None:
+                self.misses += 1
+                return False
+            if datetime.now() > expiration:
+                del self._entrees[cle]
+                self.misses += 1
+                return False
+            self._entrees.move_to_end(cle)
+            self.hits += 1
+            return True
+    
+    def ajouter(self, certificat: Certificat):
+        cle = self.cle(certificat)
+        with self._verrou:
+            self._entrees[cle] = certificat.date_expiration
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.capacite:
+                self._entrees.popitem(last=False)
+    
+    def invalider(self, numero_serie: str):
+        with self._verrou:
+            for cle in [c for c in self._entrees if c[0] == numero_serie]:
+                del self._entrees[cle]
+    
+    def get_stats(self) -> dict:
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                'taille': len(self._entrees),
+                'capacite': self.capacite,
+                'hits': self.hits,
+                'misses': self.misses,
+                'taux_hit': self.hits / total if total else 0.0
+            }
+
+
+class AutoriteCertification:
+    log = journal('ca')
+    
+    def __init__(self, cle=None, certificat_racine: Optional[Certificat] = None, suite: str = SUITE_PAR_DEFAUT,
+                 stockage=None):
         self.nom = "Autorité de Certification SET"
-        print(f"[{self.nom}] Initialisation...")
-        self.key = RSA.generate(2048)
-        self.pub_key = self.key.publickey()
-        self.certificats_emis: Dict[str, Certificat] = {}
-        self.certificats_revoques: List[str] = []
+        self.suite = get_suite_crypto(suite)
+        self.log.debug("Initialisation (suite %s)...", self.suite.nom, acteur=self.nom)
+        self.key = cle if cle is not None else self.suite.generer_cle_signature()
+        self.pub_key = cle_publique_de(self.key)
+        # stockage_sqlite.StockageSQLite : certificats émis en base au lieu d'un dict
+        self.certificats_emis: Dict[str, Certificat] = stockage.certificats() if stockage is not None else {}
+        self.certificats_revoques = ListeRevocation()
+        # Certificats émis puis révoqués, tenu à jour à chaque émission / révocation
+        self._emis_revoques = 0
+        if stockage is not None:
+            # Révocations déjà en base : CRL reconstruite dans l'ordre de révocation
+            for numero_serie, date_revocation in self.certificats_emis.revocations():
+                self.certificats_revoques.ajouter(numero_serie, date_revocation)
+            self._emis_revoques = len(self.certificats_revoques)
+        self._verrou_stats = threading.Lock()
+        self.cache_verifications = CacheVerificationCertificats()
+        
+        if certificat_racine is not None:
+            self.certificat_racine = certificat_racine
+            self.log.info("✅ Certificat racine restauré", acteur=self.nom)
+            return
         
         self.certificat_racine = Certificat(
             sujet=self.nom,
@@ -94,24 +549,36 @@ class AutoriteCertification:
             validite_jours=3650
         )
         self.certificat_racine.signer(self.key)
-        print(f"[{self.nom}] ✅ Certificat racine auto-signé créé")
+        self.log.info("✅ Certificat racine auto-signé créé", acteur=self.nom)
     
-    def emettre_certificat(self, entite_nom: str, cle_publique, validite_jours: int = 365) -> Certificat:
-        print(f"[{self.nom}] Émission d'un certificat pour '{entite_nom}'...")
+    def emettre_certificat(self, entite_nom: str, cle_publique, validite_jours: int = 365, cle_chiffrement=None) -> Certificat:
+        self.log.debug("Émission d'un certificat pour '%s'...", entite_nom, acteur=self.nom)
         
         certificat = Certificat(
             sujet=entite_nom,
             cle_publique=cle_publique,
             emetteur=self.nom,
-            validite_jours=validite_jours
+            validite_jours=validite_jours,
+            cle_chiffrement=cle_chiffrement
         )
         
         certificat.signer(self.key)
-        self.certificats_emis[certificat.numero_serie] = certificat
+        self.enregistrer_certificat(certificat)
         
-        print(f"[{self.nom}] ✅ Certificat émis (N° {certificat.numero_serie[:8]}...)")
+        self.log.info("✅ Certificat émis (N° %.8s...)", certificat.numero_serie, acteur=self.nom, sujet=entite_nom,
+                      numero_serie=certificat.numero_serie)
         return certificat
     
+    def enregistrer_certificat(self, certificat: Certificat):
+        """Ajoute un certificat émis (nouveau ou restauré) en tenant les compteurs à jour"""
+        with self._verrou_stats:
+            precedent = self.certificats_emis.get(certificat.numero_serie)
+            if precedent is not None and precedent.revoque:
+                self._emis_revoques -= 1
+            self.certificats_emis[certificat.numero_serie] = certificat
+            if certificat.revoque:
+                self._emis_revoques += 1
+    
     def verifier_certificat(self, certificat: Certificat) -> Tuple[bool, str]:
         valide, raison = certificat.est_valide()
         if not valide:
@@ -120,90 +587,1134 @@ class AutoriteCertification:
         if certificat.numero_serie in self.certificats_revoques:
             return False, "Certificat révoqué"
         
+        if not certificat.signature:
+            return False, "Signature du certificat invalide"
+        
+        if self.cache_verifications.contient(certificat):
+            return True, "Certificat valide"
+        
         if not certificat.verifier_signature(self.pub_key):
             return False, "Signature du certificat invalide"
         
+        self.cache_verifications.ajouter(certificat)
         return True, "Certificat valide"
     
     def revoquer_certificat(self, numero_serie: str):
         if numero_serie in self.certificats_emis:
-            self.certificats_emis[numero_serie].revoquer()
-            self.certificats_revoques.append(numero_serie)
-            print(f"[{self.nom}] ⛔ Certificat {numero_serie[:8]}... révoqué")
+            certificat = self.certificats_emis[numero_serie]
+            with self._verrou_stats:
+                if not certificat.revoque:
+                    self._emis_revoques += 1
+                certificat.revoquer()
+            # Réécriture : sans effet pour un dict, persiste la révocation pour un stockage en base
+            self.certificats_emis[numero_serie] = certificat
+            self.certificats_revoques.ajouter(numero_serie)
+            self.cache_verifications.invalider(numero_serie)
+            self.log.info("⛔ Certificat %.8s... révoqué", numero_serie, acteur=self.nom, numero_serie=numero_serie)
+    
+    def emettre_crl_delta(self, depuis_version: int = 0) -> dict:
+        delta = self.certificats_revoques.delta_depuis(depuis_version)
+        delta['emetteur'] = self.nom
+        h = SHA512.new(json.dumps(delta, sort_keys=True).encode())
+        delta['signature'] = base64.b64encode(nouveau_signataire(self.key).sign(h)).decode()
+        return delta
+    
+    def verifier_crl_delta(self, delta: dict) -> bool:
+        contenu = {k: v for k, v in delta.items() if k != 'signature'}
+        h = SHA512.new(json.dumps(contenu, sort_keys=True).encode())
+        try:
+            nouveau_signataire(self.pub_key).verify(h, base64.b64decode(delta['signature']))
+            return True
+        except (ValueError, TypeError, KeyError):
+            return False
+    
+    def get_stats(self) -> dict:
+        """Compteurs de certificats en O(1)"""
+        with self._verrou_stats:
+            total = len(self.certificats_emis)
+            return {
+                'total': total,
+                'actifs': total - self._emis_revoques,
+                'revoques': len(self.certificats_revoques)
+            }
     
     def get_public_key(self):
         return self.pub_key
 
 
+# Enveloppe hybride : clé de données AES-256-GCM enveloppée par RSA-OAEP
+ENVELOPPE_UNIQUE = 0x01    # clé de données à usage unique
+ENVELOPPE_SESSION = 0x02   # clé de données réutilisée : le destinataire peut garder la clé déballée
+ECIES_UNIQUE = 0x03        # ECIES X25519 : clé éphémère à usage unique
+ECIES_SESSION = 0x04       # ECIES X25519 : clé éphémère réutilisée pour un même destinataire
+SESSION_MAX_MESSAGES = 10000
+SESSION_DUREE_MAX = 3600
+CACHE_SESSIONS_TAILLE = 1024
+
+
+def _derivation_ecies(secret: bytes, cle_ephemere: bytes) -> bytes:
+    return HKDF(secret, 32, b'', SHA512, context=b'SET-PI-ECIES' + cle_ephemere)
+
+
+def empreinte_oi(order_info: dict, transaction_id: str) -> bytes:
+    """OIMD : empreinte SHA-512 de l'Order Info, liée à l'identifiant de transaction"""
+    return SHA512.new(json.dumps(order_info, sort_keys=True).encode() + transaction_id.encode()).digest()
+
+
+def empreinte_pi(payment_info: dict) -> bytes:
+    """PIMD : empreinte SHA-512 du Payment Info en clair (encodage canonique)"""
+    return SHA512.new(json.dumps(payment_info, sort_keys=True).encode()).digest()
+
+
+def donnees_double_signature(oimd: bytes, pimd: bytes) -> bytes:
+    # signer_donnee applique SHA-512 : la signature porte sur H(H(OI) || H(PI))
+    return oimd + pimd
+
+
+def donnees_autorisation(transaction_id: str, arqc: str) -> bytes:
+    """Réponse d'autorisation attestée par la banque"""
+    return f"{transaction_id}:{arqc}".encode()
+
+
+# Signature par lot : une signature sur la racine d'un arbre de Merkle couvre N transactions.
+# Préfixes de domaine : une feuille ne peut pas passer pour un nœud interne,
+# ni une racine signée pour une donnée signée directement.
+PREFIXE_FEUILLE = b'\x00'
+PREFIXE_NOEUD = b'\x01'
+PREFIXE_RACINE = b'SET-MERKLE-RACINE'
+PROFONDEUR_MAX_MERKLE = 32
+CACHE_RACINES_TAILLE = 1024
+
+
+def _hash_feuille(donnee: bytes) -> bytes:
+    return SHA512.new(PREFIXE_FEUILLE + donnee).digest()
+
+
+def _hash_noeud(gauche: bytes, droite: bytes) -> bytes:
+    return SHA512.new(PREFIXE_NOEUD + gauche + droite).digest()
+
+
+class ArbreMerkle:
+    """Arbre de Merkle SHA-512 construit sur les données d'un lot"""
+
+    def __init__(self, donnees: List[bytes]):
+        if not donnees:
+            raise ValueError("Lot vide")
+        niveau = [_hash_feuille(d) for d in donnees]
+        self.niveaux = [niveau]
+        while len(niveau) > 1:
+            suivant = [_hash_noeud(niveau[i], niveau[i + 1]) for i in range(0, len(niveau) - 1, 2)]
+            if len(niveau) % 2:
+                # Nœud impair promu tel quel (pas de duplication de feuille)
+                suivant.append(niveau[-1])
+            self.niveaux.append(suivant)
+            niveau = suivant
+        self.racine = niveau[0]
+
+    def __len__(self):
+        return len(self.niveaux[0])
+
+    def preuve(self, index: int) -> List[Tuple[bool, bytes]]:
+        """Chemin d'inclusion : (voisin à gauche ?, empreinte du voisin) de la feuille vers la racine"""
+        chemin = []
+        for niveau in self.niveaux[:-1]:
+            voisin = index ^ 1
+            if voisin < len(niveau):
+                chemin.append((voisin < index, niveau[voisin]))
+            index //= 2
+        return chemin
+
+    @staticmethod
+    def racine_depuis_preuve(donnee: bytes, chemin: List[Tuple[bool, bytes]]) -> bytes:
+        h = _hash_feuille(donnee)
+        for a_gauche, voisin in chemin:
+            h = _hash_noeud(voisin, h) if a_gauche else _hash_noeud(h, voisin)
+        return h
+
+
+class SignatureLot:
+    """Signature de la racine d'un lot et preuve d'inclusion d'une transaction"""
+
+    def __init__(self, signature_racine: bytes, chemin: List[Tuple[bool, bytes]], taille_lot: int):
+        self.signature_racine = signature_racine
+        self.chemin = chemin
+        self.taille_lot = taille_lot
+
+    def exporter(self) -> dict:
+        return {
+            'signature_racine': base64.b64encode(self.signature_racine).decode(),
+            'chemin': [[a_gauche, base64.b64encode(voisin).decode()] for a_gauche, voisin in self.chemin],
+            'taille_lot': self.taille_lot
+        }
+
+    @classmethod
+    def importer(cls, data: dict) -> 'SignatureLot':
+        chemin = [(bool(a_gauche), base64.b64decode(voisin)) for a_gauche, voisin in data['chemin']]
+        return cls(base64.b64decode(data['signature_racine']), chemin, int(data['taille_lot']))
+
+
+def encoder_signature(signature) -> object:
+    """Forme JSON d'une signature simple (base64) ou d'une signature de lot (dict)"""
+    if isinstance(signature, SignatureLot):
+        return signature.exporter()
+    return base64.b64encode(signature).decode()
+
+
+def decoder_signature(valeur):
+    if isinstance(valeur, dict):
+        return SignatureLot.importer(valeur)
+    return base64.b64decode(valeur)
+
+
+# Tolérance d'horodatage de verifier_anti_rejeu, en secondes
+TOLERANCE_HORODATAGE = 300
+
+
+class FenetreAntiRejeu:
+    """Identifiants de transaction vus, rangés dans des seaux par tranche d'horodatage.
+    Un seau est supprimé d'un bloc dès que tous ses horodatages sortent de la tolérance :
+    la mémoire est bornée par débit x fenêtre et non par la durée de fonctionnement"""
+    
+    def __init__(self, tolerance: float = TOLERANCE_HORODATAGE, largeur_seau: float = 30, horloge=time.time):
+        self.tolerance = tolerance
+        self.largeur_seau = largeur_seau
+        self._horloge = horloge
+        self._seaux: Dict[int, set] = {}
+        self._verrou = threading.Lock()
+        self._prochaine_purge = 0.0
+    
+    @staticmethod
+    def compacter(transaction_id: str) -> int:
+        """Identifiant sur 128 bits : l'UUID lui-même, sinon une empreinte BLAKE2b de 16 octets"""
+        try:
+            identifiant = uuid.UUID(transaction_id)
+            if str(identifiant) == transaction_id:
+                return identifiant.int
+        except (ValueError, TypeError, AttributeError):
+            pass
+        return int.from_bytes(hashlib.blake2b(str(transaction_id).encode(), digest_size=16).digest(), 'big')
+    
+    def _purger(self, maintenant: float):
+        # Appelé verrou tenu ; le seau b couvre [b*largeur, (b+1)*largeur[
+        if maintenant < self._prochaine_purge:
+            return
+        limite = maintenant - self.tolerance
+        for seau in [b for b in self._seaux if (b + 1) * self.largeur_seau <= limite]:
+            del self._seaux[seau]
+        self._prochaine_purge = maintenant + self.largeur_seau / 2
+    
+    def __contains__(self, transaction_id: str) -> bool:
+        compact = self.compacter(transaction_id)
+        with self._verrou:
+            self._purger(self._horloge())
+            # Tous les seaux vivants : un rejeu avec un horodatage différent reste détecté
+            return any(compact in seau for seau in self._seaux.values())
+    
+    def ajouter(self, transaction_id: str, timestamp: float) -> bool:
+        """Enregistre l'identifiant ; False s'il était déjà présent (réservation atomique) ou si son
+        horodatage dépasse maintenant + tolérance"""
+        compact = self.compacter(transaction_id)
+        with self._verrou:
+            maintenant = self._horloge()
+            self._purger(maintenant)
+            if any(compact in seau for seau in self._seaux.values()):
+                return False
+            if timestamp > maintenant + self.tolerance:
+                # Refusé sans être rangé : un seau lointain ne serait jamais purgé, et l'identifiant
+                # redeviendrait rejouable une fois ce seau enfin expiré
+                return False
+            if timestamp < maintenant - self.tolerance:
+                # Déjà hors tolérance : verifier_anti_rejeu le refusera de toute façon
+                return True
+            self._seaux.setdefault(int(timestamp // self.largeur_seau), set()).add(compact)
+            return True
+    
+    def retirer(self, transaction_id: str):
+        compact = self.compacter(transaction_id)
+        with self._verrou:
+            for seau in self._seaux.values():
+                seau.discard(compact)
+    
+    def __len__(self) -> int:
+        with self._verrou:
+            return sum(len(seau) for seau in self._seaux.values())
+    
+    def get_stats(self) -> dict:
+        with self._verrou:
+            return {'identifiants': sum(len(seau) for seau in self._seaux.values()), 'seaux': len(self._seaux)}
+
+
 class Entite:
-    def __init__(self, nom: str, ca: AutoriteCertification):
+    log = journal('entite')
+    
+    def __init__(self, nom: str, ca: AutoriteCertification, cle=None, certificat: Optional[Certificat] = None,
+                 cle_chiffrement=None):
         self.nom = nom
         self.ca = ca
-        print(f"[{self.nom}] Génération des clés RSA...")
-        self.key = RSA.generate(2048)
-        self.pub_key = self.key.publickey()
+        self.suite = ca.suite
+        if cle is None:
+            self.log.debug("Génération des clés (%s)...", self.suite.nom, acteur=self.nom)
+            cle = self.suite.generer_cle_signature()
+            cle_chiffrement = self.suite.generer_cle_chiffrement(cle)
+        self.key = cle
+        self.pub_key = cle_publique_de(self.key)
+        # Même objet que self.key pour RSA, clé X25519 distincte pour les suites ECC
+        self.cle_chiffrement = cle_chiffrement if cle_chiffrement is not None else cle
+        self._cle_chiffrement_publique = cle_publique_de(self.cle_chiffrement) if self.cle_chiffrement is not cle else self.pub_key
         
-        self.certificat = self.ca.emettre_certificat(self.nom, self.pub_key)
-        self.transactions_vues: set = set()
+        if certificat is None:
+            cle_chiffrement_certifiee = None if self.cle_chiffrement is self.key else self._cle_chiffrement_publique
+            certificat = self.ca.emettre_certificat(self.nom, self.pub_key, cle_chiffrement=cle_chiffrement_certifiee)
+        self.certificat = certificat
+        self.transactions_vues = FenetreAntiRejeu()
+        self._sessions_envoi: Dict[Tuple[int, int], list] = {}
+        self._sessions_recues: "OrderedDict[bytes, bytes]" = OrderedDict()
+        self._verrou_sessions = threading.Lock()
+        self._contextes: dict = {}
+        # Racines de lot déjà vérifiées : une seule vérification de signature par lot
+        self._racines_verifiees: "OrderedDict[tuple, bool]" = OrderedDict()
         
     def get_public_key(self):
         return self.pub_key
     
+    def get_cle_chiffrement(self):
+        """Clé publique à utiliser pour chiffrer à destination de cette entité"""
+        return self._cle_chiffrement_publique
+    
     def get_certificat(self) -> Certificat:
         return self.certificat
     
+    def _signataire(self):
+        return _contexte(self._contextes, 'signataire', lambda: nouveau_signataire(self.key))
+    
+    def _dechiffreur(self):
+        return _contexte(self._contextes, 'dechiffreur', lambda: PKCS1_OAEP.new(self.cle_chiffrement))
+    
+    def _chiffreur(self, cle_publique_destinataire):
+        return _contexte_pour_cle(self._contextes, 'chiffreur', cle_publique_destinataire,
+                                  lambda: PKCS1_OAEP.new(cle_publique_destinataire))
+    
     def signer_donnee(self, donnee_bytes: bytes) -> bytes:
+        executeur = executeur_pour(self.key)
+        if executeur is not None:
+            return executeur.signer(self.key, donnee_bytes).result()
         h =SHA512.new(donnee_bytes)
-        return pkcs1_15.new(self.key).sign(h)
+        return self._signataire().sign(h)
+    
+    def signer_lot(self, donnees: List[bytes]) -> List[SignatureLot]:
+        """Une seule signature sur la racine de Merkle ; chaque donnée reçoit sa preuve d'inclusion"""
+        arbre = ArbreMerkle(donnees)
+        signature_racine = self.signer_donnee(PREFIXE_RACINE + arbre.racine)
+        return [SignatureLot(signature_racine, arbre.preuve(i), len(arbre)) for i in range(len(arbre))]
     
-    def verifier_signature(self, donnee_bytes: bytes, signature: bytes, certificat: Certificat) -> Tuple[bool, str]:
+    def verifier_signature(self, donnee_bytes: bytes, signature: Union[bytes, SignatureLot],
+                           certificat: Certificat) -> Tuple[bool, str]:
         valide, raison = self.ca.verifier_certificat(certificat)
         if not valide:
             return False, f"Certificat invalide: {raison}"
         
+        if isinstance(signature, SignatureLot):
+            return self._verifier_signature_lot(donnee_bytes, signature, certificat)
+        
         h =SHA512.new(donnee_bytes)
         try:
-            pkcs1_15.new(certificat.cle_publique).verify(h, signature)
+            certificat.verificateur().verify(h, signature)
             return True, "Signature valide"
         except (ValueError, TypeError):
             return False, "Signature cryptographique invalide"
     
-    def chiffrer_pour(self, message_bytes: bytes, cle_publique_destinataire) -> bytes:
-        cipher = PKCS1_OAEP.new(cle_publique_destinataire)
-        return cipher.encrypt(message_bytes)
+    def _verifier_signature_lot(self, donnee_bytes: bytes, signature: SignatureLot,
+                                certificat: Certificat) -> Tuple[bool, str]:
+        if len(signature.chemin) > PROFONDEUR_MAX_MERKLE:
+            return False, "Preuve d'inclusion invalide"
+        racine = ArbreMerkle.racine_depuis_preuve(donnee_bytes, signature.chemin)
+        cle_cache = (certificat.numero_serie, racine, signature.signature_racine)
+        with self._verrou_sessions:
+            if cle_cache in self._racines_verifiees:
+                self._racines_verifiees.move_to_end(cle_cache)
+                return True, "Signature de lot valide"
+        
+        try:
+            certificat.verificateur().verify(SHA512.new(PREFIXE_RACINE + racine), signature.signature_racine)
+        except (ValueError, TypeError):
+            return False, "Signature de lot invalide (preuve d'inclusion ou racine)"
+        
+        with self._verrou_sessions:
+            self._racines_verifiees[cle_cache] = True
+            while len(self._racines_verifiees) > CACHE_RACINES_TAILLE:
+                self._racines_verifiees.popitem(last=False)
+        return True, "Signature de lot valide"
+    
+    def _nouvelle_cle_donnees(self, cle_publique_destinataire) -> Tuple[bytes, bytes]:
+        """Clé de données AES et sa forme transmise : enveloppe RSA-OAEP ou clé éphémère X25519"""
+        if isinstance(cle_publique_destinataire, RSA.RsaKey):
+            cle_donnees = get_random_bytes(32)
+            return cle_donnees, self._chiffreur(cle_publique_destinataire).encrypt(cle_donnees)
+        ephemere = ECC.generate(curve='Curve25519')
+        cle_ephemere = ephemere.public_key().export_key(format='DER')
+        cle_donnees = key_agreement(eph_priv=ephemere, static_pub=cle_publique_destinataire,
+                                    kdf=lambda secret: _derivation_ecies(secret, cle_ephemere))
+        return cle_donnees, cle_ephemere
+    
+    def _cle_de_session(self, cle_publique_destinataire) -> Tuple[bytes, bytes]:
+        maintenant = time.time()
+        with self._verrou_sessions:
+            session = self._sessions_envoi.get(id(cle_publique_destinataire))
+            if (session is None or session[4] is not cle_publique_destinataire
+                    or session[2] >= SESSION_MAX_MESSAGES or maintenant - session[3] > SESSION_DUREE_MAX):
+                cle_donnees, cle_enveloppee = self._nouvelle_cle_donnees(cle_publique_destinataire)
+                session = [cle_donnees, cle_enveloppee, 0, maintenant, cle_publique_destinataire]
+                self._sessions_envoi[id(cle_publique_destinataire)] = session
+            session[2] += 1
+            return session[0], session[1]
+    
+    def chiffrer_pour(self, message_bytes: bytes, cle_publique_destinataire, session: bool = False) -> bytes:
+        """Enveloppe hybride : AES-256-GCM pour les données, RSA-OAEP ou ECIES X25519 pour la clé de données"""
+        rsa = isinstance(cle_publique_destinataire, RSA.RsaKey)
+        if session:
+            mode = ENVELOPPE_SESSION if rsa else ECIES_SESSION
+            cle_donnees, cle_enveloppee = self._cle_de_session(cle_publique_destinataire)
+        else:
+            mode = ENVELOPPE_UNIQUE if rsa else ECIES_UNIQUE
+            cle_donnees, cle_enveloppee = self._nouvelle_cle_donnees(cle_publique_destinataire)
+        
+        entete = bytes([mode]) + len(cle_enveloppee).to_bytes(2, 'big') + cle_enveloppee
+        cipher = AES.new(cle_donnees, AES.MODE_GCM, nonce=get_random_bytes(12))
+        cipher.update(entete)
+        chiffre, tag = cipher.encrypt_and_digest(message_bytes)
+        return entete + cipher.nonce + tag + chiffre
+    
+    def _ouvrir_cle_donnees(self, mode: int, cle_enveloppee: bytes) -> bytes:
+        if mode in (ECIES_UNIQUE, ECIES_SESSION):
+            if isinstance(self.cle_chiffrement, RSA.RsaKey):
+                raise ValueError("Enveloppe ECIES reçue par une entité RSA")
+            return key_agreement(static_priv=self.cle_chiffrement, eph_pub=ECC.import_key(cle_enveloppee),
+                                 kdf=lambda secret: _derivation_ecies(secret, cle_enveloppee))
+        return self._dechiffrer_oaep(cle_enveloppee)
+    
+    def _dechiffrer_oaep(self, chiffre: bytes) -> bytes:
+        executeur = executeur_pour(self.cle_chiffrement)
+        if executeur is not None:
+            return executeur.dechiffrer(self.cle_chiffrement, chiffre).result()
+        return self._dechiffreur().decrypt(chiffre)
+    
+    def _deballer_cle(self, mode: int, cle_enveloppee: bytes) -> bytes:
+        if mode not in (ENVELOPPE_SESSION, ECIES_SESSION):
+            return self._ouvrir_cle_donnees(mode, cle_enveloppee)
+        
+        # Expéditeur récurrent : la clé déjà déballée évite l'opération RSA privée / X25519
+        empreinte = hashlib.sha256(cle_enveloppee).digest()
+        with self._verrou_sessions:
+            cle_donnees = self._sessions_recues.get(empreinte)
+            if cle_donnees is not None:
+                self._sessions_recues.move_to_end(empreinte)
+                return cle_donnees
+        cle_donnees = self._ouvrir_cle_donnees(mode, cle_enveloppee)
+        with self._verrou_sessions:
+            self._sessions_recues[empreinte] = cle_donnees
+            while len(self._sessions_recues) > CACHE_SESSIONS_TAILLE:
+                self._sessions_recues.popitem(last=False)
+        return cle_donnees
     
     def dechiffrer(self, message_chiffre: bytes) -> bytes:
-        cipher = PKCS1_OAEP.new(self.key)
-        return cipher.decrypt(message_chiffre)
+        if isinstance(self.cle_chiffrement, RSA.RsaKey) and len(message_chiffre) == self.cle_chiffrement.size_in_bytes():
+            # Ancien format : message chiffré directement en RSA-OAEP
+            return self._dechiffrer_oaep(message_chiffre)
+        
+        mode = message_chiffre[0]
+        if mode not in (ENVELOPPE_UNIQUE, ENVELOPPE_SESSION, ECIES_UNIQUE, ECIES_SESSION):
+            raise ValueError("Format d'enveloppe inconnu")
+        taille_cle = int.from_bytes(message_chiffre[1:3], 'big')
+        fin_entete = 3 + taille_cle
+        if len(message_chiffre) < fin_entete + 28:
+            raise ValueError("Enveloppe tronquée")
+        entete = message_chiffre[:fin_entete]
+        nonce = message_chiffre[fin_entete:fin_entete + 12]
+        tag = message_chiffre[fin_entete + 12:fin_entete + 28]
+        
+        cle_donnees = self._deballer_cle(mode, message_chiffre[3:fin_entete])
+        cipher = AES.new(cle_donnees, AES.MODE_GCM, nonce=nonce)
+        cipher.update(entete)
+        return cipher.decrypt_and_verify(message_chiffre[fin_entete + 28:], tag)
     
     def verifier_anti_rejeu(self, transaction_id: str, timestamp: float) -> Tuple[bool, str]:
         if transaction_id in self.transactions_vues:
             return False, "Transaction déjà traitée (attaque par rejeu détectée)"
         
         temps_actuel = time.time()
-        if abs(temps_actuel - timestamp) > 300:
+        if abs(temps_actuel - timestamp) > TOLERANCE_HORODATAGE:
             return False, "Transaction expirée (timestamp trop ancien/futur)"
         
         return True, "Transaction unique et récente"
 
 
+class GrandLivre:
+    """Comptes bancaires avec un verrou par compte : les débits sur des cartes différentes
+    s'exécutent en parallèle, contrôle du solde et débit sont atomiques sur une même carte"""
+    
+    def __init__(self, comptes: Optional[Dict[str, dict]] = None):
+        self._comptes: Dict[str, dict] = {}
+        self._verrous: Dict[str, threading.Lock] = {}
+        self._verrou_creation = threading.Lock()
+        for carte, compte in (comptes or {}).items():
+            self.creer(carte, compte['titulaire'], compte['solde'])
+    
+    def transaction(self):
+        """Unité de travail débit + historique ; rien à regrouper en mémoire (cf. stockage_sqlite)"""
+        return contextlib.nullcontext()
+    
+    def creer(self, carte: str, titulaire: str, solde_initial: float = 0) -> bool:
+        with self._verrou_creation:
+            if carte in self._comptes:
+                return False
+            # Le verrou existe avant que le compte ne soit visible
+            self._verrous[carte] = threading.Lock()
+            self._comptes[carte] = {'solde': solde_initial, 'titulaire': titulaire}
+            return True
+    
+    def debiter(self, carte: str, montant: float) -> Tuple[bool, Optional[float]]:
+        """Compare-and-debit : (débit effectué, solde après l'opération) ; (False, None) si carte inconnue"""
+        if montant < 0:
+            raise ValueError("Montant de débit négatif")
+        verrou = self._verrous.get(carte)
+        if verrou is None:
+            return False, None
+        with verrou:
+            compte = self._comptes[carte]
+            if compte['solde'] < montant:
+                return False, compte['solde']
+            compte['solde'] -= montant
+            return True, compte['solde']
+    
+    def crediter(self, carte: str, montant: float) -> Optional[float]:
+        if montant < 0:
+            raise ValueError("Montant de crédit négatif")
+        verrou = self._verrous.get(carte)
+        if verrou is None:
+            return None
+        with verrou:
+            compte = self._comptes[carte]
+            compte['solde'] += montant
+            return compte['solde']
+    
+    def solde(self, carte: str) -> Optional[float]:
+        compte = self._comptes.get(carte)
+        return compte['solde'] if compte is not None else None
+    
+    def __contains__(self, carte: str) -> bool:
+        return carte in self._comptes
+    
+    def __len__(self) -> int:
+        return len(self._comptes)
+    
+    def __iter__(self):
+        return iter(list(self._comptes))
+    
+    def __getitem__(self, carte: str) -> dict:
+        # Copie : toute modification du solde passe par debiter/crediter
+        with self._verrous[carte]:
+            return dict(self._comptes[carte])
+    
+    def items(self) -> List[Tuple[str, dict]]:
+        return [(carte, self[carte]) for carte in self]
+
+
+ARQC_ABSENT = 'N/A'
+# Raison enregistrée des refus sur exception ; le message de l'exception est gardé dans le champ 'detail'
+RAISON_ERREUR_TECHNIQUE = 'Erreur technique'
+_ABSENT = object()
+
+
+class RegistreColonnes:
+    """Historique stocké en colonnes : identifiants sur 16 octets, montants en centimes entiers,
+    codes internés pour les valeurs répétées ; une ligne n'est matérialisée en dict qu'à la lecture"""
+    # (nom, type) : 'uuid', 'arqc', 'centimes', 'horodatage', 'code', 'liste' ou 'texte'
+    CHAMPS: Tuple[Tuple[str, str], ...] = ()
+    # Valeur des champs absents des lignes enregistrées avant leur ajout au schéma
+    DEFAUTS: Dict[str, object] = {}
+    # Index secondaires (champs 'code') et champ horodatage qui ordonne les listes de rangs, pour rechercher
+    INDEX: Tuple[str, ...] = ()
+    CHRONOLOGIE: Optional[str] = None
+    
+    def __init__(self, lignes=()):
+        self._verrou = threading.Lock()
+        self._taille = 0
+        self._noms = frozenset(nom for nom, _ in self.CHAMPS)
+        self._colonnes: dict = {}
+        self._tables: Dict[str, list] = {}
+        self._codes: Dict[str, dict] = {}
+        # Valeurs qui n'entrent pas dans le format compact (identifiant non UUID...) : rares
+        self._hors_format: Dict[Tuple[str, int], object] = {}
+        # Champs hors schéma ajoutés à une ligne (attestation bancaire d'un lot...)
+        self._supplements: Dict[int, dict] = {}
+        for nom, type_champ in self.CHAMPS:
+            if type_champ in ('uuid', 'arqc'):
+                self._colonnes[nom] = bytearray()
+            elif type_champ == 'centimes':
+                self._colonnes[nom] = array('q')
+            elif type_champ == 'horodatage':
+                self._colonnes[nom] = array('d')
+            elif type_champ == 'code':
+                self._colonnes[nom] = array('I')
+                self._tables[nom] = []
+                self._codes[nom] = {}
+            else:
+                self._colonnes[nom] = []
+        # Rangs triés par (horodatage, rang) : toutes les lignes, puis par valeur de chaque champ indexé
+        self._chronologie = array('I')
+        self._index: Dict[str, Dict[int, array]] = {nom: {} for nom in self.INDEX}
+        self._decodeurs = [(nom, self._decodeur(nom, type_champ)) for nom, type_champ in self.CHAMPS]
+        self.extend(lignes)
+    
+    def _encoder(self, nom: str, type_champ: str, valeur):
+        """(valeur encodée, valeur hors format ou _ABSENT)"""
+        if type_champ == 'uuid':
+            try:
+                identifiant = uuid.UUID(valeur)
+                if str(identifiant) == valeur:
+                    return identifiant.bytes, _ABSENT
+            except (ValueError, TypeError, AttributeError):
+                pass
+            return bytes(16), valeur
+        if type_champ == 'arqc':
+            if valeur == ARQC_ABSENT:
+                return bytes(64), _ABSENT
+            try:
+                brut = bytes.fromhex(valeur)
+                if len(brut) == 64 and brut.hex() == valeur:
+                    return brut, _ABSENT
+            except (ValueError, TypeError):
+                pass
+            return bytes(64), valeur
+        if type_champ == 'centimes':
+            return round(valeur * 100), _ABSENT
+        if type_champ == 'horodatage':
+            return float(valeur), _ABSENT
+        if type_champ == 'code':
+            codes = self._codes[nom]
+            code = codes.get(valeur)
+            if code is None:
+                code = codes[valeur] = len(self._tables[nom])
+                self._tables[nom].append(valeur)
+            return code, _ABSENT
+        if type_champ == 'liste':
+            return tuple(sys.intern(v) if isinstance(v, str) else v for v in valeur), _ABSENT
+        return valeur, _ABSENT
+    
+    def append(self, ligne: dict) -> int:
+        """Ajoute une ligne et renvoie son rang"""
+        with self._verrou:
+            # Encodage complet avant toute écriture : les colonnes restent alignées en cas d'erreur
+            encodees = [self._encoder(nom, type_champ, ligne[nom] if nom in ligne or nom not in self.DEFAUTS
+                                      else self.DEFAUTS[nom]) for nom, type_champ in self.CHAMPS]
+            index = self._taille
+            for (nom, type_champ), (valeur, hors_format) in zip(self.CHAMPS, encodees):
+                colonne = self._colonnes[nom]
+                if type_champ in ('uuid', 'arqc'):
+                    colonne += valeur
+                else:
+                    colonne.append(valeur)
+                if hors_format is not _ABSENT:
+                    self._hors_format[(nom, index)] = hors_format
+            supplements = {cle: v for cle, v in ligne.items() if cle not in self._noms}
+            if supplements:
+                self._supplements[index] = supplements
+            self._taille = index + 1
+            if self.CHRONOLOGIE:
+                self._indexer(index)
+            self._apres_ajout(ligne)
+            return index
+    
+    def _apres_ajout(self, ligne: dict):
+        """Appelé verrou tenu après chaque ajout : agrégats maintenus à l'écriture"""
+    
+    def _indexer(self, rang: int):
+        horodatages = self._colonnes[self.CHRONOLOGIE]
+        self._inserer(self._chronologie, horodatages, rang)
+        for nom in self.INDEX:
+            rangs = self._index[nom].get(self._colonnes[nom][rang])
+            if rangs is None:
+                rangs = self._index[nom][self._colonnes[nom][rang]] = array('I')
+            self._inserer(rangs, horodatages, rang)
+    
+    @staticmethod
+    def _position(rangs, horodatages, horodatage: float, rang: float) -> int:
+        """Première position de rangs dont la clé (horodatage, rang) dépasse celle donnée"""
+        bas, haut = 0, len(rangs)
+        while bas < haut:
+            milieu = (bas + haut) // 2
+            r = rangs[milieu]
+            if (horodatages[r], r) <= (horodatage, rang):
+                bas = milieu + 1
+            else:
+                haut = milieu
+        return bas
+    
+    @classmethod
+    def _inserer(cls, rangs: array, horodatages, rang: int):
+        # Horodatages presque croissants : la ligne va presque toujours en fin de liste
+        horodatage = horodatages[rang]
+        if not rangs or horodatages[rangs[-1]] <= horodatage:
+            rangs.append(rang)
+        else:
+            rangs.insert(cls._position(rangs, horodatages, horodatage, rang), rang)
+    
+    def rechercher(self, limite: int = 50, apres: Optional[int] = None, decroissant: bool = False,
+                   debut: Optional[float] = None, fin: Optional[float] = None,
+                   montant_min: Optional[float] = None, montant_max: Optional[float] = None,
+                   **egalites) -> Tuple[List[dict], Optional[int]]:
+        """Page de lignes triées par (horodatage, rang), filtrées par égalité sur les champs de INDEX,
+        par plage d'horodatage [debut, fin] et de montant. apres : curseur rendu par la page précédente.
+        Renvoie (lignes, curseur de la page suivante ou None si la page n'est pas pleine).
+        La liste de l'index le plus sélectif est parcourue à partir d'une recherche dichotomique : le coût
+        dépend de la taille de la page (et des lignes écartées par les autres filtres), pas de l'historique"""
+        if not self.CHRONOLOGIE:
+            raise TypeError(f"{type(self).__name__} n'a pas d'index de recherche")
+        if limite < 1:
+            raise ValueError("La taille de page doit être positive")
+        horodatages = self._colonnes[self.CHRONOLOGIE]
+        
+        with self._verrou:
+            self._verifier_curseur(apres)
+            criteres = self._criteres(egalites)
+            if criteres is None:
+                return [], None
+            
+            rangs = self._chronologie
+            if criteres:
+                nom_parcouru, code_parcouru = min(criteres, key=lambda c: len(self._index[c[0]].get(c[1], ())))
+                rangs = self._index[nom_parcouru].get(code_parcouru, ())
+                criteres = [(nom, code) for nom, code in criteres if nom != nom_parcouru]
+            
+            bas = 0 if debut is None else self._position(rangs, horodatages, debut, -1)
+            haut = len(rangs) if fin is None else self._position(rangs, horodatages, fin, float('inf'))
+            if apres is not None:
+                if decroissant:
+                    haut = min(haut, self._position(rangs, horodatages, horodatages[apres], apres - 0.5))
+                else:
+                    bas = max(bas, self._position(rangs, horodatages, horodatages[apres], apres))
+            
+            page = []
+            for position in (range(haut - 1, bas - 1, -1) if decroissant else range(bas, haut)):
+                rang = rangs[position]
+                if self._retenue(rang, criteres, None, None, montant_min, montant_max):
+                    page.append(rang)
+                    if len(page) == limite:
+                        break
+        
+        # Lignes en ajout seul : décodées hors verrou
+        return [self._ligne(rang) for rang in page], (page[-1] if len(page) == limite else None)
+    
+    def parcourir(self, apres: Optional[int] = None, taille_page: int = 1000,
+                  debut: Optional[float] = None, fin: Optional[float] = None,
+                  montant_min: Optional[float] = None, montant_max: Optional[float] = None,
+                  **egalites) -> Iterator[Tuple[int, dict]]:
+        """(rang, ligne) dans l'ordre d'enregistrement, après le rang apres, avec les filtres de rechercher.
+        Les rangs ne font que croître : un parcours repris au dernier rang reçu ne saute aucune ligne, même
+        enregistrée entre-temps avec un horodatage plus ancien. Les lignes sont décodées page par page"""
+        if not self.CHRONOLOGIE:
+            raise TypeError(f"{type(self).__name__} n'a pas d'index de recherche")
+        self._verifier_curseur(apres)
+        criteres = self._criteres(egalites)
+        
+        def lignes():
+            if criteres is None:
+                return
+            suivant = 0 if apres is None else apres + 1
+            # Colonnes en ajout seul : les lignes de rang inférieur à _taille sont complètes, sans verrou
+            while suivant < self._taille:
+                fin_page = min(self._taille, suivant + taille_page)
+                page = [rang for rang in range(suivant, fin_page)
+                        if self._retenue(rang, criteres, debut, fin, montant_min, montant_max)]
+                for rang in page:
+                    yield rang, self._ligne(rang)
+                suivant = fin_page
+        return lignes()
+    
+    def _verifier_curseur(self, apres: Optional[int]):
+        if apres is not None and not 0 <= apres < self._taille:
+            raise ValueError(f"Curseur invalide: {apres}")
+    
+    def _criteres(self, egalites: dict) -> Optional[List[Tuple[str, int]]]:
+        """(champ, code) des filtres d'égalité ; None si une valeur n'a jamais été enregistrée"""
+        inconnus = set(egalites) - set(self.INDEX)
+        if inconnus:
+            raise ValueError(f"Filtre non indexé: {', '.join(sorted(inconnus))}")
+        criteres = []
+        for nom, valeur in egalites.items():
+            code = self._codes[nom].get(valeur)
+            if code is None:
+                return None
+            criteres.append((nom, code))
+        return criteres
+    
+    def _retenue(self, rang: int, criteres: List[Tuple[str, int]], debut: Optional[float], fin: Optional[float],
+                 montant_min: Optional[float], montant_max: Optional[float]) -> bool:
+        """Filtres vérifiés sur les colonnes encodées, sans décoder la ligne"""
+        if any(self._colonnes[nom][rang] != code for nom, code in criteres):
+            return False
+        if debut is not None or fin is not None:
+            horodatage = self._colonnes[self.CHRONOLOGIE][rang]
+            if (debut is not None and horodatage < debut) or (fin is not None and horodatage > fin):
+                return False
+        if montant_min is not None or montant_max is not None:
+            montant = self._colonnes['montant'][rang] / 100
+            if (montant_min is not None and montant < montant_min) or (montant_max is not None and montant > montant_max):
+                return False
+        return True
+    
+    def extend(self, lignes):
+        for ligne in lignes:
+            self.append(ligne)
+    
+    def completer(self, index: int, **champs):
+        """Ajoute des champs hors schéma à une ligne existante"""
+        with self._verrou:
+            if not 0 <= index < self._taille:
+                raise IndexError(index)
+            self._supplements.setdefault(index, {}).update(champs)
+    
+    def _decodeur(self, nom: str, type_champ: str):
+        colonne = self._colonnes[nom]
+        if type_champ == 'uuid':
+            def decoder(i):
+                h = colonne[i * 16:i * 16 + 16].hex()
+                return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+        elif type_champ == 'arqc':
+            def decoder(i):
+                brut = colonne[i * 64:i * 64 + 64]
+                return brut.hex() if any(brut) else ARQC_ABSENT
+        elif type_champ == 'centimes':
+            def decoder(i):
+                return colonne[i] / 100
+        elif type_champ == 'code':
+            table = self._tables[nom]
+            def decoder(i):
+                return table[colonne[i]]
+        elif type_champ == 'liste':
+            def decoder(i):
+                return list(colonne[i])
+        else:
+            decoder = colonne.__getitem__
+        return decoder
+    
+    def _ligne(self, index: int) -> dict:
+        ligne = {nom: decoder(index) for nom, decoder in self._decodeurs}
+        if self._hors_format:
+            for nom in self._noms:
+                valeur = self._hors_format.get((nom, index), _ABSENT)
+                if valeur is not _ABSENT:
+                    ligne[nom] = valeur
+        supplements = self._supplements.get(index)
+        if supplements:
+            ligne.update(supplements)
+        return ligne
+    
+    def __len__(self) -> int:
+        return self._taille
+    
+    def __iter__(self):
+        for index in range(self._taille):
+            yield self._ligne(index)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._ligne(i) for i in range(*index.indices(self._taille))]
+        if index < 0:
+            index += self._taille
+        if not 0 <= index < self._taille:
+            raise IndexError(index)
+        return self._ligne(index)
+
+
+class HistoriqueTransactions(RegistreColonnes):
+    CHAMPS = (('id', 'uuid'), ('carte', 'code'), ('montant', 'centimes'), ('timestamp', 'horodatage'),
+              ('arqc', 'arqc'), ('statut', 'code'), ('raison', 'code'), ('marchand', 'code'))
+    DEFAUTS = {'marchand': ''}
+    INDEX = ('carte', 'statut', 'marchand')
+    CHRONOLOGIE = 'timestamp'
+    
+    def __init__(self, lignes=()):
+        self._reussies = 0
+        self._centimes_total = 0
+        self._centimes_approuves = 0
+        super().__init__(lignes)
+    
+    def _apres_ajout(self, ligne: dict):
+        if ligne['statut'] == 'approuvé':
+            self._reussies += 1
+            self._centimes_approuves += round(ligne['montant'] * 100)
+        self._centimes_total += round(ligne['montant'] * 100)
+    
+    def get_stats(self) -> dict:
+        """Agrégats en O(1), sans parcourir l'historique"""
+        with self._verrou:
+            return {
+                'total': self._taille,
+                'reussies': self._reussies,
+                'montant_total': self._centimes_total / 100,
+                'montant_approuve': self._centimes_approuves / 100
+            }
+
+
+class RegistreCommandes(RegistreColonnes):
+    CHAMPS = (('id', 'uuid'), ('client', 'code'), ('items', 'liste'), ('montant', 'centimes'),
+              ('timestamp', 'horodatage'), ('arqc', 'arqc'), ('statut', 'code'))
+    INDEX = ('client', 'statut')
+    CHRONOLOGIE = 'timestamp'
+    
+    def __init__(self, lignes=()):
+        self._centimes_total = 0
+        super().__init__(lignes)
+    
+    def _apres_ajout(self, ligne: dict):
+        self._centimes_total += round(ligne['montant'] * 100)
+    
+    def get_stats(self) -> dict:
+        with self._verrou:
+            return {'total': self._taille, 'montant_total': self._centimes_total / 100}
+
+
+class HistoriqueAchats(RegistreColonnes):
+    CHAMPS = (('id', 'uuid'), ('marchand', 'code'), ('items', 'liste'), ('montant', 'centimes'),
+              ('timestamp', 'horodatage'), ('statut', 'code'), ('message', 'texte'))
+
+
+SEUIL_LOT_PARALLELE = 16   # en dessous, le lot est déchiffré sur place (démarrage du pool non rentable)
+
+
+class _DechiffreurPI(Entite):
+    """Entité réduite à sa clé de déchiffrement, reconstruite dans chaque processus du pool de la banque"""
+    
+    def __init__(self, cle_chiffrement):
+        self.cle_chiffrement = cle_chiffrement
+        self._sessions_recues: "OrderedDict[bytes, bytes]" = OrderedDict()
+        self._verrou_sessions = threading.Lock()
+        self._contextes: dict = {}
+
+
+_dechiffreur_processus: Optional[_DechiffreurPI] = None
+
+
+def _initialiser_dechiffreur(type_cle: str, der: bytes):
+    # Exécuté une fois par processus du pool : la clé privée transite au format DER
+    global _dechiffreur_processus
+    cle = RSA.import_key(der) if type_cle == 'RSA' else ECC.import_key(der)
+    _dechiffreur_processus = _DechiffreurPI(cle)
+
+
+def _ouvrir_enveloppe_pi(entite: Entite, paquet_paiement_chiffre: bytes) -> Tuple[Optional[dict], Optional[str]]:
+    """Déchiffrement + décodage JSON du PI : (enveloppe, None) ou (None, message d'erreur)"""
+    try:
+        return json.loads(entite.dechiffrer(paquet_paiement_chiffre).decode()), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _ouvrir_enveloppe_pi_processus(paquet_paiement_chiffre: bytes) -> Tuple[Optional[dict], Optional[str]]:
+    return _ouvrir_enveloppe_pi(_dechiffreur_processus, paquet_paiement_chiffre)
+
+
 class Banque(Entite):
-    def __init__(self, ca: AutoriteCertification):
-        super().__init__("Banque Centrale", ca)
-        self.comptes = {
+    log = journal('banque', acteur='Banque', retrait='   -> ')
+    
+    def __init__(self, ca: AutoriteCertification, cle=None, certificat: Optional[Certificat] = None,
+                 cle_chiffrement=None, stockage=None):
+        super().__init__("Banque Centrale", ca, cle, certificat, cle_chiffrement)
+        comptes_initiaux = {
             "4970-1111-2222-3333": {"solde": 5000, "titulaire": "Alice"},
             "4970-4444-5555-6666": {"solde": 100, "titulaire": "Bob"},
             "4970-7777-8888-9999": {"solde": 50000, "titulaire": "Charlie"}
         }
-        self.historique_transactions = []
+        self.stockage = stockage
+        if stockage is None:
+            self.comptes = GrandLivre(comptes_initiaux)
+            self.historique_transactions = HistoriqueTransactions()
+        else:
+            # Base existante reprise telle quelle : les comptes initiaux ne sont créés que dans une base vide
+            self.comptes = stockage.grand_livre(comptes_initiaux)
+            self.historique_transactions = stockage.historique_transactions()
+            for transaction in self.historique_transactions.depuis(time.time() - TOLERANCE_HORODATAGE, 'approuvé'):
+                self.transactions_vues.ajouter(transaction['id'], transaction['timestamp'])
+        self.journal = None
+        self._pool_dechiffrement: Optional[ProcessPoolExecutor] = None
+        self._processus_dechiffrement = 0
+        self._verrou_pool = threading.Lock()
     
-    def verifier_paiement(self, paquet_paiement_chiffre: bytes, transaction_id: str, timestamp: float) -> Tuple[bool, str, Optional[str]]:
-        print(f"\n   -> [Banque] Réception demande d'autorisation (ID: {transaction_id[:8]}...)")
+    def attacher_journal(self, journal) -> dict:
+        """Active le journal d'écriture anticipée (journal_banque.JournalBanque) et restaure son état"""
+        if self.stockage is not None:
+            raise ValueError("Journal et stockage SQLite sont exclusifs : la base assure déjà la persistance")
+        etat = journal.ouvrir()
+        self.journal = journal
+        if etat['lsn'] == 0:
+            # Journal neuf : les comptes existants en deviennent le point de départ
+            lsn = 0
+            for carte, compte in self.comptes.items():
+                lsn = journal.ajouter({'type': 'compte', 'carte': carte, 'titulaire': compte['titulaire'],
+                                       'solde': compte['solde']}, durable=False)
+            journal.attendre(lsn)
+        else:
+            self.comptes = GrandLivre(etat['comptes'])
+            # Historique relu en flux depuis l'archive du journal directement dans le stockage en colonnes
+            self.historique_transactions = HistoriqueTransactions(etat['historique'])
+            for _, transaction in self.historique_transactions.parcourir(
+                    debut=time.time() - TOLERANCE_HORODATAGE, statut='approuvé'):
+                self.transactions_vues.ajouter(transaction['id'], transaction['timestamp'])
+            self.log.info("✅ %d comptes et %d transactions restaurés depuis le journal (LSN %d)",
+                          len(self.comptes), len(self.historique_transactions), etat['lsn'])
+        return etat
+    
+    def _enregistrer_transaction(self, transaction_record: dict, durable: bool = False):
+        # Journalisé avant d'être visible ; une autorisation n'est confirmée qu'une fois sur disque
+        if self.journal is not None:
+            self.journal.ajouter({'type': 'transaction', 'transaction': transaction_record}, durable=durable)
+        self.historique_transactions.append(transaction_record)
+    
+    def verifier_paiement(self, paquet_paiement_chiffre: bytes, transaction_id: str, timestamp: float,
+                          certificat_client: Optional[Certificat] = None,
+                          marchand: str = '') -> Tuple[bool, str, Optional[str]]:
+        """marchand : nom du marchand demandeur, enregistré avec la transaction"""
+        self.log.debug("Réception demande d'autorisation (ID: %.8s...)", transaction_id, transaction=transaction_id)
         
         anti_rejeu_ok, raison = self.verifier_anti_rejeu(transaction_id, timestamp)
         if not anti_rejeu_ok:
-            print(f"   -> [Banque] ❌ {raison}")
-            # Enregistrer la transaction refusée
+            return self._refuser_rejeu(transaction_id, timestamp, raison, marchand)
+        
+        try:
+            infos_paiement_bytes = self.dechiffrer(paquet_paiement_chiffre)
+            enveloppe = json.loads(infos_paiement_bytes.decode())
+            self.log.debug("🔓 Déchiffrement réussi", transaction=transaction_id)
+            return self._autoriser(enveloppe, transaction_id, timestamp, certificat_client, marchand)
+        except Exception as e:
+            return self._erreur_technique(transaction_id, timestamp, str(e), marchand)
+    
+    def verifier_paiements(self, demandes: List[tuple],
+                           processus: Optional[int] = None) -> List[Tuple[bool, str, Optional[str]]]:
+        """Autorisation d'un lot de (pi_chiffre, transaction_id, timestamp, certificat_client[, marchand]).
+        Le déchiffrement des PI est réparti sur un pool de processus ; les contrôles de solde et les débits
+        sont ensuite appliqués un par un, par horodatage croissant (ordre du lot en cas d'égalité).
+        Les résultats sont renvoyés dans l'ordre des demandes"""
+        self.log.debug("Réception d'un lot de %d demandes d'autorisation", len(demandes))
+        resultats: List[Optional[Tuple[bool, str, Optional[str]]]] = [None] * len(demandes)
+        
+        # Rejeux et horodatages expirés écartés avant toute opération à clé privée
+        a_ouvrir = []
+        marchands = [demande[4] if len(demande) > 4 else '' for demande in demandes]
+        for index, (_, transaction_id, timestamp, *_) in enumerate(demandes):
+            anti_rejeu_ok, raison = self.verifier_anti_rejeu(transaction_id, timestamp)
+            if anti_rejeu_ok:
+                a_ouvrir.append(index)
+            else:
+                resultats[index] = self._refuser_rejeu(transaction_id, timestamp, raison, marchands[index])
+        
+        enveloppes = self._ouvrir_enveloppes([demandes[index][0] for index in a_ouvrir], processus)
+        self.log.debug("🔓 %d PI déchiffrés", len(a_ouvrir))
+        
+        for index, (enveloppe, erreur) in sorted(zip(a_ouvrir, enveloppes), key=lambda e: demandes[e[0]][2]):
+            _, transaction_id, timestamp, certificat_client = demandes[index][:4]
+            if erreur is not None:
+                resultats[index] = self._erreur_technique(transaction_id, timestamp, erreur, marchands[index])
+                continue
+            try:
+                resultats[index] = self._autoriser(enveloppe, transaction_id, timestamp, certificat_client,
+                                                   marchands[index])
+            except Exception as e:
+                resultats[index] = self._erreur_technique(transaction_id, timestamp, str(e), marchands[index])
+        
+        self.log.debug("✅ Lot traité : %d/%d autorisations accordées", sum(1 for r in resultats if r[0]), len(demandes))
+        return resultats
+    
+    def _ouvrir_enveloppes(self, paquets: List[bytes], processus: Optional[int]) -> List[Tuple[Optional[dict], Optional[str]]]:
+        if len(paquets) < SEUIL_LOT_PARALLELE or processus == 1:
+            return [_ouvrir_enveloppe_pi(self, paquet) for paquet in paquets]
+        pool = self._pool(processus)
+        # Quelques blocs par processus : équilibre la charge sans un aller-retour par paquet
+        taille_bloc = max(1, len(paquets) // (self._processus_dechiffrement * 4))
+        return list(pool.map(_ouvrir_enveloppe_pi_processus, paquets, chunksize=taille_bloc))
+    
+    def _pool(self, processus: Optional[int]) -> ProcessPoolExecutor:
+        """Pool de déchiffrement, créé au premier lot ; recréé si le nombre de processus demandé change"""
+        processus = processus or os.cpu_count() or 1
+        with self._verrou_pool:
+            if self._pool_dechiffrement is not None and self._processus_dechiffrement != processus:
+                self._pool_dechiffrement.shutdown(wait=True)
+                self._pool_dechiffrement = None
+            if self._pool_dechiffrement is None:
+                if isinstance(self.cle_chiffrement, RSA.RsaKey):
+                    initargs = ('RSA', self.cle_chiffrement.export_key('DER'))
+                else:
+                    initargs = ('ECC', self.cle_chiffrement.export_key(format='DER'))
+                self._pool_dechiffrement = ProcessPoolExecutor(max_workers=processus,
+                                                               initializer=_initialiser_dechiffreur,
+                                                               initargs=initargs)
+                self._processus_dechiffrement = processus
+            return self._pool_dechiffrement
+    
+    def arreter_pool(self):
+        with self._verrou_pool:
+            pool, self._pool_dechiffrement = self._pool_dechiffrement, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+    
+    def _refuser_rejeu(self, transaction_id: str, timestamp: float, raison: str,
+                       marchand: str = '') -> Tuple[bool, str, None]:
+        self.log.info("❌ %s", raison, transaction=transaction_id, marchand=marchand)
+        # Enregistrer la transaction refusée
+        transaction_record = {
+            'id': transaction_id,
+            'carte': 'inconnu',
+            'montant': 0,
+            'timestamp': timestamp,
+            'arqc': 'N/A',
+            'statut': 'refusé',
+            'raison': raison,
+            'marchand': marchand
+        }
+        self._enregistrer_transaction(transaction_record)
+        return False, raison, None
+    
+    def _erreur_technique(self, transaction_id: str, timestamp: float, erreur: str,
+                          marchand: str = '') -> Tuple[bool, str, None]:
+        self.log.avertissement("❌ Erreur: %s", erreur, transaction=transaction_id, marchand=marchand)
+        # Enregistrer la transaction refusée
+        transaction_record = {
+            'id': transaction_id,
+            'carte': 'inconnu',
+            'montant': 0,
+            'timestamp': timestamp,
+            'arqc': 'N/A',
+            'statut': 'refusé',
+            # Raison internée (vocabulaire fixe) ; le message d'exception, propre à chaque erreur,
+            # reste un champ hors schéma de la ligne
+            'raison': RAISON_ERREUR_TECHNIQUE,
+            'marchand': marchand,
+            'detail': erreur
+        }
+        self._enregistrer_transaction(transaction_record)
+        return False, f"{RAISON_ERREUR_TECHNIQUE}: {erreur}", None
+    
+    def _autoriser(self, enveloppe: dict, transaction_id: str, timestamp: float,
+                   certificat_client: Optional[Certificat], marchand: str = '') -> Tuple[bool, str, Optional[str]]:
+        """PI déchiffré : double signature, carte, réservation anti-rejeu puis débit"""
+        infos = enveloppe['pi']
+        
+        # Double signature SET : la banque vérifie avec H(OI) sans jamais voir l'Order Info
+        raison_ds = None
+        if certificat_client is None:
+            raison_ds = "Certificat client absent"
+        elif infos.get('transaction_id') != transaction_id:
+            raison_ds = "Payment Info non lié à cette transaction"
+        else:
+            donnees_ds = donnees_double_signature(bytes.fromhex(enveloppe['empreinte_oi']), empreinte_pi(infos))
+            ds_valide, raison_ds = self.verifier_signature(
+                donnees_ds, decoder_signature(enveloppe['double_signature']), certificat_client
+            )
+            if ds_valide:
+                raison_ds = None
+        if raison_ds is not None:
+            raison = f"Double signature invalide: {raison_ds}"
+            self.log.info("❌ %s", raison, transaction=transaction_id, marchand=marchand)
             transaction_record = {
                 'id': transaction_id,
                 'carte': 'inconnu',
@@ -211,98 +1722,115 @@ class Banque(Entite):
                 'timestamp': timestamp,
                 'arqc': 'N/A',
                 'statut': 'refusé',
-                'raison': raison
+                'raison': raison,
+                'marchand': marchand
             }
-            self.historique_transactions.append(transaction_record)
+            self._enregistrer_transaction(transaction_record)
             return False, raison, None
+        self.log.debug("✅ Double signature vérifiée (H(OI) + PI)", transaction=transaction_id)
         
-        try:
-            infos_paiement_bytes = self.dechiffrer(paquet_paiement_chiffre)
-            infos = json.loads(infos_paiement_bytes.decode())
-            
-            carte = infos['carte']
-            montant = infos['montant']
-            nonce = infos['nonce']
-            
-            print(f"   -> [Banque] 🔓 Déchiffrement réussi")
-            print(f"   -> [Banque] Carte: {carte}, Montant: {montant}€")
-            
-            if carte not in self.comptes:
-                print("   -> [Banque] ❌ Carte inconnue")
-                # Enregistrer la transaction refusée
-                transaction_record = {
-                    'id': transaction_id,
-                    'carte': carte,
-                    'montant': montant,
-                    'timestamp': timestamp,
-                    'arqc': 'N/A',
-                    'statut': 'refusé',
-                    'raison': 'Carte invalide'
-                }
-                self.historique_transactions.append(transaction_record)
-                return False, "Carte invalide", None
-            
-            compte = self.comptes[carte]
-            if compte['solde'] < montant:
-                print(f"   -> [Banque] ❌ Solde insuffisant ({compte['solde']}€ disponible)")
-                # Enregistrer la transaction refusée
+        carte = infos['carte']
+        montant = infos['montant']
+        nonce = infos['nonce']
+        
+        self.log.debug("Carte: %s, Montant: %s€", carte, montant, transaction=transaction_id)
+        
+        if carte not in self.comptes:
+            self.log.info("❌ Carte inconnue", transaction=transaction_id, marchand=marchand)
+            # Enregistrer la transaction refusée
+            transaction_record = {
+                'id': transaction_id,
+                'carte': carte,
+                'montant': montant,
+                'timestamp': timestamp,
+                'arqc': 'N/A',
+                'statut': 'refusé',
+                'raison': 'Carte invalide',
+                'marchand': marchand
+            }
+            self._enregistrer_transaction(transaction_record)
+            return False, "Carte invalide", None
+        
+        # Réservation atomique de l'identifiant : deux envois simultanés du même paquet
+        # ne peuvent pas être débités deux fois
+        if not self.transactions_vues.ajouter(transaction_id, timestamp):
+            if timestamp > time.time() + TOLERANCE_HORODATAGE:
+                raison = "Transaction expirée (timestamp trop ancien/futur)"
+            else:
+                raison = "Transaction déjà traitée (attaque par rejeu détectée)"
+            self.log.info("❌ %s", raison, transaction=transaction_id, marchand=marchand)
+            transaction_record = {
+                'id': transaction_id,
+                'carte': carte,
+                'montant': montant,
+                'timestamp': timestamp,
+                'arqc': 'N/A',
+                'statut': 'refusé',
+                'raison': raison,
+                'marchand': marchand
+            }
+            self._enregistrer_transaction(transaction_record)
+            return False, raison, None
+        
+        # Contrôle du solde et débit atomiques (verrou du compte). Avec un stockage SQLite, le débit
+        # et la ligne d'historique de l'autorisation sont validés dans une même transaction
+        with self.comptes.transaction():
+            debite, solde = self.comptes.debiter(carte, montant)
+            if debite:
+                arqc = self._generer_arqc(transaction_id, montant, carte)
+                
                 transaction_record = {
                     'id': transaction_id,
                     'carte': carte,
                     'montant': montant,
                     'timestamp': timestamp,
-                    'arqc': 'N/A',
-                    'statut': 'refusé',
-                    'raison': 'Fonds insuffisants'
+                    'arqc': arqc,
+                    'statut': 'approuvé',
+                    'raison': 'Autorisation accordée',
+                    'marchand': marchand
                 }
-                self.historique_transactions.append(transaction_record)
-                return False, "Fonds insuffisants", None
-            
-            self.comptes[carte]['solde'] -= montant
-            
-            arqc = self._generer_arqc(transaction_id, montant, carte)
-            
-            self.transactions_vues.add(transaction_id)
-            
+                try:
+                    self._enregistrer_transaction(transaction_record, durable=True)
+                except IOError:
+                    # Autorisation non enregistrée : le débit est annulé avant de refuser
+                    self.transactions_vues.retirer(transaction_id)
+                    self.comptes.crediter(carte, montant)
+                    raise
+        
+        if not debite:
+            self.transactions_vues.retirer(transaction_id)
+            self.log.info("❌ Solde insuffisant (%s€ disponible)", solde, transaction=transaction_id, marchand=marchand,
+                          montant=montant)
+            # Enregistrer la transaction refusée
             transaction_record = {
                 'id': transaction_id,
                 'carte': carte,
                 'montant': montant,
                 'timestamp': timestamp,
-                'arqc': arqc,
-                'statut': 'approuvé',
-                'raison': 'Autorisation accordée'
-            }
-            self.historique_transactions.append(transaction_record)
-            
-            print(f"   -> [Banque] ✅ Paiement autorisé. Nouveau solde: {compte['solde']}€")
-            print(f"   -> [Banque] 🔐 ARQC généré: {arqc[:16]}...")
-            
-            return True, "Autorisation accordée", arqc
-            
-        except Exception as e:
-            print(f"   -> [Banque] ❌ Erreur: {e}")
-            # Enregistrer la transaction refusée
-            transaction_record = {
-                'id': transaction_id,
-                'carte': 'inconnu',
-                'montant': 0,
-                'timestamp': timestamp,
                 'arqc': 'N/A',
                 'statut': 'refusé',
-                'raison': f'Erreur technique: {str(e)}'
+                'raison': 'Fonds insuffisants',
+                'marchand': marchand
             }
-            self.historique_transactions.append(transaction_record)
-            return False, f"Erreur technique: {str(e)}", None
+            self._enregistrer_transaction(transaction_record)
+            return False, "Fonds insuffisants", None
+        
+        self.log.info("✅ Paiement autorisé. Nouveau solde: %s€", solde, transaction=transaction_id, marchand=marchand,
+                      montant=montant)
+        self.log.debug("🔐 ARQC généré: %.16s...", arqc, transaction=transaction_id)
+        
+        return True, "Autorisation accordée", arqc
+    
+    def signer_autorisations(self, autorisations: List[Tuple[str, str]]) -> List[SignatureLot]:
+        """Attestations (transaction_id, ARQC) signées en lot : une signature pour N réponses"""
+        return self.signer_lot([donnees_autorisation(tid, arqc) for tid, arqc in autorisations])
     
     def _generer_arqc(self, transaction_id: str, montant: float, carte: str) -> str:
         data = f"{transaction_id}{montant}{carte}{time.time()}".encode()
         return hashlib.sha512(data).hexdigest()
     
     def get_solde(self, carte: str) -> Optional[float]:
-        if carte in self.comptes:
-            return self.comptes[carte]['solde']
-        return None
+        return self.comptes.solde(carte)
     
     def creer_compte(self, carte: str, titulaire: str, solde_initial: float = 0) -> Tuple[bool, str]:
         if carte in self.comptes:
@@ -311,13 +1839,13 @@ class Banque(Entite):
         if solde_initial < 0:
             return False, "Le solde initial ne peut pas être négatif"
         
-        self.comptes[carte] = {
-            'solde': solde_initial,
-            'titulaire': titulaire
-        }
+        if not self.comptes.creer(carte, titulaire, solde_initial):
+            return False, "Un compte existe déjà pour cette carte"
+        if self.journal is not None:
+            self.journal.ajouter({'type': 'compte', 'carte': carte, 'titulaire': titulaire, 'solde': solde_initial})
         
-        print(f"[Banque] ✅ Compte créé pour {titulaire} (carte {carte})")
-        print(f"[Banque] Solde initial: {solde_initial}€")
+        self.log.info("✅ Compte créé pour %s (carte %s)", titulaire, carte)
+        self.log.debug("Solde initial: %s€", solde_initial)
         
         return True, f"Compte créé avec succès. Solde initial: {solde_initial}€"
     
@@ -331,109 +1859,222 @@ class Banque(Entite):
         if montant > 10000:
             return False, "Montant maximum de rechargement: 10000€"
         
-        self.comptes[carte]['solde'] += montant
+        if self.journal is not None:
+            # Un crédit ne peut pas échouer : journalisé (sur disque) avant d'être appliqué
+            self.journal.ajouter({'type': 'credit', 'carte': carte, 'montant': montant})
+        solde = self.comptes.crediter(carte, montant)
         
-        print(f"[Banque] ✅ Compte {carte} rechargé de {montant}€")
-        print(f"[Banque] Nouveau solde: {self.comptes[carte]['solde']}€")
+        self.log.info("✅ Compte %s rechargé de %s€", carte, montant)
+        self.log.debug("Nouveau solde: %s€", solde)
         
-        return True, f"Compte rechargé de {montant}€. Nouveau solde: {self.comptes[carte]['solde']}€"
+        return True, f"Compte rechargé de {montant}€. Nouveau solde: {solde}€"
 
 
 class Marchand(Entite):
-    def __init__(self, nom: str, ca: AutoriteCertification, banque: 'Banque'):
-        super().__init__(nom, ca)
+    log = journal('marchand')
+    
+    def __init__(self, nom: str, ca: AutoriteCertification, banque: 'Banque', cle=None,
+                 certificat: Optional[Certificat] = None, cle_chiffrement=None, stockage=None):
+        super().__init__(nom, ca, cle, certificat, cle_chiffrement)
         self.banque = banque
-        self.commandes = []
+        self.commandes = stockage.registre_commandes(nom) if stockage is not None else RegistreCommandes()
+        # pipeline_autorisations.PipelineAutorisations : demandes regroupées en micro-lots vers la banque
+        self.pipeline = None
     
     def traiter_commande(self, paquet_commande: dict) -> Tuple[bool, str]:
-        print(f"\n{'='*70}")
-        print(f"[{self.nom}] 📦 Nouvelle commande reçue")
-        print(f"{'='*70}")
+        self.log.bandeau("📦 Nouvelle commande reçue", acteur=self.nom)
         
         try:
-            oi_clair = paquet_commande['order_info']
-            pi_chiffre = paquet_commande['payment_info_enc']
-            signature = paquet_commande['signature']
-            certificat_client = paquet_commande['certificat_client']
-            transaction_id = paquet_commande['transaction_id']
-            timestamp = paquet_commande['timestamp']
-            
-            print(f"[{self.nom}] Transaction ID: {transaction_id[:16]}...")
-            print(f"[{self.nom}] Articles: {oi_clair['items']}")
-            print(f"[{self.nom}] Montant: {oi_clair['montant']}€")
-            
-            anti_rejeu_ok, raison = self.verifier_anti_rejeu(transaction_id, timestamp)
-            if not anti_rejeu_ok:
-                print(f"[{self.nom}] ❌ {raison}")
+            controle_ok, raison = self._controler_commande(paquet_commande)
+            if not controle_ok:
                 return False, raison
             
-            donnees_combinees = json.dumps(oi_clair, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-            
-            sig_valide, raison_sig = self.verifier_signature(donnees_combinees, signature, certificat_client)
-            
-            if not sig_valide:
-                print(f"[{self.nom}] ❌ {raison_sig}")
-                return False, raison_sig
-            
-            print(f"[{self.nom}] ✅ Signature client validée")
-            print(f"[{self.nom}] ✅ Certificat client vérifié ({certificat_client.sujet})")
-            print(f"[{self.nom}] 🔒 Informations de paiement chiffrées (invisibles pour le marchand)")
-            
-            print(f"[{self.nom}] 📡 Demande d'autorisation à la banque...")
+            self.log.debug("📡 Demande d'autorisation à la banque...", acteur=self.nom)
             
-            succes_banque, msg_banque, arqc = self.banque.verifier_paiement(
-                pi_chiffre, transaction_id, timestamp
+            autoriser = self.pipeline.autoriser if self.pipeline is not None else self.banque.verifier_paiement
+            succes_banque, msg_banque, arqc = autoriser(
+                paquet_commande['payment_info_enc'], paquet_commande['transaction_id'],
+                paquet_commande['timestamp'], paquet_commande['certificat_client'], self.nom
             )
-            
-            if succes_banque:
-                self.transactions_vues.add(transaction_id)
-                
-                commande_record = {
-                    'id': transaction_id,
-                    'client': certificat_client.sujet,
-                    'items': oi_clair['items'],
-                    'montant': oi_clair['montant'],
-                    'timestamp': timestamp,
-                    'arqc': arqc,
-                    'statut': 'validée'
-                }
-                self.commandes.append(commande_record)
-                
-                print(f"\n{'='*70}")
-                print(f"[{self.nom}] 🎉 COMMANDE VALIDÉE ET EXPÉDIÉE")
-                print(f"[{self.nom}] ARQC de la banque: {arqc[:16]}...")
-                print(f"{'='*70}\n")
-                
-                return True, f"Commande validée (ARQC: {arqc[:16]}...)"
-            else:
-                print(f"\n{'='*70}")
-                print(f"[{self.nom}] ⛔ COMMANDE REFUSÉE: {msg_banque}")
-                print(f"{'='*70}\n")
-                return False, f"Paiement refusé: {msg_banque}"
+            return self._conclure_commande(paquet_commande, succes_banque, msg_banque, arqc)[:2]
                 
         except Exception as e:
-            print(f"[{self.nom}] ❌ Erreur lors du traitement: {e}")
+            self.log.erreur("❌ Erreur lors du traitement: %s", e, acteur=self.nom)
             return False, f"Erreur technique: {str(e)}"
+    
+    def _controler_commande(self, paquet_commande: dict) -> Tuple[bool, str]:
+        """Contrôles côté marchand avant la banque : anti-rejeu, horodatage signé, double signature"""
+        oi_clair = paquet_commande['order_info']
+        pimd = paquet_commande['empreinte_pi']
+        signature = paquet_commande['signature']
+        certificat_client = paquet_commande['certificat_client']
+        transaction_id = paquet_commande['transaction_id']
+        timestamp = paquet_commande['timestamp']
+        
+        self.log.debug("Transaction ID: %.16s...", transaction_id, acteur=self.nom)
+        self.log.debug("Articles: %s", oi_clair['items'], acteur=self.nom)
+        self.log.debug("Montant: %s€", oi_clair['montant'], acteur=self.nom)
+        
+        anti_rejeu_ok, raison = self.verifier_anti_rejeu(transaction_id, timestamp)
+        if not anti_rejeu_ok:
+            self.log.info("❌ %s", raison, acteur=self.nom, transaction=transaction_id)
+            return False, raison
+        
+        # L'horodatage de l'OI est signé : celui du paquet ne peut pas être rajeuni pour un rejeu
+        if oi_clair.get('timestamp', timestamp) != timestamp:
+            raison = "Horodatage du paquet différent de celui de l'Order Info signé"
+            self.log.info("❌ %s", raison, acteur=self.nom, transaction=transaction_id)
+            return False, raison
+        
+        # Double signature SET : le marchand vérifie avec H(PI) sans toucher au PI chiffré
+        donnees_ds = donnees_double_signature(empreinte_oi(oi_clair, transaction_id), pimd)
+        
+        sig_valide, raison_sig = self.verifier_signature(donnees_ds, signature, certificat_client)
+        
+        if not sig_valide:
+            self.log.info("❌ %s", raison_sig, acteur=self.nom, transaction=transaction_id)
+            return False, raison_sig
+        
+        self.log.debug("✅ Double signature client validée", acteur=self.nom)
+        self.log.debug("✅ Certificat client vérifié (%s)", certificat_client.sujet, acteur=self.nom)
+        self.log.debug("🔒 Informations de paiement chiffrées (invisibles pour le marchand)", acteur=self.nom)
+        return True, "Commande conforme"
+    
+    def _conclure_commande(self, paquet_commande: dict, succes_banque: bool, msg_banque: str,
+                           arqc: Optional[str]) -> Tuple[bool, str, Optional[int]]:
+        """(succès, message, rang de la commande enregistrée ou None si refusée)"""
+        if succes_banque:
+            oi_clair = paquet_commande['order_info']
+            transaction_id = paquet_commande['transaction_id']
+            timestamp = paquet_commande['timestamp']
+            self.transactions_vues.ajouter(transaction_id, timestamp)
+            
+            commande_record = {
+                'id': transaction_id,
+                'client': paquet_commande['certificat_client'].sujet,
+                'items': oi_clair['items'],
+                'montant': oi_clair['montant'],
+                'timestamp': timestamp,
+                'arqc': arqc,
+                'statut': 'validée'
+            }
+            rang = self.commandes.append(commande_record)
+            
+            self.log.info("🎉 COMMANDE VALIDÉE ET EXPÉDIÉE (ARQC de la banque: %.16s...)", arqc, caractere='=',
+                          acteur=self.nom, transaction=transaction_id, montant=oi_clair['montant'])
+            
+            return True, f"Commande validée (ARQC: {arqc[:16]}...)", rang
+        else:
+            self.log.info("⛔ COMMANDE REFUSÉE: %s", msg_banque, caractere='=', acteur=self.nom,
+                          transaction=paquet_commande['transaction_id'])
+            return False, f"Paiement refusé: {msg_banque}", None
+    
+    def traiter_commandes(self, paquets: List[dict]) -> List[Tuple[bool, str]]:
+        """Lot de commandes : une seule demande d'autorisation groupée à la banque (PI déchiffrés en parallèle),
+        puis toutes les autorisations accordées sont attestées par une seule signature"""
+        self.log.bandeau("📦 Lot de %d commandes reçu", len(paquets), acteur=self.nom)
+        
+        resultats: List[Optional[Tuple[bool, str]]] = [None] * len(paquets)
+        retenus = []
+        for index, paquet in enumerate(paquets):
+            try:
+                controle_ok, raison = self._controler_commande(paquet)
+            except Exception as e:
+                self.log.erreur("❌ Erreur lors du traitement: %s", e, acteur=self.nom)
+                controle_ok, raison = False, f"Erreur technique: {str(e)}"
+            if controle_ok:
+                retenus.append(index)
+            else:
+                resultats[index] = (False, raison)
+        
+        # Rangs des commandes enregistrées par ce lot : d'autres threads peuvent enregistrer les leurs entre-temps
+        validees = []
+        if retenus:
+            self.log.debug("📡 Demande d'autorisation groupée à la banque (%d commandes)...", len(retenus),
+                           acteur=self.nom)
+            reponses = self.banque.verifier_paiements([
+                (paquets[i]['payment_info_enc'], paquets[i]['transaction_id'], paquets[i]['timestamp'],
+                 paquets[i]['certificat_client'], self.nom) for i in retenus
+            ])
+            for index, (succes_banque, msg_banque, arqc) in zip(retenus, reponses):
+                succes, message, rang = self._conclure_commande(paquets[index], succes_banque, msg_banque, arqc)
+                resultats[index] = (succes, message)
+                if rang is not None:
+                    validees.append((rang, paquets[index]['transaction_id'], arqc))
+        
+        if validees:
+            attestations = self.banque.signer_autorisations([(transaction_id, arqc) for _, transaction_id, arqc in validees])
+            for (rang, transaction_id, arqc), attestation in zip(validees, attestations):
+                valide, raison = self.verifier_signature(
+                    donnees_autorisation(transaction_id, arqc), attestation, self.banque.certificat
+                )
+                if valide:
+                    self.commandes.completer(rang, attestation_banque=attestation.exporter())
+                else:
+                    self.log.avertissement("⚠️  Attestation bancaire rejetée (%.8s...): %s", transaction_id, raison,
+                                           acteur=self.nom, transaction=transaction_id)
+            self.log.info("🌳 %d autorisations attestées par la banque (une signature)", len(validees), acteur=self.nom)
+        
+        return resultats
 
 
 class Client(Entite):
-    def __init__(self, nom: str, num_carte: str, ca: AutoriteCertification):
-        super().__init__(nom, ca)
+    log = journal('client')
+    
+    def __init__(self, nom: str, num_carte: str, ca: AutoriteCertification, cle=None,
+                 certificat: Optional[Certificat] = None, cle_chiffrement=None):
+        super().__init__(nom, ca, cle, certificat, cle_chiffrement)
         self.carte = num_carte
-        self.historique_achats = []
+        self.historique_achats = HistoriqueAchats()
+    
+    def _emballer(self, cle_banque, oi: dict, pi: dict, transaction_id: str, timestamp: float,
+                  oimd: bytes, pimd: bytes, double_signature, session: bool) -> dict:
+        # La banque reçoit le PI, H(OI) et la double signature, jamais l'Order Info
+        enveloppe_pi = {
+            'pi': pi,
+            'empreinte_oi': oimd.hex(),
+            'double_signature': encoder_signature(double_signature)
+        }
+        pi_chiffre = self.chiffrer_pour(json.dumps(enveloppe_pi).encode(), cle_banque, session=session)
+        
+        return {
+            "order_info": oi,
+            "payment_info_enc": pi_chiffre,
+            "empreinte_pi": pimd,
+            "signature": double_signature,
+            "certificat_client": self.certificat,
+            "transaction_id": transaction_id,
+            "timestamp": timestamp
+        }
+    
+    def preparer_paquet(self, cle_banque, oi: dict, pi: dict, transaction_id: str, timestamp: float,
+                        session: bool = False) -> dict:
+        """Paquet SET : OI en clair, PI chiffré pour la banque, double signature sur H(H(OI) || H(PI))"""
+        oimd = empreinte_oi(oi, transaction_id)
+        pimd = empreinte_pi(pi)
+        double_signature = self.signer_donnee(donnees_double_signature(oimd, pimd))
+        return self._emballer(cle_banque, oi, pi, transaction_id, timestamp, oimd, pimd, double_signature, session)
+    
+    def preparer_paquets(self, cle_banque, transactions: List[Tuple[dict, dict, str, float]],
+                         session: bool = True) -> List[dict]:
+        """Paquets d'un lot (oi, pi, transaction_id, timestamp) : une seule signature pour toutes les doubles signatures"""
+        empreintes = [(empreinte_oi(oi, tid), empreinte_pi(pi)) for oi, pi, tid, _ in transactions]
+        signatures = self.signer_lot([donnees_double_signature(oimd, pimd) for oimd, pimd in empreintes])
+        return [
+            self._emballer(cle_banque, oi, pi, tid, ts, oimd, pimd, signature, session)
+            for (oi, pi, tid, ts), (oimd, pimd), signature in zip(transactions, empreintes, signatures)
+        ]
     
     def acheter(self, marchand: Marchand, liste_items: List[str], montant: float) -> Tuple[bool, str]:
-        print(f"\n{'#'*70}")
-        print(f"# 🛒 CLIENT: {self.nom} - NOUVEL ACHAT")
-        print(f"{'#'*70}")
+        self.log.bandeau("🛒 NOUVEL ACHAT", caractere='#', acteur=self.nom)
         
         transaction_id = str(uuid.uuid4())
         timestamp = time.time()
         nonce = get_random_bytes(16).hex()
         
-        print(f"[{self.nom}] Génération transaction ID: {transaction_id[:16]}...")
-        print(f"[{self.nom}] Articles: {liste_items}")
-        print(f"[{self.nom}] Montant: {montant}€")
+        self.log.debug("Génération transaction ID: %.16s...", transaction_id, acteur=self.nom)
+        self.log.debug("Articles: %s", liste_items, acteur=self.nom)
+        self.log.debug("Montant: %s€", montant, acteur=self.nom)
         
         oi = {
             "items": liste_items,
@@ -449,24 +2090,12 @@ class Client(Entite):
             "transaction_id": transaction_id
         }
         
-        print(f"[{self.nom}] 🔐 Chiffrement des informations de paiement pour la banque...")
-        cle_pub_banque = marchand.banque.get_public_key()
-        pi_chiffre = self.chiffrer_pour(json.dumps(pi).encode(), cle_pub_banque)
-        
-        print(f"[{self.nom}] ✍️  Signature de la transaction...")
-        donnees_combinees = json.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-        signature = self.signer_donnee(donnees_combinees)
-        
-        paquet = {
-            "order_info": oi,
-            "payment_info_enc": pi_chiffre,
-            "signature": signature,
-            "certificat_client": self.certificat,
-            "transaction_id": transaction_id,
-            "timestamp": timestamp
-        }
+        self.log.debug("✍️  Double signature H(H(OI) || H(PI)) de la transaction...", acteur=self.nom)
+        self.log.debug("🔐 Chiffrement des informations de paiement pour la banque...", acteur=self.nom)
+        cle_pub_banque = marchand.banque.get_cle_chiffrement()
+        paquet = self.preparer_paquet(cle_pub_banque, oi, pi, transaction_id, timestamp, session=True)
         
-        print(f"[{self.nom}] 📤 Envoi du paquet sécurisé à {marchand.nom}...")
+        self.log.debug("📤 Envoi du paquet sécurisé à %s...", marchand.nom, acteur=self.nom)
         
         succes, message = marchand.traiter_commande(paquet)
         
@@ -482,6 +2111,39 @@ class Client(Entite):
         self.historique_achats.append(achat_record)
         
         return succes, message
+    
+    def acheter_lot(self, marchand: Marchand, commandes: List[Tuple[List[str], float]]) -> List[Tuple[bool, str]]:
+        """Achats en gros : les N transactions partagent une signature de lot (arbre de Merkle)"""
+        self.log.bandeau("🛒 ACHAT EN LOT (%d commandes)", len(commandes), caractere='#', acteur=self.nom)
+        
+        timestamp = time.time()
+        transactions = []
+        for liste_items, montant in commandes:
+            transaction_id = str(uuid.uuid4())
+            oi = {"items": liste_items, "montant": montant, "client": self.nom, "timestamp": timestamp}
+            pi = {"carte": self.carte, "montant": montant, "nonce": get_random_bytes(16).hex(),
+                  "transaction_id": transaction_id}
+            transactions.append((oi, pi, transaction_id, timestamp))
+        
+        self.log.debug("🌳 Signature de la racine de Merkle (%d doubles signatures)...", len(transactions),
+                       acteur=self.nom)
+        paquets = self.preparer_paquets(marchand.banque.get_cle_chiffrement(), transactions)
+        
+        self.log.debug("📤 Envoi du lot à %s...", marchand.nom, acteur=self.nom)
+        resultats = marchand.traiter_commandes(paquets)
+        
+        for (oi, _, transaction_id, _), (succes, message) in zip(transactions, resultats):
+            self.historique_achats.append({
+                'id': transaction_id,
+                'marchand': marchand.nom,
+                'items': oi['items'],
+                'montant': oi['montant'],
+                'timestamp': timestamp,
+                'statut': 'succès' if succes else 'échec',
+                'message': message
+            })
+        
+        return resultats
 
 
 def test_attaque_rejeu(client: Client, marchand: Marchand):
@@ -495,18 +2157,7 @@ def test_attaque_rejeu(client: Client, marchand: Marchand):
     oi = {"items": ["Test"], "montant": 10, "client": client.nom, "timestamp": timestamp}
     pi = {"carte": client.carte, "montant": 10, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = client.chiffrer_pour(json.dumps(pi).encode(), marchand.banque.get_public_key())
-    donnees_combinees = json.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = client.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet = client.preparer_paquet(marchand.banque.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
     
     print("Premier envoi (légitime):")
     marchand.traiter_commande(paquet)
@@ -542,30 +2193,24 @@ def test_manipulation_montant(client: Client, marchand: Marchand):
     oi_legitime = {"items": ["Article"], "montant": 10, "client": client.nom, "timestamp": timestamp}
     pi = {"carte": client.carte, "montant": 10, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = client.chiffrer_pour(json.dumps(pi).encode(), marchand.banque.get_public_key())
-    donnees_combinees = json.dumps(oi_legitime, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = client.signer_donnee(donnees_combinees)
-    
+    paquet_modifie = client.preparer_paquet(marchand.banque.get_cle_chiffrement(), oi_legitime, pi, transaction_id, timestamp)
+
     oi_modifie = {"items": ["Article"], "montant": 1, "client": client.nom, "timestamp": timestamp}
-    
-    paquet_modifie = {
-        "order_info": oi_modifie,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet_modifie["order_info"] = oi_modifie
     
     print("⚠️  Tentative avec montant modifié après signature:")
     marchand.traiter_commande(paquet_modifie)
 
 
 if __name__ == "__main__":
+    # Simulation pédagogique : tout le déroulé du protocole à la console
+    configurer('demo')
     print("\n" + "="*70)
     print("🔐 SIMULATION PROTOCOLE SET AVEC CDA")
     print("="*70 + "\n")
     
+    configurer_pool_cles(PoolCles(seuil_bas=2, cible=8)).demarrer()
+    
     print("📋 PHASE 1: INITIALISATION DU SYSTÈME")
     print("-" * 70)
     ca = AutoriteCertification()
@@ -612,6 +2257,8 @@ if __name__ == "__main__":
     for carte, info in banque.comptes.items():
         print(f"  {info['titulaire']}: {info['solde']}€")
     
+    configurer_pool_cles(None)
+    
     print("\n" + "="*70)
     print("✅ SIMULATION TERMINÉE")
     print("="*70 + "\n")
@@ -29,11 +29,15 @@ print("   ✅ PyCryptodome installé")
 print("\n🚀 Démarrage de l'application...")
 print("-"*70)
 
-from app import app, socketio, init_system
-
-init_system()
+# Interface de démonstration : déroulé du protocole à la console, sauf SET_JOURNALISATION explicite.
+# Fixé avant l'import : l'initialisation démarre en arrière-plan dès l'import de app
+os.environ.setdefault('SET_JOURNALISATION', 'demo')
+if __name__ == '__main__':
+    # socketio.run(debug=True) relance ce script sous le rechargeur : seul le processus relancé initialise
+    os.environ['SET_RECHARGEUR'] = '1'
+from app import app, socketio
 
-print("\n✅ Système initialisé avec succès !")
+print("\n⏳ Initialisation du système en arrière-plan (avancement : http://localhost:5001/readyz)")
 print("\n" + "="*70)
 print("🌐 INTERFACE WEB DISPONIBLE")
 print("="*70)
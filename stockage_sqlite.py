@@ -0,0 +1,577 @@
+"""
+Stockage SQLite optionnel - Protocole SET/CDA
+Comptes, historique des transactions, certificats émis et commandes des marchands dans une base SQLite
+(journal WAL, requêtes préparées, insertions groupées, index) ; mêmes interfaces que les structures en
+mémoire de projet.py, pour des volumes qui dépassent la mémoire
+"""
+
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from projet import Certificat
+
+TAILLE_PAGE = 1000
+CACHE_CERTIFICATS_TAILLE = 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comptes (
+    carte TEXT PRIMARY KEY,
+    titulaire TEXT,
+    solde REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    rang INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    carte TEXT NOT NULL,
+    montant REAL NOT NULL,
+    timestamp REAL NOT NULL,
+    arqc TEXT NOT NULL,
+    statut TEXT NOT NULL,
+    raison TEXT NOT NULL,
+    marchand TEXT NOT NULL DEFAULT '',
+    supplements TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_id ON transactions(id);
+CREATE INDEX IF NOT EXISTS transactions_carte ON transactions(carte, timestamp);
+CREATE INDEX IF NOT EXISTS transactions_statut ON transactions(statut, timestamp);
+CREATE INDEX IF NOT EXISTS transactions_marchand ON transactions(marchand, timestamp);
+CREATE INDEX IF NOT EXISTS transactions_timestamp ON transactions(timestamp);
+CREATE TABLE IF NOT EXISTS commandes (
+    marchand TEXT NOT NULL,
+    rang INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    client TEXT NOT NULL,
+    items TEXT NOT NULL,
+    montant REAL NOT NULL,
+    timestamp REAL NOT NULL,
+    arqc TEXT NOT NULL,
+    statut TEXT NOT NULL,
+    supplements TEXT,
+    PRIMARY KEY (marchand, rang)
+);
+CREATE INDEX IF NOT EXISTS commandes_id ON commandes(id);
+CREATE INDEX IF NOT EXISTS commandes_client ON commandes(marchand, client, timestamp, rang);
+CREATE INDEX IF NOT EXISTS commandes_statut ON commandes(marchand, statut, timestamp, rang);
+CREATE INDEX IF NOT EXISTS commandes_timestamp ON commandes(marchand, timestamp, rang);
+CREATE TABLE IF NOT EXISTS certificats (
+    numero_serie TEXT PRIMARY KEY,
+    sujet TEXT NOT NULL,
+    revoque INTEGER NOT NULL,
+    date_revocation TEXT,
+    donnees TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS certificats_sujet ON certificats(sujet);
+CREATE INDEX IF NOT EXISTS certificats_revocation ON certificats(date_revocation) WHERE revoque = 1;
+"""
+
+
+class StockageSQLite:
+    """Base SQLite partagée par la banque, la CA et les marchands.
+    Une connexion unique protégée par un verrou réentrant ; les requêtes paramétrées sont préparées
+    une fois puis réutilisées (cache d'instructions de sqlite3). synchrone='FULL' : chaque transaction
+    validée est sur disque, comme une autorisation confirmée par le journal"""
+
+    def __init__(self, chemin: str, synchrone: str = 'FULL'):
+        self.chemin = chemin
+        self._connexion = sqlite3.connect(chemin, check_same_thread=False, isolation_level=None,
+                                          cached_statements=256)
+        self._connexion.execute('PRAGMA journal_mode=WAL')
+        self._connexion.execute(f'PRAGMA synchronous={synchrone}')
+        self._connexion.executescript(SCHEMA)
+        self._verrou = threading.RLock()
+        # Un niveau par transaction imbriquée : fonctions à rappeler si ce niveau est annulé
+        self._annulations: List[List[Callable[[], None]]] = []
+
+    # --- Transactions ---------------------------------------------------------
+
+    @contextmanager
+    def transaction(self):
+        """Transaction (ou point de sauvegarde si imbriquée) ; validée à la sortie, annulée sur exception.
+        Les erreurs SQLite sont remontées en IOError, comme celles du journal"""
+        with self._verrou:
+            niveau = len(self._annulations)
+            try:
+                self._connexion.execute('BEGIN IMMEDIATE' if niveau == 0 else f'SAVEPOINT n{niveau}')
+            except sqlite3.Error as e:
+                raise IOError(f"Base SQLite indisponible: {e}") from e
+            self._annulations.append([])
+            try:
+                yield self._connexion
+            except BaseException as erreur:
+                annulations = self._annulations.pop()
+                self._connexion.execute('ROLLBACK' if niveau == 0 else f'ROLLBACK TO n{niveau}')
+                if niveau:
+                    self._connexion.execute(f'RELEASE n{niveau}')
+                for annuler in annulations:
+                    annuler()
+                if isinstance(erreur, sqlite3.Error):
+                    raise IOError(f"Base SQLite indisponible: {erreur}") from erreur
+                raise
+            annulations = self._annulations.pop()
+            try:
+                self._connexion.execute('COMMIT' if niveau == 0 else f'RELEASE n{niveau}')
+            except sqlite3.Error as e:
+                if niveau == 0:
+                    self._connexion.execute('ROLLBACK')
+                for annuler in annulations:
+                    annuler()
+                raise IOError(f"Base SQLite indisponible: {e}") from e
+            if niveau:
+                # Le niveau englobant peut encore être annulé
+                self._annulations[-1].extend(annulations)
+
+    def si_annule(self, annuler: Callable[[], None]):
+        """Appelé dans une transaction : annuler() sera exécuté si elle est annulée"""
+        self._annulations[-1].append(annuler)
+
+    @property
+    def verrou(self) -> threading.RLock:
+        """Verrou de la connexion ; toujours pris avant le verrou propre d'un registre"""
+        return self._verrou
+
+    def lire(self, sql: str, parametres: tuple = ()) -> list:
+        with self._verrou:
+            return self._connexion.execute(sql, parametres).fetchall()
+
+    def lire_un(self, sql: str, parametres: tuple = ()) -> Optional[tuple]:
+        with self._verrou:
+            return self._connexion.execute(sql, parametres).fetchone()
+
+    def fermer(self):
+        with self._verrou:
+            self._connexion.close()
+
+    # --- Structures -----------------------------------------------------------
+
+    def grand_livre(self, comptes_initiaux: Optional[Dict[str, dict]] = None) -> 'GrandLivreSQLite':
+        return GrandLivreSQLite(self, comptes_initiaux)
+
+    def historique_transactions(self) -> 'HistoriqueSQLite':
+        return HistoriqueSQLite(self)
+
+    def registre_commandes(self, marchand: str) -> 'RegistreCommandesSQLite':
+        return RegistreCommandesSQLite(self, marchand)
+
+    def certificats(self) -> 'CertificatsSQLite':
+        return CertificatsSQLite(self)
+
+
+class GrandLivreSQLite:
+    """Comptes bancaires en base ; même interface que projet.GrandLivre.
+    Contrôle du solde et débit tiennent en une seule requête conditionnelle"""
+
+    def __init__(self, base: StockageSQLite, comptes_initiaux: Optional[Dict[str, dict]] = None):
+        self.base = base
+        if comptes_initiaux and base.lire_un("SELECT COUNT(*) FROM comptes")[0] == 0:
+            # Base neuve : comptes de départ insérés en une fois
+            with base.transaction() as connexion:
+                connexion.executemany("INSERT INTO comptes (carte, titulaire, solde) VALUES (?, ?, ?)",
+                                      [(carte, compte['titulaire'], compte['solde'])
+                                       for carte, compte in comptes_initiaux.items()])
+
+    def transaction(self):
+        """Unité de travail : le débit et la ligne d'historique qui le suit sont validés ensemble"""
+        return self.base.transaction()
+
+    def creer(self, carte: str, titulaire: str, solde_initial: float = 0) -> bool:
+        with self.base.transaction() as connexion:
+            curseur = connexion.execute("INSERT OR IGNORE INTO comptes (carte, titulaire, solde) VALUES (?, ?, ?)",
+                                        (carte, titulaire, solde_initial))
+            return curseur.rowcount == 1
+
+    def debiter(self, carte: str, montant: float) -> Tuple[bool, Optional[float]]:
+        """Compare-and-debit : (débit effectué, solde après l'opération) ; (False, None) si carte inconnue"""
+        if montant < 0:
+            raise ValueError("Montant de débit négatif")
+        with self.base.transaction() as connexion:
+            curseur = connexion.execute("UPDATE comptes SET solde = solde - ? WHERE carte = ? AND solde >= ?",
+                                        (montant, carte, montant))
+            rangee = connexion.execute("SELECT solde FROM comptes WHERE carte = ?", (carte,)).fetchone()
+        if rangee is None:
+            return False, None
+        return curseur.rowcount == 1, rangee[0]
+
+    def crediter(self, carte: str, montant: float) -> Optional[float]:
+        if montant < 0:
+            raise ValueError("Montant de crédit négatif")
+        with self.base.transaction() as connexion:
+            connexion.execute("UPDATE comptes SET solde = solde + ? WHERE carte = ?", (montant, carte))
+            rangee = connexion.execute("SELECT solde FROM comptes WHERE carte = ?", (carte,)).fetchone()
+        return rangee[0] if rangee is not None else None
+
+    def solde(self, carte: str) -> Optional[float]:
+        rangee = self.base.lire_un("SELECT solde FROM comptes WHERE carte = ?", (carte,))
+        return rangee[0] if rangee is not None else None
+
+    def __contains__(self, carte: str) -> bool:
+        return self.base.lire_un("SELECT 1 FROM comptes WHERE carte = ?", (carte,)) is not None
+
+    def __len__(self) -> int:
+        return self.base.lire_un("SELECT COUNT(*) FROM comptes")[0]
+
+    def __iter__(self):
+        return iter([carte for carte, in self.base.lire("SELECT carte FROM comptes ORDER BY rowid")])
+
+    def __getitem__(self, carte: str) -> dict:
+        rangee = self.base.lire_un("SELECT solde, titulaire FROM comptes WHERE carte = ?", (carte,))
+        if rangee is None:
+            raise KeyError(carte)
+        return {'solde': rangee[0], 'titulaire': rangee[1]}
+
+    def items(self) -> List[Tuple[str, dict]]:
+        return [(carte, {'solde': solde, 'titulaire': titulaire})
+                for carte, solde, titulaire in self.base.lire("SELECT carte, solde, titulaire FROM comptes ORDER BY rowid")]
+
+
+class RegistreSQLite:
+    """Registre en ajout seul sur une table SQLite ; même interface que projet.RegistreColonnes
+    (append, extend, completer, len, itération, index et tranches). Les lignes sont numérotées
+    par un rang (clé primaire) : accès par position et parcours par pages sans OFFSET"""
+    TABLE = ''
+    CHAMPS: Tuple[str, ...] = ()
+    LISTES: Tuple[str, ...] = ()     # champs stockés en JSON
+    PORTEE: Optional[str] = None     # colonne qui partitionne la table (une partition par marchand)
+    DEFAUTS: Dict[str, object] = {}  # champs absents des lignes enregistrées avant leur ajout au schéma
+    INDEX: Tuple[str, ...] = ()      # champs filtrables par égalité dans rechercher (index (champ, timestamp))
+
+    def __init__(self, base: StockageSQLite, portee: Optional[str] = None):
+        self.base = base
+        self._cle = (portee,) if self.PORTEE else ()
+        filtre = f"{self.PORTEE} = ? AND " if self.PORTEE else ""
+        colonnes = ((self.PORTEE,) if self.PORTEE else ()) + ('rang',) + self.CHAMPS + ('supplements',)
+        self._noms = set(self.CHAMPS)
+        self._sql_inserer = (f"INSERT INTO {self.TABLE} ({', '.join(colonnes)}) "
+                             f"VALUES ({', '.join('?' * len(colonnes))})")
+        self._sql_plage = (f"SELECT {', '.join(self.CHAMPS)}, supplements FROM {self.TABLE} "
+                           f"WHERE {filtre}rang >= ? AND rang < ? ORDER BY rang")
+        self._sql_supplements = f"SELECT supplements FROM {self.TABLE} WHERE {filtre}rang = ?"
+        self._sql_completer = f"UPDATE {self.TABLE} SET supplements = ? WHERE {filtre}rang = ?"
+        self._sql_taille = f"SELECT COALESCE(MAX(rang) + 1, 0) FROM {self.TABLE} WHERE {filtre}1"
+        self._sql_horodatage = f"SELECT timestamp FROM {self.TABLE} WHERE {filtre}rang = ?"
+        self._verrou = threading.Lock()
+        self._recharger()
+
+    def _recharger(self):
+        """Compteurs relus depuis la base (ouverture, ou après l'annulation d'une transaction).
+        Verrou de la base puis verrou du registre, dans le même ordre que extend"""
+        with self.base.verrou, self._verrou:
+            self._taille = self.base.lire_un(self._sql_taille, self._cle)[0]
+            self._relire_agregats()
+
+    def _relire_agregats(self):
+        """Appelé les deux verrous tenus : agrégats relus depuis la base"""
+
+    def _valeurs(self, rang: int, ligne: dict) -> tuple:
+        valeurs = [json.dumps(ligne[nom]) if nom in self.LISTES
+                   else ligne[nom] if nom in ligne or nom not in self.DEFAUTS else self.DEFAUTS[nom]
+                   for nom in self.CHAMPS]
+        supplements = {cle: v for cle, v in ligne.items() if cle not in self._noms}
+        return (*self._cle, rang, *valeurs, json.dumps(supplements) if supplements else None)
+
+    def _ligne(self, rangee: tuple) -> dict:
+        ligne = dict(zip(self.CHAMPS, rangee))
+        for nom in self.LISTES:
+            ligne[nom] = json.loads(ligne[nom])
+        if rangee[-1]:
+            ligne.update(json.loads(rangee[-1]))
+        return ligne
+
+    def _apres_ajout(self, ligne: dict):
+        """Appelé verrou tenu après chaque ajout : agrégats maintenus à l'écriture"""
+
+    def append(self, ligne: dict) -> int:
+        """Ajoute une ligne et renvoie son rang"""
+        return self.extend((ligne,))
+
+    def extend(self, lignes) -> Optional[int]:
+        """Insertion groupée : une seule transaction et une seule instruction préparée pour tout le lot.
+        Renvoie le rang de la première ligne insérée"""
+        lignes = list(lignes)
+        if not lignes:
+            return None
+        with self.base.transaction() as connexion:
+            with self._verrou:
+                debut = self._taille
+                connexion.executemany(self._sql_inserer,
+                                      [self._valeurs(debut + i, ligne) for i, ligne in enumerate(lignes)])
+                self._taille = debut + len(lignes)
+                for ligne in lignes:
+                    self._apres_ajout(ligne)
+            self.base.si_annule(self._recharger)
+        return debut
+
+    def completer(self, index: int, **champs):
+        """Ajoute des champs hors schéma à une ligne existante"""
+        with self.base.transaction() as connexion:
+            rangee = connexion.execute(self._sql_supplements, (*self._cle, index)).fetchone()
+            if rangee is None:
+                raise IndexError(index)
+            supplements = json.loads(rangee[0]) if rangee[0] else {}
+            supplements.update(champs)
+            connexion.execute(self._sql_completer, (json.dumps(supplements), *self._cle, index))
+
+    def _plage(self, debut: int, fin: int) -> List[dict]:
+        return [self._ligne(rangee) for rangee in self.base.lire(self._sql_plage, (*self._cle, debut, fin))]
+
+    def rechercher(self, limite: int = 50, apres: Optional[int] = None, decroissant: bool = False,
+                   debut: Optional[float] = None, fin: Optional[float] = None,
+                   montant_min: Optional[float] = None, montant_max: Optional[float] = None,
+                   **egalites) -> Tuple[List[dict], Optional[int]]:
+        """Même contrat que projet.RegistreColonnes.rechercher : une requête par page, servie par l'index
+        (champ, timestamp) du filtre d'égalité ; le curseur est comparé en valeur de ligne (timestamp, rang)"""
+        if limite < 1:
+            raise ValueError("La taille de page doit être positive")
+        conditions, parametres = self._conditions(egalites, debut, fin, montant_min, montant_max)
+        if apres is not None:
+            conditions.append(f"(timestamp, rang) {'<' if decroissant else '>'} (?, ?)")
+            parametres += [self._verifier_curseur(apres), apres]
+        sens = 'DESC' if decroissant else 'ASC'
+        rangees = self.base.lire(
+            f"SELECT rang, {', '.join(self.CHAMPS)}, supplements FROM {self.TABLE} "
+            f"WHERE {' AND '.join(conditions) or '1'} ORDER BY timestamp {sens}, rang {sens} LIMIT ?",
+            (*parametres, limite))
+        page = [self._ligne(rangee[1:]) for rangee in rangees]
+        return page, (rangees[-1][0] if len(rangees) == limite else None)
+
+    def parcourir(self, apres: Optional[int] = None, taille_page: int = TAILLE_PAGE,
+                  debut: Optional[float] = None, fin: Optional[float] = None,
+                  montant_min: Optional[float] = None, montant_max: Optional[float] = None,
+                  **egalites) -> Iterator[Tuple[int, dict]]:
+        """Même contrat que projet.RegistreColonnes.parcourir : une requête par page sur la clé primaire,
+        le verrou de la base est relâché entre deux pages"""
+        if apres is not None:
+            self._verifier_curseur(apres)
+        conditions, parametres = self._conditions(egalites, debut, fin, montant_min, montant_max)
+        sql = (f"SELECT rang, {', '.join(self.CHAMPS)}, supplements FROM {self.TABLE} "
+               f"WHERE {' AND '.join(conditions + ['rang > ?'])} ORDER BY rang LIMIT ?")
+
+        def lignes():
+            dernier = -1 if apres is None else apres
+            while True:
+                rangees = self.base.lire(sql, (*parametres, dernier, taille_page))
+                for rangee in rangees:
+                    yield rangee[0], self._ligne(rangee[1:])
+                if len(rangees) < taille_page:
+                    return
+                dernier = rangees[-1][0]
+        return lignes()
+
+    def _verifier_curseur(self, apres: int) -> float:
+        """Horodatage de la ligne désignée par le curseur"""
+        rangee = self.base.lire_un(self._sql_horodatage, (*self._cle, apres)) if apres >= 0 else None
+        if rangee is None:
+            raise ValueError(f"Curseur invalide: {apres}")
+        return rangee[0]
+
+    def _conditions(self, egalites: dict, debut: Optional[float], fin: Optional[float],
+                    montant_min: Optional[float], montant_max: Optional[float]) -> Tuple[List[str], list]:
+        inconnus = set(egalites) - set(self.INDEX)
+        if inconnus:
+            raise ValueError(f"Filtre non indexé: {', '.join(sorted(inconnus))}")
+        conditions = [f"{self.PORTEE} = ?"] if self.PORTEE else []
+        parametres = list(self._cle)
+        for nom, valeur in egalites.items():
+            conditions.append(f"{nom} = ?")
+            parametres.append(valeur)
+        for condition, valeur in (("timestamp >= ?", debut), ("timestamp <= ?", fin),
+                                  ("montant >= ?", montant_min), ("montant <= ?", montant_max)):
+            if valeur is not None:
+                conditions.append(condition)
+                parametres.append(valeur)
+        return conditions, parametres
+
+    def __len__(self) -> int:
+        return self._taille
+
+    def __iter__(self) -> Iterator[dict]:
+        # Par pages : le verrou de la base est relâché entre deux pages
+        taille = self._taille
+        for debut in range(0, taille, TAILLE_PAGE):
+            yield from self._plage(debut, min(debut + TAILLE_PAGE, taille))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            debut, fin, pas = index.indices(self._taille)
+            if pas == 1:
+                return self._plage(debut, fin) if debut < fin else []
+            return [self[i] for i in range(debut, fin, pas)]
+        if index < 0:
+            index += self._taille
+        if not 0 <= index < self._taille:
+            raise IndexError(index)
+        return self._plage(index, index + 1)[0]
+
+
+class HistoriqueSQLite(RegistreSQLite):
+    """Historique bancaire en base ; même interface que projet.HistoriqueTransactions"""
+    TABLE = 'transactions'
+    CHAMPS = ('id', 'carte', 'montant', 'timestamp', 'arqc', 'statut', 'raison', 'marchand')
+    DEFAUTS = {'marchand': ''}
+    INDEX = ('carte', 'statut', 'marchand')
+
+    def _relire_agregats(self):
+        reussies, centimes, centimes_approuves = self.base.lire_un(
+            "SELECT COALESCE(SUM(statut = 'approuvé'), 0), COALESCE(SUM(ROUND(montant * 100)), 0), "
+            "COALESCE(SUM(CASE WHEN statut = 'approuvé' THEN ROUND(montant * 100) END), 0) FROM transactions")
+        self._reussies = reussies
+        self._centimes_total = int(centimes)
+        self._centimes_approuves = int(centimes_approuves)
+
+    def _apres_ajout(self, ligne: dict):
+        if ligne['statut'] == 'approuvé':
+            self._reussies += 1
+            self._centimes_approuves += round(ligne['montant'] * 100)
+        self._centimes_total += round(ligne['montant'] * 100)
+
+    def get_stats(self) -> dict:
+        """Agrégats en O(1), tenus à jour à l'écriture"""
+        with self._verrou:
+            return {
+                'total': self._taille,
+                'reussies': self._reussies,
+                'montant_total': self._centimes_total / 100,
+                'montant_approuve': self._centimes_approuves / 100
+            }
+
+    def depuis(self, timestamp: float, statut: Optional[str] = None) -> List[dict]:
+        """Transactions horodatées à partir de timestamp (index statut/horodatage)"""
+        if statut is None:
+            rangees = self.base.lire(f"SELECT {', '.join(self.CHAMPS)}, supplements FROM transactions "
+                                     "WHERE timestamp >= ? ORDER BY timestamp", (timestamp,))
+        else:
+            rangees = self.base.lire(f"SELECT {', '.join(self.CHAMPS)}, supplements FROM transactions "
+                                     "WHERE statut = ? AND timestamp >= ? ORDER BY timestamp", (statut, timestamp))
+        return [self._ligne(rangee) for rangee in rangees]
+
+
+class RegistreCommandesSQLite(RegistreSQLite):
+    """Commandes d'un marchand (partition de la table commandes) ; même interface que projet.RegistreCommandes"""
+    TABLE = 'commandes'
+    CHAMPS = ('id', 'client', 'items', 'montant', 'timestamp', 'arqc', 'statut')
+    LISTES = ('items',)
+    PORTEE = 'marchand'
+    INDEX = ('client', 'statut')
+
+    def _relire_agregats(self):
+        centimes, = self.base.lire_un("SELECT COALESCE(SUM(ROUND(montant * 100)), 0) FROM commandes WHERE marchand = ?",
+                                      self._cle)
+        self._centimes_total = int(centimes)
+
+    def _apres_ajout(self, ligne: dict):
+        self._centimes_total += round(ligne['montant'] * 100)
+
+    def get_stats(self) -> dict:
+        with self._verrou:
+            return {'total': self._taille, 'montant_total': self._centimes_total / 100}
+
+
+class CertificatsSQLite(MutableMapping):
+    """Certificats émis par numéro de série ; remplace le dict AutoriteCertification.certificats_emis.
+    Les certificats les plus consultés restent décodés dans un cache LRU"""
+
+    def __init__(self, base: StockageSQLite):
+        self.base = base
+        self._cache: "OrderedDict[str, Certificat]" = OrderedDict()
+        self._verrou = threading.Lock()
+        self._taille = base.lire_un("SELECT COUNT(*) FROM certificats")[0]
+
+    def _memoriser(self, certificat: Certificat):
+        with self._verrou:
+            self._cache[certificat.numero_serie] = certificat
+            self._cache.move_to_end(certificat.numero_serie)
+            while len(self._cache) > CACHE_CERTIFICATS_TAILLE:
+                self._cache.popitem(last=False)
+
+    def __getitem__(self, numero_serie: str) -> Certificat:
+        with self._verrou:
+            certificat = self._cache.get(numero_serie)
+            if certificat is not None:
+                self._cache.move_to_end(numero_serie)
+                return certificat
+        rangee = self.base.lire_un("SELECT donnees FROM certificats WHERE numero_serie = ?", (numero_serie,))
+        if rangee is None:
+            raise KeyError(numero_serie)
+        certificat = Certificat.importer(json.loads(rangee[0]))
+        self._memoriser(certificat)
+        return certificat
+
+    def __setitem__(self, numero_serie: str, certificat: Certificat):
+        date_revocation = datetime.now().isoformat() if certificat.revoque else None
+        with self.base.transaction() as connexion:
+            nouveau = connexion.execute("SELECT 1 FROM certificats WHERE numero_serie = ?",
+                                        (numero_serie,)).fetchone() is None
+            # La date de révocation d'origine est conservée lors d'une réécriture
+            connexion.execute(
+                "INSERT INTO certificats (numero_serie, sujet, revoque, date_revocation, donnees) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(numero_serie) DO UPDATE SET sujet = excluded.sujet, revoque = excluded.revoque, "
+                "donnees = excluded.donnees, date_revocation = CASE WHEN excluded.revoque "
+                "THEN COALESCE(certificats.date_revocation, excluded.date_revocation) ELSE NULL END",
+                (numero_serie, certificat.sujet, int(certificat.revoque), date_revocation,
+                 json.dumps(certificat.exporter())))
+            if nouveau:
+                self._taille += 1
+                self.base.si_annule(self._recompter)
+        self._memoriser(certificat)
+
+    def __delitem__(self, numero_serie: str):
+        with self.base.transaction() as connexion:
+            if connexion.execute("DELETE FROM certificats WHERE numero_serie = ?", (numero_serie,)).rowcount == 0:
+                raise KeyError(numero_serie)
+            self._taille -= 1
+            self.base.si_annule(self._recompter)
+        with self._verrou:
+            self._cache.pop(numero_serie, None)
+
+    def _recompter(self):
+        self._taille = self.base.lire_un("SELECT COUNT(*) FROM certificats")[0]
+
+    def __contains__(self, numero_serie) -> bool:
+        with self._verrou:
+            if numero_serie in self._cache:
+                return True
+        return self.base.lire_un("SELECT 1 FROM certificats WHERE numero_serie = ?", (numero_serie,)) is not None
+
+    def __len__(self) -> int:
+        return self._taille
+
+    def __iter__(self) -> Iterator[str]:
+        dernier = -1
+        while True:
+            page = self.base.lire("SELECT rowid, numero_serie FROM certificats WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                  (dernier, TAILLE_PAGE))
+            if not page:
+                return
+            for dernier, numero_serie in page:
+                yield numero_serie
+
+    def values(self) -> Iterator[Certificat]:
+        """Parcours par pages, sans une requête par certificat"""
+        dernier = -1
+        while True:
+            page = self.base.lire("SELECT rowid, numero_serie, donnees FROM certificats WHERE rowid > ? "
+                                  "ORDER BY rowid LIMIT ?", (dernier, TAILLE_PAGE))
+            if not page:
+                return
+            for dernier, numero_serie, donnees in page:
+                with self._verrou:
+                    certificat = self._cache.get(numero_serie)
+                yield certificat if certificat is not None else Certificat.importer(json.loads(donnees))
+
+    def items(self) -> Iterator[Tuple[str, Certificat]]:
+        return ((certificat.numero_serie, certificat) for certificat in self.values())
+
+    def par_sujet(self, sujet: str) -> List[Certificat]:
+        return [self[numero_serie] for numero_serie, in
+                self.base.lire("SELECT numero_serie FROM certificats WHERE sujet = ? ORDER BY rowid", (sujet,))]
+
+    def revocations(self) -> List[Tuple[str, datetime]]:
+        """(numéro de série, date) des certificats révoqués, dans l'ordre de révocation"""
+        return [(numero_serie, datetime.fromisoformat(date)) for numero_serie, date in
+                self.base.lire("SELECT numero_serie, date_revocation FROM certificats WHERE revoque = 1 "
+                               "ORDER BY date_revocation")]
@@ -5,12 +5,21 @@ Démontre toutes les protections contre les attaques
 """
 
 from projet import *
+from journalisation import configurer
+import contextlib
+import io
 import json
+import os
+import random
+import sys
+import tempfile
+import threading
 import time
 from Crypto.PublicKey import RSA
-from Crypto.Hash import SHA256
+from Crypto.Hash import SHA512
 from Crypto.Signature import pkcs1_15
 from Crypto.Random import get_random_bytes
+from magasin_cles import MagasinCles
 
 def print_section(title):
     print("\n" + "="*80)
@@ -42,18 +51,7 @@ def test_1_attaque_rejeu(client, marchand):
     oi = {"items": ["Article Test"], "montant": 10, "client": client.nom, "timestamp": timestamp}
     pi = {"carte": client.carte, "montant": 10, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = client.chiffrer_pour(json.dumps(pi).encode(), marchand.banque.get_public_key())
-    donnees_combinees = json.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = client.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet = client.preparer_paquet(marchand.banque.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
     
     print("   ➜ Envoi de la transaction légitime...")
     succes1, msg1 = marchand.traiter_commande(paquet)
@@ -79,25 +77,15 @@ def test_2_modification_montant(client, marchand):
     oi_legitime = {"items": ["Ordinateur"], "montant": 100, "client": client.nom, "timestamp": timestamp}
     pi = {"carte": client.carte, "montant": 100, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = client.chiffrer_pour(json.dumps(pi).encode(), marchand.banque.get_public_key())
-    donnees_combinees = json.dumps(oi_legitime, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = client.signer_donnee(donnees_combinees)
+    paquet_malveillant = client.preparer_paquet(marchand.banque.get_cle_chiffrement(), oi_legitime, pi, transaction_id, timestamp)
     
     print_attack_step("Étape 2 : L'attaquant modifie le montant de 100€ à 1€")
     oi_modifie = {"items": ["Ordinateur"], "montant": 1, "client": client.nom, "timestamp": timestamp}
-    
-    paquet_malveillant = {
-        "order_info": oi_modifie,  # ← MONTANT MODIFIÉ
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,  # ← Signature de l'ancien montant
-        "certificat_client": client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet_malveillant["order_info"] = oi_modifie  # ← MONTANT MODIFIÉ, signature de l'ancien montant
     
     print("   ➜ Envoi du paquet avec montant modifié...")
     succes, msg = marchand.traiter_commande(paquet_malveillant)
-    print_defense("Signature numérique : hash(OI + PI + ID). Si OI change, la signature ne correspond plus")
+    print_defense("Double signature SET : H(H(OI + ID) || H(PI)). Si OI change, la signature ne correspond plus")
     print_result(succes, msg)
 
 
@@ -126,15 +114,17 @@ def test_3_usurpation_identite(ca, marchand, banque):
     oi = {"items": ["iPhone 15"], "montant": 1200, "client": "Alice", "timestamp": timestamp}
     pi = {"carte": "4970-9999-9999-9999", "montant": 1200, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = marchand.banque.get_public_key().encrypt(json.dumps(pi).encode(), 32)[0]
-    donnees_combinees = json.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    
-    h = SHA256.new(donnees_combinees)
-    fausse_signature = pkcs1_15.new(attaquant_key).sign(h)
+    # Double signature construite avec la clé de l'attaquant
+    oimd = empreinte_oi(oi, transaction_id)
+    pimd = empreinte_pi(pi)
+    fausse_signature = pkcs1_15.new(attaquant_key).sign(SHA512.new(donnees_double_signature(oimd, pimd)))
+    enveloppe_pi = {'pi': pi, 'empreinte_oi': oimd.hex(), 'double_signature': base64.b64encode(fausse_signature).decode()}
+    pi_chiffre = banque.chiffrer_pour(json.dumps(enveloppe_pi).encode(), banque.get_cle_chiffrement())
     
     paquet_malveillant = {
         "order_info": oi,
         "payment_info_enc": pi_chiffre,
+        "empreinte_pi": pimd,
         "signature": fausse_signature,
         "certificat_client": faux_cert,  # ← Faux certificat
         "transaction_id": transaction_id,
@@ -168,18 +158,7 @@ def test_4_certificat_revoque(ca, banque):
     oi = {"items": ["MacBook Pro"], "montant": 2500, "client": hacker.nom, "timestamp": timestamp}
     pi = {"carte": hacker.carte, "montant": 2500, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = hacker.chiffrer_pour(json.dumps(pi).encode(), banque.get_public_key())
-    donnees_combinees = json.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = hacker.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": hacker.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet = hacker.preparer_paquet(banque.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
     
     print("   ➜ Envoi de la transaction...")
     succes, msg = marchand_test.traiter_commande(paquet)
@@ -199,18 +178,7 @@ def test_5_timestamp_expire(client, marchand):
     oi = {"items": ["PlayStation 5"], "montant": 500, "client": client.nom, "timestamp": timestamp_ancien}
     pi = {"carte": client.carte, "montant": 500, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = client.chiffrer_pour(json.dumps(pi).encode(), marchand.banque.get_public_key())
-    donnees_combinees = json.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = client.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp_ancien
-    }
+    paquet = client.preparer_paquet(marchand.banque.get_cle_chiffrement(), oi, pi, transaction_id, timestamp_ancien)
     
     print(f"   ➜ Timestamp : Il y a {(time.time() - timestamp_ancien) / 60:.0f} minutes")
     print("   ➜ Envoi de la transaction...")
@@ -242,18 +210,7 @@ def test_6_fonds_insuffisants(banque):
     oi = {"items": ["TV 4K"], "montant": 1000, "client": pauvre.nom, "timestamp": timestamp}
     pi = {"carte": pauvre.carte, "montant": 1000, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = pauvre.chiffrer_pour(json.dumps(pi).encode(), banque_test.get_public_key())
-    donnees_combinees = json.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = pauvre.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": pauvre.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet = pauvre.preparer_paquet(banque_test.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
     
     print("   ➜ Envoi de la transaction...")
     succes, msg = marchand_test.traiter_commande(paquet)
@@ -283,18 +240,7 @@ def test_7_carte_invalide(ca, banque):
     oi = {"items": ["Nintendo Switch"], "montant": 350, "client": client_faux.nom, "timestamp": timestamp}
     pi = {"carte": client_faux.carte, "montant": 350, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = client_faux.chiffrer_pour(json.dumps(pi).encode(), banque.get_public_key())
-    donnees_combinees = json.dumps(oi, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = client_faux.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": client_faux.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet = client_faux.preparer_paquet(banque.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
     
     print("   ➜ Envoi de la transaction...")
     succes, msg = marchand_test.traiter_commande(paquet)
@@ -325,18 +271,7 @@ def test_8_double_depense(client, marchand, banque):
     oi_1 = {"items": ["Casque Audio"], "montant": 80, "client": client_test.nom, "timestamp": timestamp_1}
     pi_1 = {"carte": client_test.carte, "montant": 80, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id_1}
     
-    pi_chiffre_1 = client_test.chiffrer_pour(json.dumps(pi_1).encode(), banque_test.get_public_key())
-    donnees_1 = json.dumps(oi_1, sort_keys=True).encode() + pi_chiffre_1 + transaction_id_1.encode()
-    signature_1 = client_test.signer_donnee(donnees_1)
-    
-    paquet_1 = {
-        "order_info": oi_1,
-        "payment_info_enc": pi_chiffre_1,
-        "signature": signature_1,
-        "certificat_client": client_test.certificat,
-        "transaction_id": transaction_id_1,
-        "timestamp": timestamp_1
-    }
+    paquet_1 = client_test.preparer_paquet(banque_test.get_cle_chiffrement(), oi_1, pi_1, transaction_id_1, timestamp_1)
     
     print("   ➜ Envoi du premier achat...")
     succes_1, msg_1 = marchand_test.traiter_commande(paquet_1)
@@ -351,18 +286,7 @@ def test_8_double_depense(client, marchand, banque):
     oi_2 = {"items": ["Souris Gaming"], "montant": 80, "client": client_test.nom, "timestamp": timestamp_2}
     pi_2 = {"carte": client_test.carte, "montant": 80, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id_2}
     
-    pi_chiffre_2 = client_test.chiffrer_pour(json.dumps(pi_2).encode(), banque_test.get_public_key())
-    donnees_2 = json.dumps(oi_2, sort_keys=True).encode() + pi_chiffre_2 + transaction_id_2.encode()
-    signature_2 = client_test.signer_donnee(donnees_2)
-    
-    paquet_2 = {
-        "order_info": oi_2,
-        "payment_info_enc": pi_chiffre_2,
-        "signature": signature_2,
-        "certificat_client": client_test.certificat,
-        "transaction_id": transaction_id_2,
-        "timestamp": timestamp_2
-    }
+    paquet_2 = client_test.preparer_paquet(banque_test.get_cle_chiffrement(), oi_2, pi_2, transaction_id_2, timestamp_2)
     
     print("   ➜ Envoi du deuxième achat...")
     succes_2, msg_2 = marchand_test.traiter_commande(paquet_2)
@@ -391,18 +315,7 @@ def test_9_injection_donnees(client, marchand):
     
     pi = {"carte": client.carte, "montant": 50, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
     
-    pi_chiffre = client.chiffrer_pour(json.dumps(pi).encode(), marchand.banque.get_public_key())
-    donnees_combinees = json.dumps(oi_malveillant, sort_keys=True).encode() + pi_chiffre + transaction_id.encode()
-    signature = client.signer_donnee(donnees_combinees)
-    
-    paquet = {
-        "order_info": oi_malveillant,
-        "payment_info_enc": pi_chiffre,
-        "signature": signature,
-        "certificat_client": client.certificat,
-        "transaction_id": transaction_id,
-        "timestamp": timestamp
-    }
+    paquet = client.preparer_paquet(marchand.banque.get_cle_chiffrement(), oi_malveillant, pi, transaction_id, timestamp)
     
     print("   ➜ Données malveillantes :")
     print(f"      - Items : {oi_malveillant['items']}")
@@ -415,6 +328,255 @@ def test_9_injection_donnees(client, marchand):
     print("   ℹ️  Note : Le système traite les données comme du texte brut, pas comme du code exécutable")
 
 
+def test_10_preuve_lot_falsifiee(client, marchand):
+    """Test : Réutiliser la preuve de Merkle d'une transaction signée en lot pour une autre"""
+    print_section("FALSIFICATION D'UNE SIGNATURE DE LOT")
+    print("   📝 Scénario : Le client signe un lot de 2 commandes, l'attaquant détourne une preuve d'inclusion")
+    
+    print_attack_step("Étape 1 : Le client signe un lot de 2 commandes (une seule signature sur la racine)")
+    timestamp = time.time()
+    transactions = []
+    for montant in (20, 500):
+        transaction_id = str(uuid.uuid4())
+        oi = {"items": ["Lot"], "montant": montant, "client": client.nom, "timestamp": timestamp}
+        pi = {"carte": client.carte, "montant": montant, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
+        transactions.append((oi, pi, transaction_id, timestamp))
+    paquets = client.preparer_paquets(marchand.banque.get_cle_chiffrement(), transactions)
+    
+    print_attack_step("Étape 2 : L'attaquant greffe la preuve de la commande à 20€ sur une commande à 5000€")
+    paquet_malveillant = dict(paquets[0])
+    paquet_malveillant["order_info"] = dict(paquets[0]["order_info"], montant=5000)
+    
+    print("   ➜ Envoi du paquet avec une preuve d'inclusion détournée...")
+    succes, msg = marchand.traiter_commande(paquet_malveillant)
+    print_defense("Arbre de Merkle : la preuve ne reconstruit la racine signée que pour la donnée d'origine")
+    print_result(succes, msg)
+
+
+def test_11_debits_concurrents(ca):
+    """Test : Débits simultanés sur plusieurs threads (stress test du grand livre)"""
+    print_section("DÉBITS CONCURRENTS")
+    print("   📝 Scénario : 16 threads tentent chacun un achat de 80€ sur un compte de 100€")
+    
+    print_attack_step("Étape 1 : 16 achats simultanés sur la même carte")
+    banque_test = Banque(ca)
+    marchand_test = Marchand("MarchandConcurrence", ca, banque_test)
+    client_test = Client("ClientConcurrent", "4970-2222-2222-2222", ca)
+    banque_test.creer_compte(client_test.carte, client_test.nom, 100)
+    
+    paquets = []
+    for _ in range(16):
+        transaction_id = str(uuid.uuid4())
+        timestamp = time.time()
+        oi = {"items": ["Article"], "montant": 80, "client": client_test.nom, "timestamp": timestamp}
+        pi = {"carte": client_test.carte, "montant": 80, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
+        paquets.append(client_test.preparer_paquet(banque_test.get_cle_chiffrement(), oi, pi, transaction_id, timestamp))
+    
+    depart = threading.Barrier(len(paquets))
+    resultats = []
+    
+    def acheter(paquet):
+        depart.wait()
+        resultats.append(marchand_test.traiter_commande(paquet)[0])
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        threads = [threading.Thread(target=acheter, args=(p,)) for p in paquets]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    
+    acceptes = sum(resultats)
+    solde_final = banque_test.get_solde(client_test.carte)
+    print(f"   ➜ Achats acceptés : {acceptes}/16, solde final : {solde_final}€")
+    
+    print_attack_step("Étape 2 : 8 threads x 5000 débits/crédits aléatoires sur 4 cartes")
+    livre = GrandLivre({f"4970-0000-0000-000{i}": {"titulaire": f"T{i}", "solde": 1000} for i in range(4)})
+    total_initial = sum(compte['solde'] for _, compte in livre.items())
+    mouvements = []
+    
+    def operations(graine):
+        aleatoire = random.Random(graine)
+        net = 0
+        for _ in range(5000):
+            carte = f"4970-0000-0000-000{aleatoire.randrange(4)}"
+            montant = aleatoire.randint(1, 60)
+            if aleatoire.random() < 0.6:
+                if livre.debiter(carte, montant)[0]:
+                    net -= montant
+            else:
+                livre.crediter(carte, montant)
+                net += montant
+        mouvements.append(net)
+    
+    intervalle = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # bascules de thread fréquentes pour provoquer les entrelacements
+    try:
+        threads = [threading.Thread(target=operations, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(intervalle)
+    
+    soldes = [compte['solde'] for _, compte in livre.items()]
+    conserve = sum(soldes) == total_initial + sum(mouvements)
+    print(f"   ➜ Total attendu : {total_initial + sum(mouvements)}€, total constaté : {sum(soldes)}€, "
+          f"solde minimal : {min(soldes)}€")
+    
+    print_defense("Grand livre : contrôle du solde et débit atomiques sous le verrou de chaque compte")
+    intact = acceptes == 1 and solde_final == 20 and conserve and min(soldes) >= 0
+    print_result(not intact, "Soldes conservés, aucun découvert" if intact else "Incohérence de solde détectée")
+
+
+def test_12_fenetre_anti_rejeu():
+    """Test de propriété : la fenêtre glissante détecte tout rejeu dans la tolérance, à mémoire bornée"""
+    print_section("REJEUX DANS LA FENÊTRE ANTI-REJEU")
+    print("   📝 Scénario : 30 000 paquets sur ~8 h simulées, dont 30 % de rejeux à des âges aléatoires")
+    
+    print_attack_step("Étape 1 : Flux aléatoire (horloge simulée, horodatages parfois falsifiés)")
+    aleatoire = random.Random(2024)
+    horloge = [1_700_000_000.0]
+    fenetre = FenetreAntiRejeu(horloge=lambda: horloge[0])
+    tolerance = fenetre.tolerance
+    acceptes = []            # identifiants déjà acceptés (candidats au rejeu)
+    dernier_ts = {}          # transaction_id -> horodatage de la dernière acceptation
+    rejeux_manques = 0
+    faux_positifs = 0
+    taille_max = 0
+    depassements_borne = 0
+    
+    for pas in range(30000):
+        horloge[0] += aleatoire.uniform(0, 2)
+        maintenant = horloge[0]
+        rejeu = bool(acceptes) and aleatoire.random() < 0.3
+        if rejeu:
+            transaction_id = aleatoire.choice(acceptes)
+            ts_origine = dernier_ts[transaction_id]
+            ts = ts_origine if aleatoire.random() < 0.5 else maintenant + aleatoire.uniform(-tolerance, tolerance)
+        else:
+            transaction_id = str(uuid.uuid4())
+            ts = maintenant + aleatoire.uniform(-1.2 * tolerance, 1.2 * tolerance)
+        
+        # Même décision que Entite.verifier_anti_rejeu, avec l'horloge simulée
+        accepte = transaction_id not in fenetre and abs(maintenant - ts) <= tolerance
+        if accepte:
+            fenetre.ajouter(transaction_id, ts)
+            if not rejeu:
+                acceptes.append(transaction_id)
+            dernier_ts[transaction_id] = ts
+        
+        if rejeu and accepte and maintenant - ts_origine <= tolerance:
+            rejeux_manques += 1
+        if not rejeu and not accepte and abs(maintenant - ts) <= tolerance:
+            faux_positifs += 1
+        
+        # Borne : seuls les identifiants encore acceptables sont gardés, à un seau + un intervalle de purge près
+        taille = len(fenetre)
+        taille_max = max(taille_max, taille)
+        if pas % 100 == 0:
+            limite = maintenant - tolerance - 2 * fenetre.largeur_seau
+            if taille > sum(1 for t in dernier_ts.values() if t >= limite):
+                depassements_borne += 1
+    
+    # Horodatage très loin dans le futur : refusé par la fenêtre elle-même, sans seau créé
+    taille_avant = len(fenetre)
+    futur_refuse = not fenetre.ajouter(str(uuid.uuid4()), horloge[0] + 100 * tolerance)
+    futur_refuse = futur_refuse and len(fenetre) == taille_avant
+    
+    print(f"   ➜ Identifiants acceptés : {len(acceptes)} (un set non borné les garderait tous)")
+    print(f"   ➜ Taille maximale de la fenêtre : {taille_max}, taille finale : {len(fenetre)} "
+          f"({fenetre.get_stats()['seaux']} seaux)")
+    print(f"   ➜ Rejeux manqués : {rejeux_manques}, faux positifs : {faux_positifs}, "
+          f"dépassements de borne : {depassements_borne}")
+    print(f"   ➜ Horodatage futur hors tolérance refusé par la fenêtre : {'oui' if futur_refuse else 'non'}")
+    
+    print_defense("Seaux horodatés : tout rejeu dans la tolérance est détecté, les seaux expirés sont libérés")
+    intact = rejeux_manques == 0 and faux_positifs == 0 and depassements_borne == 0 and futur_refuse
+    print_result(not intact, "Tous les rejeux détectés, mémoire bornée par la fenêtre" if intact
+                 else "Propriété violée")
+
+
+def test_13_lot_autorisations(ca):
+    """Test : Lot d'autorisations mélangé avec rejeu intégré (déchiffrement parallèle, débits ordonnés)"""
+    print_section("REJEU ET DÉCOUVERT DANS UN LOT D'AUTORISATIONS")
+    print("   📝 Scénario : 20 paiements de 10€ sur un compte de 100€, envoyés dans le désordre + 1 rejeu")
+    
+    print_attack_step("Étape 1 : Lot mélangé soumis à Banque.verifier_paiements")
+    banque_test = Banque(ca)
+    client_test = Client("ClientLot", "4970-3333-3333-3333", ca)
+    banque_test.creer_compte(client_test.carte, client_test.nom, 100)
+    
+    demandes = []
+    debut = time.time()
+    for i in range(20):
+        transaction_id = str(uuid.uuid4())
+        timestamp = debut + i
+        oi = {"items": ["Article"], "montant": 10, "client": client_test.nom, "timestamp": timestamp}
+        pi = {"carte": client_test.carte, "montant": 10, "nonce": get_random_bytes(16).hex(), "transaction_id": transaction_id}
+        paquet = client_test.preparer_paquet(banque_test.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
+        demandes.append((paquet['payment_info_enc'], transaction_id, timestamp, paquet['certificat_client']))
+    lot = demandes[:]
+    random.Random(7).shuffle(lot)
+    lot.append(demandes[0])
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultats = banque_test.verifier_paiements(lot, processus=2)
+    banque_test.arreter_pool()
+    
+    acceptees = {demande[1] for demande, (succes, _, _) in zip(lot, resultats) if succes}
+    premieres = {demande[1] for demande in demandes[:10]}
+    print(f"   ➜ Autorisations accordées : {len(acceptees)}/21, solde final : {banque_test.get_solde(client_test.carte)}€")
+    print(f"   ➜ Rejeu dans le lot : {resultats[-1][1]}")
+    
+    print_defense("Débits appliqués par horodatage croissant, identifiant réservé avant chaque débit")
+    bloque = (acceptees == premieres and not resultats[-1][0]
+              and banque_test.get_solde(client_test.carte) == 0)
+    print_result(not bloque, "Rejeu refusé, les 10 paiements les plus anciens accordés, aucun découvert" if bloque
+                 else "Ordre des débits ou anti-rejeu incorrect")
+
+
+def test_14_revocation_apres_redemarrage(ca, banque):
+    """Test : Un certificat révoqué le reste après un redémarrage sur le magasin de clés"""
+    print_section("CERTIFICAT RÉVOQUÉ APRÈS REDÉMARRAGE")
+    print("   📝 Scénario : Le serveur redémarre sur son magasin de clés juste après une révocation")
+    
+    with tempfile.TemporaryDirectory() as dossier:
+        magasin = MagasinCles(os.path.join(dossier, 'magasin.json'), 'phrase-secrete-test')
+        
+        print_attack_step("Étape 1 : Identités enregistrées dans le magasin, puis révocation du client 'Fraudeur'")
+        fraudeur = Client("Fraudeur", "4970-6666-6666-6666", ca)
+        banque.creer_compte(fraudeur.carte, fraudeur.nom, 5000)
+        marchand_test = Marchand("MarchandRedemarrage", ca, banque)
+        entites = {banque.nom: banque, marchand_test.nom: marchand_test, fraudeur.nom: fraudeur}
+        magasin.sauvegarder(ca, entites)
+        ca.revoquer_certificat(fraudeur.certificat.numero_serie)
+        # Comme /api/revoquer_certificat : magasin réécrit après chaque révocation
+        magasin.sauvegarder(ca, entites)
+        
+        print_attack_step("Étape 2 : Redémarrage, identités et CRL relues depuis le magasin")
+        with contextlib.redirect_stdout(io.StringIO()):
+            ca_relue, entites_relues, _ = magasin.charger()
+        fraudeur_relu = entites_relues["Fraudeur"]
+        marchand_relu = entites_relues["MarchandRedemarrage"]
+        banque_relue = marchand_relu.banque
+        banque_relue.creer_compte(fraudeur_relu.carte, fraudeur_relu.nom, 5000)
+        print(f"   ➜ CRL restaurée : {len(ca_relue.certificats_revoques)} certificat(s) révoqué(s)")
+        
+        print_attack_step("Étape 3 : Le fraudeur réessaie un achat après le redémarrage")
+        transaction_id = str(uuid.uuid4())
+        timestamp = time.time()
+        oi = {"items": ["Console"], "montant": 500, "client": fraudeur_relu.nom, "timestamp": timestamp}
+        pi = {"carte": fraudeur_relu.carte, "montant": 500, "nonce": get_random_bytes(16).hex(),
+              "transaction_id": transaction_id}
+        paquet = fraudeur_relu.preparer_paquet(banque_relue.get_cle_chiffrement(), oi, pi, transaction_id, timestamp)
+        succes, msg = marchand_relu.traiter_commande(paquet)
+    
+    print_defense("Révocation écrite dans le magasin de clés : la CRL survit au redémarrage")
+    print_result(succes, msg)
+
+
 def main():
     print("\n" + "🔥"*40)
     print("🔥" + " "*38 + "🔥")
@@ -448,7 +610,12 @@ def main():
         ("FONDS INSUFFISANTS", lambda: test_6_fonds_insuffisants(banque)),
         ("CARTE INVALIDE", lambda: test_7_carte_invalide(ca, banque)),
         ("DOUBLE DÉPENSE", lambda: test_8_double_depense(client, marchand, banque)),
-        ("INJECTION DE DONNÉES", lambda: test_9_injection_donnees(client, marchand))
+        ("INJECTION DE DONNÉES", lambda: test_9_injection_donnees(client, marchand)),
+        ("SIGNATURE DE LOT FALSIFIÉE", lambda: test_10_preuve_lot_falsifiee(client, marchand)),
+        ("DÉBITS CONCURRENTS", lambda: test_11_debits_concurrents(ca)),
+        ("FENÊTRE ANTI-REJEU", test_12_fenetre_anti_rejeu),
+        ("LOT D'AUTORISATIONS", lambda: test_13_lot_autorisations(ca)),
+        ("RÉVOCATION APRÈS REDÉMARRAGE", lambda: test_14_revocation_apres_redemarrage(ca, banque))
     ]
     
     print(f"\n\n📊 LANCEMENT DE {len(tests)} TESTS DE SÉCURITÉ")
@@ -478,6 +645,11 @@ def main():
     print("   ✅ Validation des cartes (base de données)")
     print("   ✅ Protection contre la double dépense")
     print("   ✅ Traitement sécurisé des données (pas d'injection)")
+    print("   ✅ Signatures de lot (preuves d'inclusion Merkle)")
+    print("   ✅ Débits concurrents (verrou par compte, soldes conservés)")
+    print("   ✅ Fenêtre anti-rejeu glissante (mémoire bornée)")
+    print("   ✅ Lots d'autorisations (rejeu et découvert dans un lot)")
+    print("   ✅ Révocations persistées dans le magasin de clés (redémarrage)")
     
     print("\n🎯 CONCLUSION :")
     print("   Le protocole SET/CDA avec chiffrement RSA 2048 bits,")
@@ -488,4 +660,5 @@ def main():
 
 
 if __name__ == "__main__":
+    configurer('demo')
     main()